@@ -0,0 +1,25 @@
+import json
+
+import pytest
+
+from briefme_subscription.chargify import ChargifyHelper
+from tests.fake_chargify import FakeChargifyApp, FakeChargifyClient, InProcessTransport
+
+
+@pytest.fixture(scope="session")
+def fake_chargify_site():
+    """A fake Chargify site sized like our production base."""
+    return FakeChargifyApp(customers=5000, billing_periods=6)
+
+
+@pytest.fixture
+def chargify_helper(fake_chargify_site):
+    helper = ChargifyHelper()
+    helper.chargify_python = FakeChargifyClient(InProcessTransport(fake_chargify_site))
+    return helper
+
+
+@pytest.fixture
+def subscription_payload():
+    with open("tests/fixtures/active_subscription.json") as f:
+        return json.load(f)
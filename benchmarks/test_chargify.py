@@ -0,0 +1,39 @@
+from briefme_subscription.chargify import ProductsDict
+from tests.fake_chargify import PAYING_PRODUCT_HANDLES
+
+
+def test_products_load(benchmark, chargify_helper):
+    products = ProductsDict()
+    products.chargify = chargify_helper
+
+    benchmark(products._load)
+
+
+def test_products_lookup(benchmark, chargify_helper):
+    products = ProductsDict()
+    products.chargify = chargify_helper
+    products._load()
+
+    def lookup():
+        return [products[handle] for handle in PAYING_PRODUCT_HANDLES]
+
+    benchmark(lookup)
+
+
+def test_get_subscriptions_pagination(benchmark, chargify_helper):
+    def read_all():
+        return sum(len(page) for page in chargify_helper.get_subscriptions())
+
+    assert benchmark(read_all) == 5000
+
+
+def test_products_lookup_compact(benchmark, chargify_helper, settings):
+    settings.CHARGIFY_COMPACT_PRODUCTS = True
+    products = ProductsDict()
+    products.chargify = chargify_helper
+    products._load()
+
+    def lookup():
+        return [products[handle]["price_in_cents"] for handle in PAYING_PRODUCT_HANDLES]
+
+    benchmark(lookup)
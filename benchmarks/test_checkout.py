@@ -0,0 +1,43 @@
+import copy
+
+import pytest
+
+from briefme_subscription.forms import ChargifyJsPaymentForm
+from tests.factories import ChargifySubscriptionFactory
+from tests.fake_chargify import FakeChargifyClient, InProcessTransport
+
+# Round trips to Chargify of a checkout during the trial: the creation of the
+# payment profile and its selection as the default one.
+TRIALING_CHECKOUT_ROUND_TRIPS = 2
+
+
+@pytest.mark.django_db
+def test_trialing_checkout(benchmark, fake_chargify_site, mocker):
+    mocker.patch(
+        "briefme_subscription.chargify.get_chargify_python",
+        return_value=FakeChargifyClient(InProcessTransport(fake_chargify_site)),
+    )
+    mocker.patch("briefme_subscription.chargify._chargify_helper", None)
+    chargify_subscription = next(
+        s
+        for s in fake_chargify_site.dataset.subscriptions.values()
+        if s["state"] == "trialing"
+    )
+    subscription = ChargifySubscriptionFactory(
+        uuid=chargify_subscription["id"],
+        chargify_subscription_cache=copy.deepcopy(chargify_subscription),
+    )
+    data = {"chargify_token": "tok_visa", "country": "FR", "zip": "75000"}
+
+    def checkout():
+        fake_chargify_site.reset_calls()
+        form = ChargifyJsPaymentForm(
+            data=data,
+            request={"user": subscription.user},
+            current_subscription=subscription,
+            payment_method="credit_card",
+        )
+        assert form.is_valid()
+        return len(fake_chargify_site.calls)
+
+    assert benchmark(checkout) == TRIALING_CHECKOUT_ROUND_TRIPS
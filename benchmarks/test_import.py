@@ -0,0 +1,16 @@
+import os
+import subprocess
+import sys
+
+# Cold start of a management command: set Django up and import the models.
+IMPORT_SCRIPT = "import django; django.setup(); import briefme_subscription.models"
+
+
+def test_cold_import(benchmark):
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE="tests.settings")
+
+    def cold_import():
+        subprocess.run([sys.executable, "-c", IMPORT_SCRIPT], env=env, check=True)
+
+    benchmark.pedantic(cold_import, rounds=10)
+
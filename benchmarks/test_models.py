@@ -0,0 +1,70 @@
+from briefme_subscription.models import _parse_date, convert_price, parse_date
+from tests.models import ChargifySubscription
+
+ChargifyProxy = ChargifySubscription.ChargifyProxy
+
+
+def test_proxy_attribute_access(benchmark, subscription_payload):
+    proxy = ChargifyProxy(subscription_payload)
+
+    def read_attributes():
+        return (
+            proxy.state,
+            proxy.product_handle,
+            proxy.current_billing_amount,
+            proxy.current_period_ends_at,
+            proxy.credit_card_expiration_date,
+            proxy.paypal_email,
+        )
+
+    benchmark(read_attributes)
+
+
+def test_subscription_state_properties(benchmark, subscription_payload):
+    subscription = ChargifySubscription(
+        uuid=subscription_payload["id"],
+        chargify_subscription_cache=subscription_payload,
+    )
+
+    def read_properties():
+        return (
+            subscription.active,
+            subscription.trialing,
+            subscription.running,
+            subscription.pending_cancellation,
+            subscription.remaining_days,
+            subscription.credit_card_is_active,
+        )
+
+    benchmark(read_properties)
+
+
+def test_parse_date(benchmark):
+    benchmark(parse_date, "2020-01-13T23:00:01+01:00")
+
+
+def test_convert_price(benchmark):
+    benchmark(convert_price, 5880)
+
+
+def test_parse_date_uncached(benchmark):
+    values = [
+        f"2020-{month:02d}-{day:02d}T23:00:01+01:00"
+        for month in range(1, 13)
+        for day in range(1, 29)
+    ]
+
+    def parse_all():
+        _parse_date.cache_clear()
+        return [parse_date(value) for value in values]
+
+    benchmark(parse_all)
+
+
+def test_parse_date_fallback(benchmark):
+    # Not ISO 8601, parsed by dateutil.
+    def parse_uncached():
+        _parse_date.cache_clear()
+        return parse_date("Jan 13 2020 23:00:01")
+
+    benchmark(parse_uncached)
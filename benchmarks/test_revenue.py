@@ -0,0 +1,37 @@
+import datetime
+
+from briefme_subscription.revenue import RevenueAggregator
+
+
+def invoice_pages(pages=250, per_page=200):
+    page = [
+        {
+            "issue_date": f"2021-{month:02d}-01",
+            "billing_address": {"country": country},
+            "refund_amount": "0.0",
+            "line_items": [
+                {
+                    "product_id": product_id,
+                    "total_amount": "58.80",
+                    "period_range_start": f"2021-{month:02d}-01",
+                    "period_range_end": f"2022-{month:02d}-01",
+                }
+            ],
+        }
+        for month in range(1, 13)
+        for country in ("FR", "BE", "CH")
+        for product_id in range(per_page // 36 + 1)
+    ][:per_page]
+    return [page] * pages
+
+
+def test_revenue_aggregation(benchmark):
+    pages = invoice_pages()
+
+    def aggregate():
+        aggregator = RevenueAggregator(as_of=datetime.date(2021, 12, 31))
+        for page in pages:
+            aggregator.add_page(page)
+        return aggregator.report()
+
+    assert benchmark(aggregate).line_items == 50000
@@ -0,0 +1,12 @@
+from briefme_subscription.views.hooks import parse_chargify_webhook
+
+
+def test_parse_large_webhook(benchmark, fake_chargify_site):
+    subscription_id = next(iter(fake_chargify_site.dataset.subscriptions))
+    post_data = fake_chargify_site.build_webhook("payment_success", subscription_id)
+    # Invoices with many line items make for the largest payloads we receive.
+    for i in range(200):
+        for key in ("uid", "title", "quantity", "unit_price", "total_amount"):
+            post_data[f"payload[invoice][line_items][{i}][{key}]"] = f"{key}-{i}"
+
+    benchmark(parse_chargify_webhook, post_data)
@@ -0,0 +1 @@
+default_app_config = "briefme_subscription.apps.BriefmeSubscriptionConfig"
@@ -0,0 +1,25 @@
+from .models import parse_date
+
+
+class ChargifySubscriptionAdminMixin:
+    """
+    Mixin of the `ModelAdmin` of a `ChargifySubscription` subclass, listing
+    the subscriptions from `for_list()`: a single query and no Chargify call
+    per page.
+    """
+
+    list_display = ("uuid", "user", "state", "trial_ended_at")
+    list_select_related = ("user",)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).for_list()
+
+    def state(self, obj):
+        return obj.get_cached_value("state")
+
+    state.short_description = "état"
+
+    def trial_ended_at(self, obj):
+        return parse_date(obj.get_cached_value("trial_ended_at")) or None
+
+    trial_ended_at.short_description = "fin de l'essai"
@@ -0,0 +1,32 @@
+from django.apps import AppConfig
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+
+
+class BriefmeSubscriptionConfig(AppConfig):
+    name = "briefme_subscription"
+
+    def ready(self):
+        from .models import invalidate_trial_coupon_cache, TrialCoupon
+
+        for model in self.apps.get_models():
+            if not issubclass(model, TrialCoupon):
+                continue
+            label = model._meta.label_lower
+            post_save.connect(
+                invalidate_trial_coupon_cache,
+                sender=model,
+                dispatch_uid=f"trial_coupon_cache_save:{label}",
+            )
+            post_delete.connect(
+                invalidate_trial_coupon_cache,
+                sender=model,
+                dispatch_uid=f"trial_coupon_cache_delete:{label}",
+            )
+
+        # Load the Chargify products before the worker serves traffic, without
+        # blocking the startup, e.g. of the management commands, on Chargify.
+        if getattr(settings, "CHARGIFY_WARM_UP_PRODUCTS", False):
+            from .chargify import PRODUCTS
+
+            PRODUCTS.warm_up(block=False)
@@ -0,0 +1,281 @@
+"""
+Apply one `ChargifyHelper` operation to many subscriptions.
+
+Calls run in a bounded pool of workers under a rate limit. Progress is
+checkpointed to a JSON lines file, one line per processed subscription, so
+that an interrupted run can be resumed, and the local subscription caches are
+refreshed in bulk from the Chargify responses.
+"""
+import collections
+import contextvars
+import csv
+import json
+import logging
+import os
+import threading
+import time
+
+from concurrent.futures import as_completed, ThreadPoolExecutor
+
+from django.db import transaction
+
+from .chargify import ChargifyHelper
+from .deadlines import BATCH
+
+logger = logging.getLogger(__name__)
+
+# `ChargifyHelper` methods allowed in bulk. They all take the subscription id
+# as first argument.
+BULK_OPERATIONS = (
+    "cancel_pending_cancellation",
+    "cancel_subscription",
+    "hold",
+    "reactivate_subscription",
+    "resume",
+    "retry_subscription",
+    "set_subscription_expires_at",
+    "set_subscription_next_billing_at",
+    "set_subscription_payment_collection_method",
+    "unset_subscription_expires_at",
+)
+
+BulkResult = collections.namedtuple(
+    "BulkResult", ["subscription_id", "success", "error", "subscription"]
+)
+
+
+class RateLimiter:
+    """
+    Thread-safe limiter letting at most `rate` calls per second go through.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next_call = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_call - now
+            self.next_call = max(now, self.next_call) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+class BulkOperation:
+    """
+    Run `operation`, the name of a method listed in `BULK_OPERATIONS`, with
+    `params` as keyword arguments, on many subscriptions.
+
+    `subscription_model` is the concrete `ChargifySubscription` model whose
+    caches are refreshed from the responses. When not given, local caches are
+    left untouched.
+    """
+
+    def __init__(
+        self,
+        operation,
+        params=None,
+        workers=4,
+        rate=5,
+        checkpoint_path=None,
+        subscription_model=None,
+        chargify_helper=None,
+        cache_batch_size=200,
+    ):
+        if operation not in BULK_OPERATIONS:
+            raise ValueError(
+                "The operation must be one of: %s" % ", ".join(BULK_OPERATIONS)
+            )
+
+        self.operation = operation
+        self.params = params or {}
+        self.workers = workers
+        self.rate_limiter = RateLimiter(rate)
+        self.checkpoint_path = checkpoint_path
+        self.subscription_model = subscription_model
+        self.chargify_helper = chargify_helper or ChargifyHelper(timeout_category=BATCH)
+        self.cache_batch_size = cache_batch_size
+
+    def get_processed_ids(self):
+        """Ids successfully processed by a previous run, from the checkpoint."""
+        processed_ids = set()
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return processed_ids
+
+        with open(self.checkpoint_path) as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry["success"]:
+                    processed_ids.add(entry["subscription_id"])
+        return processed_ids
+
+    def apply(self, subscription_id):
+        self.rate_limiter.wait()
+        try:
+            response = getattr(self.chargify_helper, self.operation)(
+                subscription_id, **self.params
+            )
+        except Exception as e:
+            logger.warning(
+                f"{self.operation} failed on subscription {subscription_id}: {e}"
+            )
+            return BulkResult(subscription_id, False, str(e), None)
+
+        subscription = None
+        if isinstance(response, dict):
+            subscription = response.get("subscription")
+        return BulkResult(subscription_id, True, "", subscription)
+
+    def run(self, subscription_ids):
+        """
+        Apply the operation to `subscription_ids`, skipping the ones already
+        processed according to the checkpoint, and return the `BulkResult`s of
+        this run.
+        """
+        processed_ids = self.get_processed_ids()
+        subscription_ids = [i for i in subscription_ids if i not in processed_ids]
+        if processed_ids:
+            logger.info(f"Resuming: {len(processed_ids)} subscriptions already processed")
+
+        results = []
+        pending_caches = []
+        checkpoint = open(self.checkpoint_path, "a") if self.checkpoint_path else None
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                # Submit by windows so that thousands of ids don't all sit in
+                # the executor's queue.
+                window = self.workers * 10
+                for start in range(0, len(subscription_ids), window):
+                    futures = [
+                        executor.submit(self.apply, subscription_id)
+                        for subscription_id in subscription_ids[start : start + window]
+                    ]
+                    for future in as_completed(futures):
+                        result = future.result()
+                        results.append(result)
+                        if checkpoint:
+                            self._write_checkpoint(checkpoint, result)
+                        if result.success:
+                            pending_caches.append(result)
+
+                    if len(pending_caches) >= self.cache_batch_size:
+                        self.refresh_caches(pending_caches)
+                        pending_caches = []
+        finally:
+            self.refresh_caches(pending_caches)
+            if checkpoint:
+                checkpoint.close()
+
+        return results
+
+    @staticmethod
+    def _write_checkpoint(checkpoint, result):
+        entry = {
+            "subscription_id": result.subscription_id,
+            "success": result.success,
+            "error": result.error,
+        }
+        checkpoint.write(json.dumps(entry) + "\n")
+        checkpoint.flush()
+
+    def refresh_caches(self, results):
+        """
+        Store the subscriptions returned by Chargify in the local caches with
+        a single `bulk_update`. Caches of subscriptions whose response didn't
+        include the subscription are cleared, to be reloaded on next access.
+        """
+        if not self.subscription_model or not results:
+            return
+
+        subscriptions = {r.subscription_id: r.subscription or {} for r in results}
+        local_subscriptions = list(
+            self.subscription_model.objects.filter(uuid__in=subscriptions).only(
+                "uuid", "chargify_subscription_cache"
+            )
+        )
+        previous_caches = {}
+        for local_subscription in local_subscriptions:
+            previous_caches[local_subscription.uuid] = (
+                local_subscription.chargify_subscription_cache
+            )
+            local_subscription.chargify_subscription_cache = (
+                self.subscription_model.prepare_chargify_subscription_cache(
+                    subscriptions[local_subscription.uuid]
+                )
+            )
+        with transaction.atomic():
+            self.subscription_model.objects.bulk_update(
+                local_subscriptions, ["chargify_subscription_cache"]
+            )
+            for local_subscription in local_subscriptions:
+                local_subscription.publish_chargify_subscription_changes(
+                    previous_caches[local_subscription.uuid]
+                )
+        self.subscription_model.write_shared_caches(local_subscriptions)
+
+
+def warm_chargify_caches(subscriptions, workers=8, chargify_helper=None):
+    """
+    Fill the empty caches of `subscriptions`, a queryset or a list of
+    subscriptions, like `prefetch_related()` does for relations: the missing
+    subscriptions are fetched from Chargify by `workers` concurrent calls, then
+    stored with a single `bulk_update`. Return the subscriptions as a list.
+
+    Subscriptions that can't be fetched keep their empty cache, and caches
+    deferred by `only()` or `defer()` are left untouched.
+    """
+    subscriptions = list(subscriptions)
+    missing = [
+        subscription
+        for subscription in subscriptions
+        if "chargify_subscription_cache" not in subscription.get_deferred_fields()
+        and not subscription.chargify_subscription_cache
+    ]
+    if not missing:
+        return subscriptions
+
+    subscription_model = type(missing[0])
+    chargify_helper = chargify_helper or subscription_model.chargify_helper
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Run in the caller's context, to keep its deadline.
+        futures = {
+            executor.submit(
+                contextvars.copy_context().run,
+                chargify_helper.get_subscription,
+                subscription.uuid,
+            ): subscription
+            for subscription in missing
+        }
+        warmed = []
+        for future in as_completed(futures):
+            subscription = futures[future]
+            try:
+                chargify_subscription = future.result()
+            except Exception as e:
+                logger.warning(f"Unable to fetch subscription {subscription.uuid}: {e}")
+                continue
+            if chargify_subscription:
+                subscription.chargify_subscription_cache = (
+                    subscription_model.prepare_chargify_subscription_cache(
+                        chargify_subscription
+                    )
+                )
+                warmed.append(subscription)
+
+    subscription_model.objects.bulk_update(warmed, ["chargify_subscription_cache"])
+    subscription_model.write_shared_caches(warmed)
+    return subscriptions
+
+
+def write_report(results, path):
+    """Write a CSV report with the outcome of each subscription."""
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["subscription_id", "status", "error"])
+        for result in results:
+            status = "success" if result.success else "failure"
+            writer.writerow([result.subscription_id, status, result.error])
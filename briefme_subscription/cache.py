@@ -0,0 +1,93 @@
+import collections
+import copy
+import threading
+import time
+
+from django.core.cache import caches
+
+
+class LocalCache:
+    """
+    Thread-safe, process-local LRU cache of at most `max_size` entries, each
+    expiring after its own timeout.
+    """
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                expires_at, value = self._entries[key]
+            except KeyError:
+                return default
+
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return default
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class TieredCache:
+    """
+    Two-tier cache: the process-local `local_cache`, keeping the values at
+    most `local_timeout` seconds, in front of the `alias` cache shared by the
+    processes, keeping them `timeout` seconds under `version`.
+
+    Values are copied when set, so that later changes made by the caller
+    don't leak into the local tier.
+    """
+
+    def __init__(
+        self, local_cache, alias="default", timeout=3600, local_timeout=5, version=1
+    ):
+        self.local_cache = local_cache
+        self.shared_cache = caches[alias]
+        self.timeout = timeout
+        self.local_timeout = local_timeout
+        self.version = version
+
+    def get(self, key, default=None):
+        value = self.local_cache.get(key)
+        if value is None:
+            value = self.shared_cache.get(key, version=self.version)
+            if value is None:
+                return default
+            self.local_cache.set(key, value, self.local_timeout)
+        return value
+
+    def set_many(self, values):
+        values = copy.deepcopy(values)
+        self.shared_cache.set_many(values, self.timeout, version=self.version)
+        for key, value in values.items():
+            self.local_cache.set(key, value, self.local_timeout)
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def delete_many(self, keys):
+        self.shared_cache.delete_many(keys, version=self.version)
+        for key in keys:
+            self.local_cache.delete(key)
+
+    def delete(self, key):
+        self.delete_many([key])
@@ -1,12 +1,30 @@
+import collections.abc
+import contextvars
 import datetime
+import functools
+import json
 import logging
+import os
 import sys
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
 
 from django.conf import settings
 
 import requests
 
-from libs.chargify_python import ChargifyNotFoundError, ChargifyUnprocessableEntityError
+from libs.chargify_python import (
+    ChargifyConnectionError,
+    ChargifyError,
+    ChargifyNotFoundError,
+    ChargifyServerError,
+    ChargifyUnprocessableEntityError,
+)
+
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .deadlines import DeadlineExceeded, get_timeout, INTERACTIVE
 
 logger = logging.getLogger(__name__)
 
@@ -22,10 +40,224 @@ def get_chargify_python():
     return chargify_python
 
 
+class ChargifyCall:
+    """
+    Chargify call in progress: its (connect, read) `timeout`, and the
+    `status_code` of the last response received.
+    """
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.status_code = None
+
+
+_current_call = contextvars.ContextVar("chargify_call", default=None)
+
+_send = getattr(
+    requests.adapters.HTTPAdapter.send,
+    "__wrapped__",
+    requests.adapters.HTTPAdapter.send,
+)
+
+
+@functools.wraps(_send)
+def _send_within_call(adapter, request, timeout=None, **kwargs):
+    """
+    Send the requests made without a timeout during a Chargify call, as those
+    of the "Chargify Python" library which takes none, with the timeout of the
+    call, and keep the status of the response for `GuardedChargifyClient`.
+    """
+    call = _current_call.get()
+    if call is None:
+        return _send(adapter, request, timeout=timeout, **kwargs)
+
+    if timeout is None:
+        timeout = call.timeout
+    response = _send(adapter, request, timeout=timeout, **kwargs)
+    call.status_code = response.status_code
+    return response
+
+
+# The library sends its requests with `requests`, through sessions of its own:
+# the adapters of every session apply the timeout of the Chargify call.
+requests.adapters.HTTPAdapter.send = _send_within_call
+
+
+_requests_session = None
+_requests_session_lock = threading.Lock()
+
+
+def get_requests_session():
+    """
+    Get the `requests.Session` shared by the raw HTTP calls to Chargify, so
+    that they reuse pooled keep-alive connections instead of opening a new one
+    for every call.
+    """
+    global _requests_session
+
+    if _requests_session is None:
+        with _requests_session_lock:
+            if _requests_session is None:
+                pool_size = getattr(settings, "CHARGIFY_HTTP_POOL_SIZE", 10)
+                adapter = requests.adapters.HTTPAdapter(
+                    pool_connections=pool_size, pool_maxsize=pool_size
+                )
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _requests_session = session
+
+    return _requests_session
+
+
+_circuit_breaker = None
+_circuit_breaker_lock = threading.Lock()
+
+
+def get_circuit_breaker():
+    """
+    Get the circuit breaker shared by all the calls to Chargify of the process,
+    configured by the `CHARGIFY_CIRCUIT_BREAKER` setting, e.g.
+    `{"failure_threshold": 5, "recovery_timeout": 30}`.
+    """
+    global _circuit_breaker
+
+    if _circuit_breaker is None:
+        with _circuit_breaker_lock:
+            if _circuit_breaker is None:
+                options = getattr(settings, "CHARGIFY_CIRCUIT_BREAKER", {})
+                _circuit_breaker = CircuitBreaker("Chargify", **options)
+
+    return _circuit_breaker
+
+
+def is_chargify_failure(exception, status_code=None):
+    """
+    Whether `exception` means that Chargify is unavailable: it couldn't be
+    reached, timed out, failed (5xx) or throttled the calls (429). Other errors
+    are answers about the call itself, or bugs. `status_code` is the one of the
+    last response of the call, which the exception may not carry.
+    """
+    if isinstance(
+        exception,
+        (
+            requests.ConnectionError,
+            requests.Timeout,
+            ChargifyConnectionError,
+            ChargifyServerError,
+        ),
+    ):
+        return True
+    if status_code is None:
+        status_code = getattr(exception, "status_code", None)
+    return isinstance(status_code, int) and (status_code == 429 or status_code >= 500)
+
+
 class ChargifyException(Exception):
     pass
 
 
+class ChargifyUnavailableError(ChargifyException):
+    """
+    Chargify couldn't be reached, or the circuit breaker is open.
+    """
+
+    pass
+
+
+class ChargifyTimeoutError(ChargifyUnavailableError):
+    """
+    A call to Chargify timed out, or the deadline had already passed.
+    """
+
+    pass
+
+
+class GuardedChargifyClient:
+    """
+    Proxy of the "Chargify Python" client running every API call through the
+    circuit breaker, within the timeout of its `timeout_category`.
+    """
+
+    def __init__(self, client, timeout_category=INTERACTIVE):
+        self._client = client
+        self._timeout_category = timeout_category
+
+    def __getattr__(self, item):
+        if item.startswith("__"):
+            raise AttributeError(item)
+        return GuardedChargifyClient(
+            getattr(self._client, item), self._timeout_category
+        )
+
+    def __call__(self, *args, **kwargs):
+        try:
+            timeout = get_timeout(self._timeout_category)
+        except DeadlineExceeded as e:
+            raise ChargifyTimeoutError(str(e)) from e
+
+        circuit_breaker = get_circuit_breaker()
+        try:
+            circuit_breaker.before_call()
+        except CircuitOpenError as e:
+            raise ChargifyUnavailableError(str(e)) from e
+
+        call = ChargifyCall((timeout.connect, timeout.read))
+        token = _current_call.set(call)
+        try:
+            result = self._client(*args, **kwargs)
+        except requests.Timeout as e:
+            # Timeouts shortened by the deadline say nothing about Chargify.
+            if timeout.capped:
+                circuit_breaker.record_ignored()
+            else:
+                circuit_breaker.record_failure()
+            raise ChargifyTimeoutError(f"Chargify timed out: {e}") from e
+        except Exception as e:
+            if not is_chargify_failure(e, call.status_code):
+                # Re-raised as is: Chargify answered, or the call is a bug.
+                if isinstance(e, ChargifyError):
+                    circuit_breaker.record_success()
+                else:
+                    circuit_breaker.record_ignored()
+                raise
+            circuit_breaker.record_failure()
+            raise ChargifyUnavailableError(f"Chargify is unavailable: {e}") from e
+        finally:
+            _current_call.reset(token)
+
+        circuit_breaker.record_success()
+        return result
+
+
+_chargify_helper = None
+_chargify_helper_lock = threading.Lock()
+
+
+def get_chargify_helper():
+    """
+    Get the `ChargifyHelper` shared by the process, created on first use so
+    that importing the app doesn't build a Chargify client.
+    """
+    global _chargify_helper
+
+    if _chargify_helper is None:
+        with _chargify_helper_lock:
+            if _chargify_helper is None:
+                _chargify_helper = ChargifyHelper()
+
+    return _chargify_helper
+
+
+class LazyChargifyHelper:
+    """
+    Descriptor giving the shared `ChargifyHelper`, see `get_chargify_helper()`.
+    """
+
+    def __get__(self, instance, owner):
+        return get_chargify_helper()
+
+
 class ChargifyHelper(object):
     """
     Chargify helper to interect with Chargify's API.
@@ -33,7 +265,7 @@ class ChargifyHelper(object):
     Inspired by Recurly's helper for consistency & backward compat.
     """
 
-    chargify_python = None
+    _chargify_python = None
 
     STATES = [
         ("trialing", "trialing"),
@@ -47,8 +279,25 @@ class ChargifyHelper(object):
         ("expired", "expired"),
     ]
 
-    def __init__(self):
-        self.chargify_python = get_chargify_python()
+    def __init__(self, timeout_category=INTERACTIVE):
+        """
+        `timeout_category` selects the timeouts of the calls in the
+        `CHARGIFY_TIMEOUTS` setting: "interactive" or "batch".
+        """
+        self.timeout_category = timeout_category
+
+    @property
+    def chargify_python(self):
+        """The guarded "Chargify Python" client, created on first use."""
+        if self._chargify_python is None:
+            self._chargify_python = GuardedChargifyClient(
+                get_chargify_python(), self.timeout_category
+            )
+        return self._chargify_python
+
+    @chargify_python.setter
+    def chargify_python(self, value):
+        self._chargify_python = value
 
     def get_card_update_url(self, remote_subscription_id):
         return "%s/api/v2/subscriptions/%s/card_update" % (
@@ -271,7 +520,7 @@ class ChargifyHelper(object):
 
     def hold(self, subscription_id, automatically_resume_at):
         try:
-            self.chargify_python.subscriptions.hold.create(
+            return self.chargify_python.subscriptions.hold.create(
                 subscription_id=subscription_id,
                 data={
                     "hold": {
@@ -285,7 +534,7 @@ class ChargifyHelper(object):
             raise e
 
     def resume(self, subscription_id):
-        self.chargify_python.subscriptions.resume.create(
+        return self.chargify_python.subscriptions.resume.create(
             subscription_id=subscription_id
         )
 
@@ -319,13 +568,53 @@ class ChargifyHelper(object):
             },
         )
 
-    def get_subscription_statements(self, subscription_id):
-        domain = settings.CHARGIFY_SUBDOMAIN
-        sorting = "sort=created_at&direction=desc"
-        statements_url = (
-            f"{domain}/subscriptions/{subscription_id}/statements.json?{sorting}"
+    def _http_get(self, url, auth=None, **kwargs):
+        """
+        GET `url` on Chargify through the pooled session, authenticated with
+        the API key unless another `auth` is given, within the timeouts of the
+        helper's category and the current deadline.
+        """
+        auth = auth or (settings.CHARGIFY_API_KEY, "x")
+        try:
+            timeout = get_timeout(self.timeout_category)
+        except DeadlineExceeded as e:
+            raise ChargifyTimeoutError(str(e)) from e
+
+        circuit_breaker = get_circuit_breaker()
+        try:
+            circuit_breaker.before_call()
+        except CircuitOpenError as e:
+            raise ChargifyUnavailableError(str(e)) from e
+
+        try:
+            response = get_requests_session().get(
+                url, auth=auth, timeout=(timeout.connect, timeout.read), **kwargs
+            )
+        except requests.Timeout as e:
+            # Timeouts shortened by the deadline say nothing about Chargify.
+            if timeout.capped:
+                circuit_breaker.record_ignored()
+            else:
+                circuit_breaker.record_failure()
+            raise ChargifyTimeoutError(f"Chargify timed out: {e}") from e
+        except requests.RequestException as e:
+            circuit_breaker.record_failure()
+            raise ChargifyUnavailableError(f"Chargify is unavailable: {e}") from e
+
+        if response.status_code >= 500 or response.status_code == 429:
+            circuit_breaker.record_failure()
+        else:
+            circuit_breaker.record_success()
+        return response
+
+    def _get_statements_page(self, subscription_id, page=None, per_page=None):
+        statements_url = "{domain}/subscriptions/{subscription_id}/statements.json".format(
+            domain=settings.CHARGIFY_SUBDOMAIN, subscription_id=subscription_id
         )
-        response = requests.get(statements_url, auth=(settings.CHARGIFY_API_KEY, "x"))
+        params = {"sort": "created_at", "direction": "desc"}
+        if page:
+            params.update({"page": page, "per_page": per_page})
+        response = self._http_get(statements_url, params=params)
 
         if not response.status_code == 200:
             raise ChargifyException(
@@ -334,16 +623,50 @@ class ChargifyHelper(object):
                 )
             )
 
-        statements = response.json()
-        response_list = [statement["statement"] for statement in statements]
+        return [statement["statement"] for statement in response.json()]
+
+    def get_subscription_statements(self, subscription_id):
+        """
+        Get all the statements of a subscription, newest first, in a single
+        request. Prefer `iter_subscription_statements()` or
+        `get_latest_subscription_statements()` for long-lived subscriptions.
+        """
+        return self._get_statements_page(subscription_id)
+
+    def iter_subscription_statements(self, subscription_id, page=1, per_page=20, limit=None):
+        """
+        Iterate over the statements of a subscription, newest first.
+
+        Statements are fetched `per_page` at a time, starting at `page`, only
+        when the previous page has been consumed: stopping the iteration early,
+        or giving a `limit`, saves the requests for the following pages.
+        """
+        count = 0
+        while limit is None or count < limit:
+            statements = self._get_statements_page(
+                subscription_id, page=page, per_page=per_page
+            )
+            for statement in statements:
+                yield statement
+                count += 1
+                if limit is not None and count >= limit:
+                    return
+
+            if len(statements) < per_page:
+                return
+            page += 1
 
-        return response_list
+    def get_latest_subscription_statements(self, subscription_id, count=5):
+        """
+        Get the `count` latest statements of a subscription in a single request.
+        """
+        return self._get_statements_page(subscription_id, page=1, per_page=count)
 
     def get_statement(self, statement_id):
         statement_url = "{domain}/statements/{statement_id}.json".format(
             domain=settings.CHARGIFY_SUBDOMAIN, statement_id=statement_id
         )
-        response = requests.get(statement_url, auth=(settings.CHARGIFY_API_KEY, "x"))
+        response = self._http_get(statement_url)
 
         if not response.status_code == 200:
             raise ChargifyException(
@@ -354,6 +677,21 @@ class ChargifyHelper(object):
 
         return response.json()["statement"]
 
+    def get_statements(self, statement_ids, max_workers=8):
+        """
+        Get several statements concurrently, over the pooled connections.
+        Statements are returned in the order of `statement_ids`.
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                # Within the deadline of the caller, if any.
+                executor.submit(
+                    contextvars.copy_context().run, self.get_statement, statement_id
+                )
+                for statement_id in statement_ids
+            ]
+            return [future.result() for future in futures]
+
     def get_subscription_transactions(self, subscription_id):
         return [
             t["transaction"]
@@ -362,6 +700,46 @@ class ChargifyHelper(object):
             )
         ]
 
+    def _iter_transactions(self, resource, since_id, since_date, per_page, **kwargs):
+        params = {"direction": "asc", "page": 1, "per_page": per_page}
+        if since_id:
+            params["since_id"] = since_id
+        if since_date:
+            params["since_date"] = since_date.isoformat()
+
+        while True:
+            transactions = resource(**params, **kwargs)
+            for t in transactions:
+                yield t["transaction"]
+            if len(transactions) < per_page:
+                break
+            params["page"] += 1
+
+    def get_transactions(self, since_id=None, since_date=None, per_page=200):
+        """
+        Iterate over the transactions of the whole site, oldest first,
+        starting with the transaction `since_id`, included, and/or on
+        `since_date`.
+        https://reference.chargify.com/v1/transactions/list-transactions-for-the-site
+        """
+        return self._iter_transactions(
+            self.chargify_python.transactions, since_id, since_date, per_page
+        )
+
+    def iter_subscription_transactions(
+        self, subscription_id, since_id=None, since_date=None, per_page=200
+    ):
+        """
+        Iterate over all the transactions of a subscription, oldest first.
+        """
+        return self._iter_transactions(
+            self.chargify_python.subscriptions.transactions,
+            since_id,
+            since_date,
+            per_page,
+            subscription_id=subscription_id,
+        )
+
     def get_transaction(self, transaction_id):
         if transaction_id:
             return self.chargify_python.transactions(transaction_id=transaction_id)[
@@ -378,9 +756,8 @@ class ChargifyHelper(object):
         )["customer"]
 
     def get_coupon(self, code):
-        res = requests.get(
-            "%s/coupons/find.json?code=%s" % (settings.CHARGIFY_SUBDOMAIN, code),
-            auth=(settings.CHARGIFY_API_KEY, "x"),
+        res = self._http_get(
+            "%s/coupons/find.json?code=%s" % (settings.CHARGIFY_SUBDOMAIN, code)
         )
 
         if res.status_code == 200:
@@ -446,12 +823,12 @@ class ChargifyHelper(object):
 
         try:
             if delayed:
-                self.chargify_python.subscriptions.update(
+                return self.chargify_python.subscriptions.update(
                     subscription_id=subscription_id,
                     data={"subscription": {"cancel_at_end_of_period": True}},
                 )
             else:
-                self.chargify_python.subscriptions.delete(
+                return self.chargify_python.subscriptions.delete(
                     subscription_id=subscription_id,
                     data={"subscription": {"cancellation_message": msg}},
                 )
@@ -468,7 +845,7 @@ class ChargifyHelper(object):
         https://reference.chargify.com/v1/subscriptions-cancellations/cancel-subscription
         """
 
-        self.chargify_python.subscriptions.delayed_cancel.delete(
+        return self.chargify_python.subscriptions.delayed_cancel.delete(
             subscription_id=subscription_id
         )
 
@@ -479,13 +856,13 @@ class ChargifyHelper(object):
         return response
 
     def set_subscription_next_billing_at(self, subscription_id, dt):
-        self.chargify_python.subscriptions.update(
+        return self.chargify_python.subscriptions.update(
             subscription_id=subscription_id,
             data={"subscription": {"next_billing_at": dt.isoformat()}},
         )
 
     def set_subscription_expires_at(self, subscription_id, expires_at):
-        self.chargify_python.subscriptions.override.update(
+        return self.chargify_python.subscriptions.override.update(
             subscription_id=subscription_id,
             data={"subscription": {"expires_at": expires_at.isoformat()}},
         )
@@ -495,13 +872,13 @@ class ChargifyHelper(object):
             raise ValueError(
                 "The payment collection method must be 'automatic' or 'remittance'"
             )
-        self.chargify_python.subscriptions.update(
+        return self.chargify_python.subscriptions.update(
             subscription_id=subscription_id,
             data={"subscription": {"payment_collection_method": value}},
         )
 
     def unset_subscription_expires_at(self, subscription_id):
-        self.chargify_python.subscriptions.override.update(
+        return self.chargify_python.subscriptions.override.update(
             subscription_id=subscription_id, data={"subscription": {"expires_at": ""}}
         )
 
@@ -512,7 +889,7 @@ class ChargifyHelper(object):
         https://docs.chargify.com/api-call
         """
         url = "%s/api/v2/calls/%s" % (settings.CHARGIFY_SUBDOMAIN, call_id)
-        call = requests.get(
+        call = self._http_get(
             url,
             auth=(
                 settings.CHARGIFY_DIRECT_API_ID,
@@ -574,7 +951,9 @@ class ChargifyHelper(object):
         Retry a Subscription
         https://reference.chargify.com/v1/subscriptions-payment-methods-retries-balance-reset/retry-subscription
         """
-        self.chargify_python.subscriptions.retry.update(subscription_id=subscription_id)
+        return self.chargify_python.subscriptions.retry.update(
+            subscription_id=subscription_id
+        )
 
     def create_migration(self, subscription_id, product_handle):
         """
@@ -628,53 +1007,164 @@ class ChargifyHelper(object):
         )
 
 
+class ProductRecord(collections.abc.Mapping):
+    """
+    Compact and immutable Chargify product, used by `ProductsDict` with the
+    `CHARGIFY_COMPACT_PRODUCTS` setting.
+
+    The fields read by the app are kept in slots, with the interval flags and
+    the `price` precomputed, and the others as JSON, decoded on access. Reads
+    like the product dict, `product["name"]`, or like an object,
+    `product.name`.
+    """
+
+    FIELDS = (
+        "id",
+        "handle",
+        "name",
+        "price_in_cents",
+        "interval",
+        "interval_unit",
+        "trial_price_in_cents",
+        "trial_interval",
+        "trial_interval_unit",
+        "interval_yearly",
+        "interval_monthly",
+    )
+
+    __slots__ = FIELDS + ("price", "_extras")
+
+    def __init__(self, **fields):
+        for field in self.FIELDS:
+            object.__setattr__(self, field, fields.pop(field, None))
+        object.__setattr__(self, "price", Decimal(self.price_in_cents or 0) / 100)
+        object.__setattr__(self, "_extras", json.dumps(fields).encode())
+
+    @classmethod
+    def from_chargify(cls, product):
+        fields = dict(product)
+        fields["handle"] = sys.intern(fields["handle"])
+        fields["interval_yearly"] = (
+            product["interval_unit"] == "month" and product["interval"] == 12
+        )
+        fields["interval_monthly"] = (
+            product["interval_unit"] == "month" and product["interval"] == 1
+        )
+        return cls(**fields)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable.")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable.")
+
+    def __getattr__(self, name):
+        # Only called for the extras, and the slots not set yet.
+        if name.startswith("_"):
+            raise AttributeError(name)
+        try:
+            return self.extras[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __getitem__(self, key):
+        if key in self.FIELDS:
+            return getattr(self, key)
+        return self.extras[key]
+
+    def __iter__(self):
+        return iter(self.to_dict())
+
+    def __len__(self):
+        return len(self.FIELDS) + len(self.extras)
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.handle}>"
+
+    def __reduce__(self):
+        return (_make_product_record, (self.to_dict(),))
+
+    @property
+    def extras(self):
+        """The other fields of the product, decoded on each access."""
+        return json.loads(self._extras)
+
+    def to_dict(self):
+        product = {field: getattr(self, field) for field in self.FIELDS}
+        product.update(self.extras)
+        return product
+
+
+def _make_product_record(fields):
+    return ProductRecord(**fields)
+
+
 class ProductsDict(dict):
     """
     Dict-like object providing informations about Chargify's products,
     with live updating and cache.
     """
 
-    chargify = None
+    _chargify = None
+    _by_id = None
     last_update = None
     paying = None
     trial = None
+    stale = False
     update_delay = 60 * 20  # Every 20 minutes.
+    retry_delay = 30  # When Chargify is unavailable.
+
+    SNAPSHOT_SCHEMA_VERSION = 1
 
     def __init__(self, *args, **kwargs):
         r = super(ProductsDict, self).__init__(*args, **kwargs)
-        self.chargify = ChargifyHelper()
+        self._load_lock = threading.Lock()
         return r
 
+    @property
+    def chargify(self):
+        """The `ChargifyHelper` loading the products, the shared one by default."""
+        return self._chargify or get_chargify_helper()
+
+    @chargify.setter
+    def chargify(self, value):
+        self._chargify = value
+
     def __getattribute__(self, *args, **kwargs):
 
         # If requiried attribute accesses the products' data and the object is
         # empty or data outdated, let's (re)load.
-        if (
-            args[0]
-            in (
-                "get",
-                "keys",
-                "items",
-                "values",
-                "paying",
-                "trial",
-                "__str__",
-                "__str__",
-            )
-            and (not self.last_update or self._is_outdated())
+        if args[0] in (
+            "get",
+            "keys",
+            "items",
+            "values",
+            "paying",
+            "trial",
+            "__str__",
+            "__str__",
         ):
-            self._load()
+            self._ensure_loaded()
 
         return super().__getattribute__(*args, **kwargs)
 
     def __getitem__(self, *args, **kwargs):
         # When accessing an item and the object is empty or data outdated,
         # let's (re)load the products.
-        if not self.last_update or self._is_outdated():
-            self._load()
+        self._ensure_loaded()
 
         return super().__getitem__(*args, **kwargs)
 
+    def _needs_load(self):
+        return not self.last_update or self._is_outdated()
+
+    def _ensure_loaded(self):
+        # Only one thread loads the products, the others wait for it.
+        if self._needs_load():
+            with self._load_lock:
+                if self._needs_load():
+                    self._load()
+
     def _is_outdated(self):
         now = datetime.datetime.now()
         return (now - self.last_update).total_seconds() > self.update_delay
@@ -689,36 +1179,159 @@ class ProductsDict(dict):
         sys.stdout.write("%s Chargify products… " % load)
         sys.stdout.flush()
 
-        self.clear()
+        try:
+            products = self.get_all_products()
+        except ChargifyUnavailableError:
+            if not self.last_update:
+                raise
+            # Keep serving the products we have until Chargify is back.
+            sys.stdout.write("Failed, keeping the current products.\n")
+            self.stale = True
+            self.last_update = datetime.datetime.now() - datetime.timedelta(
+                seconds=self.update_delay - self.retry_delay
+            )
+            return
 
-        products = self.get_all_products()
+        self._set_products(products)
+        self.stale = False
 
-        for p in products:
-            # Insert some helper data on-the-fly into the products.
-            p["interval_yearly"] = False
-            p["interval_monthly"] = False
+        sys.stdout.write("Done.\n")
 
-            if p["interval_unit"] == "month" and p["interval"] == 12:
-                p["interval_yearly"] = True
+        if self.snapshot_path:
+            try:
+                self.save_snapshot()
+            except OSError as e:
+                logger.warning(f"Unable to save the Chargify products snapshot: {e}")
+
+    def _set_products(self, products):
+        compact = getattr(settings, "CHARGIFY_COMPACT_PRODUCTS", False)
+
+        # Built aside, then swapped in: requests keep reading the current
+        # products meanwhile, without the lock.
+        by_handle = {}
+        by_id = {}
+        for p in products:
+            if compact:
+                p = ProductRecord.from_chargify(p)
+            else:
+                # Insert some helper data on-the-fly into the products.
+                p["interval_yearly"] = False
+                p["interval_monthly"] = False
 
-            if p["interval_unit"] == "month" and p["interval"] == 1:
-                p["interval_monthly"] = True
+                if p["interval_unit"] == "month" and p["interval"] == 12:
+                    p["interval_yearly"] = True
 
-            self[p["handle"]] = p
+                if p["interval_unit"] == "month" and p["interval"] == 1:
+                    p["interval_monthly"] = True
 
-        self.last_update = datetime.datetime.now()
+            by_handle[p["handle"]] = p
+            by_id[p["id"]] = p
 
         # This could be done automatically from Chargify's data,
         # but this way is better to specify the order we want.
-        self.paying = []
+        paying = []
         handles = settings.CHARGIFY_PAYING_PRODUCTS_HANDLES
 
         for handle in handles:
-            self.paying.append(self[handle])
+            paying.append(by_handle[handle])
+        trial = by_handle[settings.CHARGIFY_TRIAL_PRODUCT_HANDLE]
 
-        self.trial = self[settings.CHARGIFY_TRIAL_PRODUCT_HANDLE]
+        self.update(by_handle)
+        for handle in set(dict.keys(self)) - by_handle.keys():
+            del self[handle]
+        self._by_id = by_id
+        self.paying = paying
+        self.trial = trial
 
-        sys.stdout.write("Done.\n")
+        self.last_update = datetime.datetime.now()
+
+    def refresh(self):
+        """Reload the products from Chargify now."""
+        with self._load_lock:
+            self._load()
+
+    @property
+    def snapshot_path(self):
+        return getattr(settings, "CHARGIFY_PRODUCTS_SNAPSHOT_PATH", None)
+
+    def save_snapshot(self, path=None):
+        """
+        Save the products to a JSON snapshot, `CHARGIFY_PRODUCTS_SNAPSHOT_PATH`
+        by default, to boot from on next start.
+        """
+        path = path or self.snapshot_path
+        snapshot = {
+            "schema_version": self.SNAPSHOT_SCHEMA_VERSION,
+            "saved_at": datetime.datetime.now().isoformat(),
+            "products": [
+                p.to_dict() if isinstance(p, ProductRecord) else p
+                for p in super().values()
+            ],
+        }
+
+        # Several workers may save at once: write aside, then swap atomically.
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, path)
+
+    def load_snapshot(self, path=None):
+        """
+        Load the products from the snapshot, marked as stale until the next
+        load from Chargify. Return whether a usable snapshot was found.
+        """
+        path = path or self.snapshot_path
+        if not path:
+            return False
+
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Unable to read the Chargify products snapshot: {e}")
+            return False
+
+        if snapshot.get("schema_version") != self.SNAPSHOT_SCHEMA_VERSION:
+            logger.warning("Ignoring a Chargify products snapshot of another version.")
+            return False
+
+        try:
+            self._set_products(snapshot["products"])
+        except KeyError as e:
+            logger.warning(f"Incomplete Chargify products snapshot, missing {e}.")
+            return False
+
+        self.stale = True
+        return True
+
+    def warm_up(self, background_refresh=True, block=True):
+        """
+        Load the products before serving traffic: from the snapshot when there
+        is one, then refreshed from Chargify in a background thread, else from
+        Chargify, right away or in a background thread unless `block`.
+        """
+        with self._load_lock:
+            if self.last_update:
+                return
+
+            if not self.load_snapshot():
+                if block:
+                    self._load()
+                    return
+                background_refresh = True
+
+        if background_refresh:
+            threading.Thread(
+                target=self._refresh_in_background,
+                name="chargify-products-refresh",
+                daemon=True,
+            ).start()
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh()
+        except Exception:
+            logger.exception("Unable to refresh the Chargify products.")
 
     def get_all_products(self):
         products = []
@@ -732,14 +1345,15 @@ class ProductsDict(dict):
         return products
 
     def get_by_id(self, product_id, default=None):
+        self._ensure_loaded()
         try:
-            return [p for _, p in PRODUCTS.items() if p["id"] == product_id][0]
-        except IndexError as e:
+            return self._by_id[product_id]
+        except KeyError:
             if default is not None:
                 return default
-            raise e
+            raise IndexError(f"No Chargify product of id {product_id}.")
 
 
 # Instantiate a `ProductsDict` into PRODUCTS to make once instance
-# available anywhere via __import__.
+# available anywhere via __import__. Products are loaded on first access.
 PRODUCTS = ProductsDict()
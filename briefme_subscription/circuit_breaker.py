@@ -0,0 +1,122 @@
+"""
+Circuit breaker protecting the workers from a slow or unavailable Chargify.
+
+After `failure_threshold` consecutive failures the circuit opens: calls are
+rejected right away with `CircuitOpenError` instead of waiting on Chargify.
+Once `recovery_timeout` seconds have passed, a single probe call is let
+through (half-open): its success closes the circuit, its failure opens it
+again. A probe which never returns, e.g. hung, lets another one through after
+`recovery_timeout` seconds too.
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, failure_threshold=5, recovery_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+            self._probing_since = None
+
+    @property
+    def state(self):
+        with self.lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if (
+            self._state == self.OPEN
+            and time.monotonic() - self._opened_at >= self.recovery_timeout
+        ):
+            self._state = self.HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def before_call(self):
+        """
+        Raise `CircuitOpenError` if the call must not reach the remote service.
+        """
+        with self.lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return
+            if state == self.HALF_OPEN and (
+                not self._probing
+                or time.monotonic() - self._probing_since >= self.recovery_timeout
+            ):
+                self._probing = True
+                self._probing_since = time.monotonic()
+                return
+
+        raise CircuitOpenError(f"The {self.name} circuit breaker is open.")
+
+    def record_success(self):
+        with self.lock:
+            if self._state != self.CLOSED:
+                logger.info(f"The {self.name} circuit breaker is closed again.")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self._failures += 1
+            if (
+                self._state == self.HALF_OPEN
+                or self._failures >= self.failure_threshold
+            ):
+                if self._state != self.OPEN:
+                    logger.warning(
+                        f"The {self.name} circuit breaker opens after "
+                        f"{self._failures} consecutive failures."
+                    )
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def record_ignored(self):
+        """
+        Record a call whose outcome says nothing about the remote service, e.g.
+        one cut short by the caller's deadline, letting another probe through.
+        """
+        with self.lock:
+            self._probing = False
+
+    def call(self, func, *args, is_failure=None, **kwargs):
+        """
+        Call `func` through the circuit breaker. Exceptions count as failures
+        unless `is_failure(exception)` returns False, e.g. for a 404 which
+        proves that the remote service is up.
+        """
+        self.before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            if is_failure is None or is_failure(e):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        self.record_success()
+        return result
@@ -0,0 +1,83 @@
+"""
+Timeouts of the calls to Chargify, and deadline propagation.
+
+Each call gets the connect and read timeouts of its category, `interactive`
+for calls made while serving a request and `batch` for commands and exports,
+configured by the `CHARGIFY_TIMEOUTS` setting.
+
+Within `deadline(seconds)`, the timeouts are further capped so that together
+they fit in the time left before the deadline, and calls fail fast with
+`DeadlineExceeded` once it has passed:
+
+    with deadline(0.8):
+        subscription.refresh_chargify_subscription_cache()
+"""
+import collections
+import contextlib
+import contextvars
+import time
+
+from django.conf import settings
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+# (connect, read) timeouts, in seconds.
+DEFAULT_TIMEOUTS = {INTERACTIVE: (3.05, 10), BATCH: (10, 60)}
+
+Timeout = collections.namedtuple("Timeout", ["connect", "read", "capped"])
+
+_deadline = contextvars.ContextVar("chargify_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+@contextlib.contextmanager
+def deadline(seconds):
+    """
+    Give the nested calls to Chargify `seconds` in total. A nested deadline
+    can only shorten the enclosing one. Can also decorate a function.
+    """
+    expires_at = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None:
+        expires_at = min(expires_at, current)
+
+    token = _deadline.set(expires_at)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time():
+    """Seconds left before the current deadline, None without deadline."""
+    expires_at = _deadline.get()
+    if expires_at is None:
+        return None
+    return max(expires_at - time.monotonic(), 0)
+
+
+def get_timeout(category=INTERACTIVE):
+    """
+    Get the `Timeout` of the next call of `category`. `capped` tells whether
+    the timeouts were shortened by the deadline.
+    """
+    timeouts = dict(DEFAULT_TIMEOUTS, **getattr(settings, "CHARGIFY_TIMEOUTS", {}))
+    connect, read = timeouts[category]
+
+    remaining = remaining_time()
+    if remaining is None:
+        return Timeout(connect, read, False)
+    if remaining <= 0:
+        raise DeadlineExceeded("The deadline of the Chargify calls has passed.")
+
+    if connect + read <= remaining:
+        return Timeout(connect, read, False)
+
+    # A call can wait for its connection then for its response: both together
+    # must fit in the time left.
+    connect = min(connect, remaining / 2)
+    return Timeout(connect, min(read, remaining - connect), True)
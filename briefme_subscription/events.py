@@ -0,0 +1,229 @@
+"""
+Dispatch of the subscriptions' analytics events out of the request.
+
+The dispatcher is configured by the `SUBSCRIPTION_EVENT_DISPATCHER` setting:
+
+    SUBSCRIPTION_EVENT_DISPATCHER = {
+        "BACKEND": "briefme_subscription.events.BufferedEventDispatcher",
+        "OPTIONS": {"max_queue_size": 1000, "spill_path": "/var/tmp/events.jsonl"},
+    }
+
+`BufferedEventDispatcher`, the default, buffers the events in a bounded queue
+and sends them by batches from a background thread, or after the response
+with `background=False`. `SyncEventDispatcher` sends them right away, for
+tests.
+"""
+import atexit
+import collections
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.signals import request_finished
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.module_loading import import_string
+
+import analytics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKEND = "briefme_subscription.events.BufferedEventDispatcher"
+
+Event = collections.namedtuple("Event", ["user_id", "name", "properties", "timestamp"])
+
+
+def send_to_analytics(events):
+    """Default sender: track the events with Segment's `analytics`."""
+    for event in events:
+        analytics.track(
+            event.user_id, event.name, event.properties, timestamp=event.timestamp
+        )
+
+
+class EventDispatcher:
+    """
+    Base dispatcher. `sender` is the callable, or its dotted path, sending a
+    list of `Event`s.
+    """
+
+    def __init__(self, sender=None):
+        if isinstance(sender, str):
+            sender = import_string(sender)
+        self.sender = sender or send_to_analytics
+
+    def dispatch(self, user_id, name, properties=None):
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+
+class SyncEventDispatcher(EventDispatcher):
+    """Send each event right away, in the caller's thread."""
+
+    def dispatch(self, user_id, name, properties=None):
+        self.sender([Event(user_id, name, properties or {}, timezone.now())])
+
+
+class BufferedEventDispatcher(EventDispatcher):
+    """
+    Buffer the events in a queue of `max_queue_size` events, sent by batches
+    of `batch_size` at least every `flush_interval` seconds by a background
+    thread, or once the response is sent with `background=False`.
+
+    When the queue is full, events are appended to the `spill_path` JSON lines
+    file, sent once the queue has drained, or dropped without `spill_path`.
+    """
+
+    def __init__(
+        self,
+        sender=None,
+        max_queue_size=1000,
+        batch_size=100,
+        flush_interval=5,
+        spill_path=None,
+        background=True,
+    ):
+        super().__init__(sender)
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+        self.background = background
+        self.dropped = 0
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+
+        if not background:
+            request_finished.connect(self._flush_after_response, weak=False)
+        atexit.register(self.flush)
+
+    def dispatch(self, user_id, name, properties=None):
+        event = Event(user_id, name, properties or {}, timezone.now())
+        if self.background:
+            self._start_worker()
+
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self._overflow([event])
+
+    def flush(self):
+        """Send all the buffered and spilled events now."""
+        while True:
+            batch = self._get_batch(timeout=0)
+            if not batch:
+                break
+            self._send(batch)
+        self._replay_spilled()
+
+    def _flush_after_response(self, **kwargs):
+        self.flush()
+
+    def _start_worker(self):
+        if self._worker is None:
+            with self._worker_lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(
+                        target=self._run, name="subscription-events", daemon=True
+                    )
+                    self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = self._get_batch(timeout=self.flush_interval)
+            if batch:
+                self._send(batch)
+            else:
+                self._replay_spilled()
+
+    def _get_batch(self, timeout):
+        """
+        Get up to `batch_size` events, waiting at most `timeout` seconds for
+        the batch to fill up.
+        """
+        batch = []
+        deadline = time.monotonic() + timeout
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(
+                    self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+                )
+            except queue.Empty:
+                break
+        return batch
+
+    def _send(self, events):
+        try:
+            self.sender(events)
+        except Exception:
+            logger.exception(f"Unable to send {len(events)} subscription events.")
+            self._overflow(events)
+
+    def _overflow(self, events):
+        if not self.spill_path:
+            self.dropped += len(events)
+            logger.warning(f"{len(events)} subscription events dropped.")
+            return
+
+        with self._spill_lock, open(self.spill_path, "a") as f:
+            for event in events:
+                f.write(json.dumps(event._asdict(), cls=DjangoJSONEncoder) + "\n")
+
+    def _replay_spilled(self):
+        if not self.spill_path:
+            return
+
+        # Unique, so that a concurrent replay can't overwrite it.
+        replay_path = f"{self.spill_path}.{uuid.uuid4().hex}.replay"
+        with self._spill_lock:
+            if not os.path.exists(self.spill_path):
+                return
+            os.replace(self.spill_path, replay_path)
+
+        with open(replay_path) as f:
+            events = [self._load_event(line) for line in f]
+        os.remove(replay_path)
+
+        for start in range(0, len(events), self.batch_size):
+            self._send(events[start : start + self.batch_size])
+
+    @staticmethod
+    def _load_event(line):
+        data = json.loads(line)
+        data["timestamp"] = parse_datetime(data["timestamp"])
+        return Event(**data)
+
+
+_event_dispatcher = None
+_event_dispatcher_lock = threading.Lock()
+
+
+def get_event_dispatcher():
+    """
+    Get the event dispatcher of the process, configured by the
+    `SUBSCRIPTION_EVENT_DISPATCHER` setting.
+    """
+    global _event_dispatcher
+
+    if _event_dispatcher is None:
+        with _event_dispatcher_lock:
+            if _event_dispatcher is None:
+                config = getattr(settings, "SUBSCRIPTION_EVENT_DISPATCHER", {})
+                backend = import_string(config.get("BACKEND", DEFAULT_BACKEND))
+                _event_dispatcher = backend(**config.get("OPTIONS", {}))
+
+    return _event_dispatcher
+
+
+def dispatch_event(user_id, name, properties=None):
+    """Dispatch the analytics event `name` of the user `user_id`."""
+    get_event_dispatcher().dispatch(user_id, name, properties)
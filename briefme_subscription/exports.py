@@ -0,0 +1,210 @@
+"""
+Streaming exports of Chargify data.
+
+Invoices are fetched page by page and written row by row, so that memory
+stays flat whatever the number of exported invoices.
+"""
+import csv
+import json
+import zlib
+
+from decimal import Decimal
+
+from django.http import StreamingHttpResponse
+
+from .chargify import ChargifyHelper
+from .deadlines import BATCH
+from .models import convert_price
+from .utils import to_cents
+
+INVOICE_COLUMNS = (
+    "uid",
+    "number",
+    "subscription_id",
+    "customer_id",
+    "customer_email",
+    "customer_reference",
+    "country",
+    "issue_date",
+    "due_date",
+    "paid_date",
+    "status",
+    "currency",
+    "subtotal_amount",
+    "discount_amount",
+    "tax_amount",
+    "total_amount",
+    "refund_amount",
+    "paid_amount",
+    "due_amount",
+)
+
+AMOUNT_COLUMNS = (
+    "subtotal_amount",
+    "discount_amount",
+    "tax_amount",
+    "total_amount",
+    "refund_amount",
+    "paid_amount",
+    "due_amount",
+)
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "jsonl": ("application/x-ndjson", "jsonl"),
+}
+
+# Size of the chunks handed to the output, in bytes.
+CHUNK_SIZE = 64 * 1024
+
+
+def convert_amount(invoice, column):
+    """
+    Get the `column` amount of an invoice as a `Decimal`, the same way
+    `convert_price` does for subscriptions. Amounts are given in cents for
+    legacy invoices, and as decimal strings otherwise.
+    """
+    cents = invoice.get("%s_in_cents" % column)
+    if cents is None:
+        cents = to_cents(invoice.get(column))
+    return convert_price(cents)
+
+
+def invoice_to_row(invoice):
+    customer = invoice.get("customer") or {}
+    billing_address = invoice.get("billing_address") or {}
+    row = {
+        "uid": invoice.get("uid"),
+        "number": invoice.get("number"),
+        "subscription_id": invoice.get("subscription_id"),
+        "customer_id": customer.get("chargify_id") or invoice.get("customer_id"),
+        "customer_email": customer.get("email"),
+        "customer_reference": customer.get("reference"),
+        "country": billing_address.get("country"),
+        "issue_date": invoice.get("issue_date"),
+        "due_date": invoice.get("due_date"),
+        "paid_date": invoice.get("paid_date"),
+        "status": invoice.get("status"),
+        "currency": invoice.get("currency"),
+    }
+    for column in AMOUNT_COLUMNS:
+        row[column] = convert_amount(invoice, column)
+    return row
+
+
+def iter_invoices(
+    start_date=None,
+    end_date=None,
+    status=None,
+    date_field="issue_date",
+    per_page=200,
+    chargify_helper=None,
+):
+    """
+    Iterate over the invoices of the site, one at a time.
+
+    `start_date` and `end_date` are inclusive and apply to `date_field`
+    (`issue_date`, `due_date`, `paid_date`...). Filters are applied by Chargify.
+    """
+    chargify_helper = chargify_helper or ChargifyHelper(timeout_category=BATCH)
+
+    filters = {"per_page": per_page, "date_field": date_field}
+    if start_date:
+        filters["start_date"] = start_date.isoformat()
+    if end_date:
+        filters["end_date"] = end_date.isoformat()
+    if status:
+        filters["status"] = status
+
+    for invoices in chargify_helper.get_invoices(**filters):
+        yield from invoices
+
+
+class Echo:
+    """
+    File-like object returning what is written to it, for `csv.writer` to
+    format one row at a time.
+    """
+
+    def write(self, value):
+        return value
+
+
+def json_default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"{value!r} is not JSON serializable")
+
+
+def iter_invoice_lines(invoices, export_format="csv"):
+    if export_format == "csv":
+        writer = csv.writer(Echo())
+        yield writer.writerow(INVOICE_COLUMNS)
+        for invoice in invoices:
+            row = invoice_to_row(invoice)
+            yield writer.writerow([row[column] for column in INVOICE_COLUMNS])
+    elif export_format == "jsonl":
+        for invoice in invoices:
+            yield json.dumps(invoice_to_row(invoice), default=json_default) + "\n"
+    else:
+        raise ValueError(
+            "The export format must be one of: %s" % ", ".join(EXPORT_FORMATS)
+        )
+
+
+def iter_invoice_export(export_format="csv", compress=False, **filters):
+    """
+    Iterate over the bytes of an invoice export, in chunks of about
+    `CHUNK_SIZE` bytes, gzipped if `compress` is set.
+
+    `filters` are passed to `iter_invoices()`.
+    """
+    lines = iter_invoice_lines(iter_invoices(**filters), export_format)
+    # wbits=31 makes zlib produce a gzip stream.
+    compressor = zlib.compressobj(wbits=31) if compress else None
+
+    buffer = []
+    buffer_size = 0
+    for line in lines:
+        data = line.encode("utf-8")
+        if compressor:
+            data = compressor.compress(data)
+        buffer.append(data)
+        buffer_size += len(data)
+        if buffer_size >= CHUNK_SIZE:
+            yield b"".join(buffer)
+            buffer = []
+            buffer_size = 0
+
+    if compressor:
+        buffer.append(compressor.flush())
+    if buffer:
+        yield b"".join(buffer)
+
+
+def export_invoices(output, export_format="csv", compress=False, **filters):
+    """
+    Write an invoice export to the binary file-like `output`.
+    """
+    for chunk in iter_invoice_export(export_format, compress, **filters):
+        output.write(chunk)
+
+
+def invoice_export_response(
+    filename="invoices", export_format="csv", compress=False, **filters
+):
+    """
+    Get a `StreamingHttpResponse` downloading an invoice export.
+    """
+    content_type, extension = EXPORT_FORMATS[export_format]
+    filename = f"{filename}.{extension}"
+    if compress:
+        content_type = "application/gzip"
+        filename += ".gz"
+
+    response = StreamingHttpResponse(
+        iter_invoice_export(export_format, compress, **filters),
+        content_type=content_type,
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,49 @@
+"""
+Expressions reading the Chargify subscriptions stored in the JSON caches on
+the database side, so that list views and reports don't decode them.
+"""
+from django.db import models
+from django.db.models.functions import Cast, NullIf
+
+try:
+    from django.db.models.fields.json import KeyTextTransform, KeyTransform
+except ImportError:  # Django < 3.1
+    from django.contrib.postgres.fields.jsonb import KeyTextTransform, KeyTransform
+
+
+def cached_text(path, field="chargify_subscription_cache"):
+    """
+    Text value of `path` in the JSON `field`, with keys separated by "__" like
+    `ChargifyProxy.attribute_lookup`'s, e.g. "product__handle".
+    """
+    *keys, last_key = path.split("__")
+    expression = field
+    for key in keys:
+        expression = KeyTransform(key, expression)
+    return KeyTextTransform(last_key, expression)
+
+
+def cached_value(path, output_field, field="chargify_subscription_cache"):
+    """
+    Value of `path` in the JSON `field` cast to `output_field`, NULL when it
+    is empty: the caches written from webhooks store "" for null.
+    """
+    return Cast(NullIf(cached_text(path, field), models.Value("")), output_field)
+
+
+class LastDayOfMonth(models.Func):
+    """Last day of the month of the `year` and `month` integer expressions."""
+
+    template = "(make_date(%(expressions)s, 1) + interval '1 month - 1 day')::date"
+    output_field = models.DateField()
+
+
+def card_expiration_date():
+    """
+    Last valid day of the cached credit card, like `expiration_last_day()`, or
+    NULL without a credit card.
+    """
+    return LastDayOfMonth(
+        cached_value("credit_card__expiration_year", models.IntegerField()),
+        cached_value("credit_card__expiration_month", models.IntegerField()),
+    )
@@ -1,4 +1,3 @@
-import analytics
 import logging
 
 from django import forms
@@ -7,6 +6,7 @@ from django.contrib.auth import get_user_model
 from django.utils import timezone
 
 from .chargify import ChargifyHelper, ChargifyUnprocessableEntityError
+from .events import dispatch_event
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
@@ -54,26 +54,57 @@ class ChargifyJsPaymentForm(forms.Form):
         super().__init__(*args, **kwargs)
 
     def is_valid(self):
-        is_valid = super().is_valid()
-
-        self._create_payment_profile()
+        if not super().is_valid():
+            return False
 
         current_state = self.current_subscription.state
+        response = self._create_payment_profile()
 
-        if is_valid and current_state in ["trial_ended", "canceled"]:
+        is_valid = True
+        if current_state in ["trial_ended", "canceled"]:
+            # The reactivation stores the subscription returned by Chargify.
             is_valid = self._reactivate_subscription()
+        elif current_state == "trialing":
+            self._store_payment_profile(response)
 
         if current_state in ["trial_ended", "trialing"]:
-            self.current_subscription.refresh_chargify_subscription_cache()
             self.current_subscription.track_conversion_event()
 
         return is_valid
 
     def _create_payment_profile(self):
-        ChargifyHelper().create_default_payment_profile_from_token(
+        response = ChargifyHelper().create_default_payment_profile_from_token(
             self.current_subscription, self.cleaned_data["chargify_token"]
         )
         self.current_subscription.payment_collection_method = "automatic"
+        return response
+
+    def _store_payment_profile(self, response):
+        """
+        Store the new default payment profile returned by Chargify in the
+        subscription cache, instead of fetching the whole subscription again.
+        Only the block of the profile is replaced; the subscription is fetched
+        again when the type of the profile is unknown.
+        """
+        current_subscription = self.current_subscription
+        chargify_subscription = current_subscription.chargify_subscription_cache
+        try:
+            payment_profile = response["payment_profile"]
+            payment_type = payment_profile["payment_type"]
+        except (KeyError, TypeError):
+            payment_profile = payment_type = None
+
+        if payment_type not in ("credit_card", "paypal_account"):
+            payment_profile = None
+        if not payment_profile or not chargify_subscription:
+            current_subscription.refresh_chargify_subscription_cache()
+            return
+
+        current_subscription.refresh_chargify_subscription_cache(
+            chargify_subscription=dict(
+                chargify_subscription, **{payment_type: payment_profile}
+            )
+        )
 
     def _reactivate_subscription(self):
         current_subscription = self.current_subscription
@@ -122,7 +153,7 @@ class ChargifyJsPaymentForm(forms.Form):
                 "plan_label": current_subscription.plan_name,
             }
 
-        analytics.track(user.id, label, analytics_data)
+        dispatch_event(user.id, label, analytics_data)
 
     def _message_reactivate_error(self):
         raise NotImplementedError
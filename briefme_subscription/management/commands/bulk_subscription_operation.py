@@ -0,0 +1,97 @@
+import datetime
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ...bulk import BULK_OPERATIONS, BulkOperation, write_report
+from ...utils import get_model_from_setting
+
+# Parsers of the `--param` values which are not strings, with the format they
+# expect.
+PARAM_PARSERS = {
+    "automatically_resume_at": (datetime.date.fromisoformat, "YYYY-MM-DD"),
+    "delayed": (lambda value: value.lower() in ("1", "true", "yes"), "true or false"),
+    "dt": (datetime.datetime.fromisoformat, "YYYY-MM-DDTHH:MM:SS[+HH:MM]"),
+    "expires_at": (datetime.datetime.fromisoformat, "YYYY-MM-DDTHH:MM:SS[+HH:MM]"),
+    "include_trial": (int, "0 or 1"),
+}
+
+
+def parse_param(param):
+    key, separator, value = param.partition("=")
+    if not separator:
+        raise CommandError(f"Invalid parameter '{param}', expected key=value.")
+
+    if key not in PARAM_PARSERS:
+        return key, value
+    parser, expected = PARAM_PARSERS[key]
+    try:
+        return key, parser(value)
+    except ValueError:
+        raise CommandError(f"Invalid parameter '{param}', expected {key}={expected}.")
+
+
+class Command(BaseCommand):
+    help = "Apply a Chargify operation to a list of subscriptions."
+
+    def add_arguments(self, parser):
+        parser.add_argument("operation", choices=BULK_OPERATIONS)
+        parser.add_argument(
+            "ids_file",
+            help="File with one subscription id per line, '-' to read stdin.",
+        )
+        parser.add_argument(
+            "--param",
+            action="append",
+            default=[],
+            type=parse_param,
+            help="key=value argument of the operation, e.g. value=remittance.",
+        )
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument(
+            "--rate", type=float, default=5, help="Maximum calls per second."
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help="JSON lines progress file. Ids already processed are skipped.",
+        )
+        parser.add_argument("--report", help="Path of the CSV report.")
+
+    def handle(self, *args, **options):
+        subscription_ids = self.read_ids(options["ids_file"])
+
+        subscription_model = None
+        if getattr(settings, "CHARGIFY_SUBSCRIPTION_MODEL", None):
+            subscription_model = get_model_from_setting("CHARGIFY_SUBSCRIPTION_MODEL")
+
+        bulk_operation = BulkOperation(
+            options["operation"],
+            params=dict(options["param"]),
+            workers=options["workers"],
+            rate=options["rate"],
+            checkpoint_path=options["checkpoint"],
+            subscription_model=subscription_model,
+        )
+        results = bulk_operation.run(subscription_ids)
+
+        if options["report"]:
+            write_report(results, options["report"])
+
+        failures = [r for r in results if not r.success]
+        self.stdout.write(
+            f"{len(results) - len(failures)} succeeded, {len(failures)} failed."
+        )
+        for failure in failures:
+            self.stderr.write(f"{failure.subscription_id}: {failure.error}")
+
+    @staticmethod
+    def read_ids(path):
+        f = sys.stdin if path == "-" else open(path)
+        try:
+            return [int(line) for line in f if line.strip()]
+        except ValueError as e:
+            raise CommandError(f"Invalid subscription id: {e}")
+        finally:
+            if f is not sys.stdin:
+                f.close()
@@ -0,0 +1,58 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from ...utils import get_model_from_setting
+
+
+class Command(BaseCommand):
+    help = (
+        "Reduce the stored Chargify subscriptions to their projection, see "
+        "CHARGIFY_SUBSCRIPTION_CACHE_PROJECTION."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report the size reduction without saving.",
+        )
+
+    def handle(self, *args, **options):
+        subscription_model = get_model_from_setting("CHARGIFY_SUBSCRIPTION_MODEL")
+        batch_size = options["batch_size"]
+        size_before = size_after = count = 0
+
+        subscriptions = (
+            subscription_model.objects.exclude(chargify_subscription_cache={})
+            .only("pk", "chargify_subscription_cache")
+            .order_by("pk")
+        )
+        batch = []
+        for subscription in subscriptions.iterator(chunk_size=batch_size):
+            cache = subscription.chargify_subscription_cache
+            projection = subscription_model.project_chargify_subscription(cache)
+            size_before += len(json.dumps(cache))
+            size_after += len(json.dumps(projection))
+            count += 1
+
+            subscription.chargify_subscription_cache = projection
+            batch.append(subscription)
+            if len(batch) >= batch_size:
+                self.save(subscription_model, batch, options["dry_run"])
+                batch = []
+        self.save(subscription_model, batch, options["dry_run"])
+
+        self.stdout.write(
+            f"{count} subscriptions compacted: {size_before} to {size_after} "
+            f"bytes of JSON."
+        )
+
+    @staticmethod
+    def save(subscription_model, subscriptions, dry_run):
+        if subscriptions and not dry_run:
+            subscription_model.objects.bulk_update(
+                subscriptions, ["chargify_subscription_cache"]
+            )
+            subscription_model.write_shared_caches(subscriptions)
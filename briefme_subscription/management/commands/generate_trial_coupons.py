@@ -0,0 +1,56 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...utils import get_model_from_setting
+
+
+class Command(BaseCommand):
+    help = "Generate single-use trial coupons, e.g. for a partner campaign."
+
+    def add_arguments(self, parser):
+        parser.add_argument("count", type=int)
+        parser.add_argument(
+            "output", help="Path of the CSV file of the generated coupons."
+        )
+        parser.add_argument(
+            "--codename-prefix",
+            required=True,
+            help="Prefix of the codenames, e.g. the partner's name.",
+        )
+        parser.add_argument("--prefix", default="", help="Prefix of the tokens.")
+        parser.add_argument(
+            "--length", type=int, default=8, help="Random characters per token."
+        )
+        parser.add_argument("--number-of-days", type=int, default=30)
+        parser.add_argument(
+            "--expires-at",
+            type=datetime.date.fromisoformat,
+            help="Expiration date of the coupons (YYYY-MM-DD).",
+        )
+        parser.add_argument("--partner-label", default="")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        trial_coupon_model = get_model_from_setting("TRIAL_COUPON_MODEL")
+
+        with open(options["output"], "w", newline="") as output:
+            try:
+                report = trial_coupon_model.objects.bulk_generate(
+                    options["count"],
+                    options["codename_prefix"],
+                    prefix=options["prefix"],
+                    length=options["length"],
+                    batch_size=options["batch_size"],
+                    output=output,
+                    number_of_days=options["number_of_days"],
+                    expires_at=options["expires_at"],
+                    partner_label=options["partner_label"],
+                )
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        self.stdout.write(
+            f"{report.count} coupons generated in {report.duration:.1f}s "
+            f"({report.count / max(report.duration, 1e-9):.0f}/s)."
+        )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from ...reporting import take_snapshot
+from ...utils import get_model_from_setting
+from .sync_chargify_transactions import parse_date_argument
+
+
+class Command(BaseCommand):
+    help = "Store the metrics of the subscriptions of the day, for the dashboards."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--date",
+            type=parse_date_argument,
+            help="Date (YYYY-MM-DD) of the snapshot, today by default.",
+        )
+
+    def handle(self, *args, **options):
+        count = take_snapshot(
+            get_model_from_setting("CHARGIFY_SUBSCRIPTION_MODEL"),
+            get_model_from_setting("SUBSCRIPTION_METRICS_SNAPSHOT_MODEL"),
+            date=options["date"],
+        )
+        self.stdout.write(f"{count} metrics rows stored.")
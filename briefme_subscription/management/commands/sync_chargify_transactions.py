@@ -0,0 +1,40 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...sync import sync_transactions
+from ...utils import get_model_from_setting
+
+
+def parse_date_argument(value):
+    try:
+        return datetime.datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD.")
+
+
+class Command(BaseCommand):
+    help = "Copy the Chargify transactions created since the last run into the local ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--cursor",
+            default="transactions",
+            help="Name of the synchronization cursor.",
+        )
+        parser.add_argument(
+            "--since-date",
+            type=parse_date_argument,
+            help="Start date (YYYY-MM-DD) of the first synchronization.",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        count = sync_transactions(
+            get_model_from_setting("CHARGIFY_TRANSACTION_MODEL"),
+            get_model_from_setting("CHARGIFY_SYNC_CURSOR_MODEL"),
+            cursor_name=options["cursor"],
+            since_date=options["since_date"],
+            batch_size=options["batch_size"],
+        )
+        self.stdout.write(f"{count} transactions synchronized.")
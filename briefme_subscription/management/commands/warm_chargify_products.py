@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...chargify import ChargifyUnavailableError, PRODUCTS
+
+
+class Command(BaseCommand):
+    help = "Load the Chargify products and save them to the snapshot file."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path",
+            help="Snapshot file, CHARGIFY_PRODUCTS_SNAPSHOT_PATH by default.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"] or PRODUCTS.snapshot_path
+        if not path:
+            raise CommandError(
+                "Set CHARGIFY_PRODUCTS_SNAPSHOT_PATH or give the snapshot --path."
+            )
+
+        try:
+            PRODUCTS.refresh()
+        except ChargifyUnavailableError as e:
+            raise CommandError(f"Unable to load the Chargify products: {e}")
+        if PRODUCTS.stale:
+            raise CommandError("Chargify is unavailable, the snapshot is not updated.")
+
+        PRODUCTS.save_snapshot(path)
+        self.stdout.write(f"{len(PRODUCTS)} products saved to {path}.")
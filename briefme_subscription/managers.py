@@ -1,7 +1,246 @@
+import collections
+import copy
+import csv
+import datetime
+import hashlib
+import secrets
+import time
+
 from django.conf import settings
-from django.db import models
+from django.core.cache import caches
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models, transaction
+
+from .bulk import warm_chargify_caches
+from .cache import LocalCache
+from .expressions import cached_text, card_expiration_date
+
+# Options of the trial coupons cache, overridden by the `TRIAL_COUPON_CACHE`
+# setting. Timeouts are in seconds.
+DEFAULT_TRIAL_COUPON_CACHE = {
+    # Alias of the cache shared by the processes, in `CACHES`.
+    "alias": "default",
+    "timeout": 60 * 60,
+    # Other processes see a change after at most `local_timeout`.
+    "local_timeout": 60,
+    # For unknown tokens, which bots keep probing.
+    "negative_timeout": 5 * 60,
+}
+
+TRIAL_COUPON_CACHE_VERSION_KEY = "trial_coupon:version"
+
+# Cached in place of the coupons that don't exist.
+MISSING = "missing"
+
+_local_cache = LocalCache()
+
+# Characters of the generated tokens, without the ambiguous 0, O, 1, I and L.
+TOKEN_ALPHABET = "23456789ABCDEFGHJKMNPQRSTUVWXYZ"
+
+BulkGenerationReport = collections.namedtuple(
+    "BulkGenerationReport", ["count", "duration"]
+)
+
+
+def get_trial_coupon_cache_options():
+    return dict(
+        DEFAULT_TRIAL_COUPON_CACHE, **getattr(settings, "TRIAL_COUPON_CACHE", {})
+    )
 
 
 class TrialCouponManager(models.Manager):
     def get_default(self):
-        return self.get_queryset().get(token=settings.TRIAL_DEFAULT_TOKEN)
+        return self.get_by_token(settings.TRIAL_DEFAULT_TOKEN)
+
+    def get_by_token(self, token):
+        return self._get_cached("token", token)
+
+    def get_by_codename(self, codename):
+        return self._get_cached("codename", codename)
+
+    def _get_cached(self, field, value):
+        """
+        Get the coupon whose `field` is `value` from the local cache, else the
+        shared cache, else the database. Raise `DoesNotExist` like `get()`.
+        """
+        options = get_trial_coupon_cache_options()
+        # Hashed, since values come from the URLs.
+        key = "trial_coupon:{model}:{field}:{hash}".format(
+            model=self.model._meta.label_lower,
+            field=field,
+            hash=hashlib.md5(str(value).encode()).hexdigest(),
+        )
+
+        coupon = _local_cache.get(key)
+        if coupon is None:
+            shared_cache = caches[options["alias"]]
+            version = shared_cache.get(TRIAL_COUPON_CACHE_VERSION_KEY, 1)
+            coupon = shared_cache.get(key, version=version)
+            timeout = options["timeout"]
+
+            if coupon is None:
+                try:
+                    coupon = self.get_queryset().get(**{field: value})
+                except self.model.DoesNotExist:
+                    coupon = MISSING
+                    timeout = options["negative_timeout"]
+                shared_cache.set(key, coupon, timeout, version=version)
+
+            _local_cache.set(key, coupon, min(timeout, options["local_timeout"]))
+
+        if coupon == MISSING:
+            raise self.model.DoesNotExist(
+                f"{self.model._meta.object_name} matching query does not exist."
+            )
+
+        # Don't let callers alter the cached instance, nor its `_state`, which a
+        # shallow copy shares on Django 2.2.
+        return copy.deepcopy(coupon)
+
+    def clear_cache(self):
+        """
+        Invalidate the cached coupons, on save and delete. Updates made with
+        `QuerySet.update()` must call it, once committed.
+        """
+        _local_cache.clear()
+        shared_cache = caches[get_trial_coupon_cache_options()["alias"]]
+        try:
+            shared_cache.incr(TRIAL_COUPON_CACHE_VERSION_KEY)
+        except ValueError:
+            shared_cache.set(TRIAL_COUPON_CACHE_VERSION_KEY, 2, None)
+
+    def bulk_generate(
+        self,
+        count,
+        codename_prefix,
+        prefix="",
+        length=8,
+        batch_size=1000,
+        output=None,
+        **fields,
+    ):
+        """
+        Create `count` single-use coupons with random tokens, e.g. for a
+        partner campaign, and return a `BulkGenerationReport`.
+
+        Tokens are `prefix` followed by `length` random characters, drawn
+        against the existing tokens so that none collides, and codenames are
+        `codename_prefix` followed by the token. `fields` are set on every
+        coupon, e.g. `number_of_days` or `partner_label`. Coupons are inserted
+        by batches of `batch_size` in a single transaction, then written as CSV
+        to the `output` file, if any.
+        """
+        start = time.monotonic()
+        # Codenames are stored lowercased: look for collisions the same way.
+        codename_prefix = f"{codename_prefix}-".lower()
+        self._check_generation_capacity(count, codename_prefix, prefix, length)
+
+        existing_tokens = set(
+            self.filter(token__startswith=prefix).values_list("token", flat=True)
+        )
+        existing_codenames = set(
+            self.filter(codename__startswith=codename_prefix).values_list(
+                "codename", flat=True
+            )
+        )
+
+        coupons = []
+        while len(coupons) < count:
+            token = prefix + "".join(
+                secrets.choice(TOKEN_ALPHABET) for _ in range(length)
+            )
+            codename = codename_prefix + token.lower()
+            if token in existing_tokens or codename in existing_codenames:
+                continue
+            existing_tokens.add(token)
+            existing_codenames.add(codename)
+            coupons.append(self.model(token=token, codename=codename, **fields))
+
+        with transaction.atomic(using=self.db):
+            self.bulk_create(coupons, batch_size=batch_size)
+        # Bulk inserts send no signal: clear the unknown tokens cached, once
+        # the transaction of the caller, if any, is committed.
+        transaction.on_commit(self.clear_cache, using=self.db)
+
+        if output is not None:
+            writer = csv.writer(output)
+            writer.writerow(["token", "codename", "duration"])
+            for coupon in coupons:
+                writer.writerow([coupon.token, coupon.codename, coupon.duration])
+
+        return BulkGenerationReport(len(coupons), time.monotonic() - start)
+
+    def _check_generation_capacity(self, count, codename_prefix, prefix, length):
+        max_length = min(
+            self.model._meta.get_field("token").max_length,
+            self.model._meta.get_field("codename").max_length,
+        )
+        if len(codename_prefix) + len(prefix) + length > max_length:
+            raise ValueError(
+                f"Prefixes and token can't exceed {max_length} characters."
+            )
+
+        # Keep collisions rare enough for the draws to end quickly.
+        if count * 100 > len(TOKEN_ALPHABET) ** length:
+            raise ValueError(f"Tokens of {length} characters are too short.")
+
+
+class ChargifySubscriptionQuerySet(models.QuerySet):
+    # Keys of the cache annotated by `for_list()`, as "cached_<key>".
+    LIST_CACHE_KEYS = ("state", "trial_ended_at")
+
+    def for_list(self):
+        """
+        Subscriptions to list, e.g. in the admin: the cache is deferred and
+        the keys rendered by `__str__` are annotated instead, so that listing
+        takes a single query and never calls Chargify.
+        """
+        queryset = self.defer("chargify_subscription_cache").annotate(
+            **{f"cached_{key}": cached_text(key) for key in self.LIST_CACHE_KEYS}
+        )
+        try:
+            self.model._meta.get_field("trial_coupon")
+        except FieldDoesNotExist:
+            return queryset
+        return queryset.select_related("trial_coupon")
+
+    def with_card_expiration_date(self):
+        """
+        Annotate the last valid day of the cached credit card, computed by
+        PostgreSQL, as "card_expiration_date".
+        """
+        return self.annotate(card_expiration_date=card_expiration_date())
+
+    def card_expiring_within(self, days, today=None):
+        """
+        Subscriptions whose credit card is still valid today, but expires
+        within `days` days: with 35 days, the ones still valid for which
+        `credit_card_is_active` is false.
+        """
+        today = today or datetime.date.today()
+        return self.with_card_expiration_date().filter(
+            card_expiration_date__gte=today,
+            card_expiration_date__lte=today + datetime.timedelta(days=days),
+        )
+
+    def in_batches(self, batch_size=500):
+        """
+        Iterate over the subscriptions by lists of `batch_size`, each fetched
+        by a query seeking past the primary key of the previous one, so that
+        every batch is as fast whatever the size of the table.
+        """
+        queryset = self.order_by("pk")
+        batch = list(queryset[:batch_size])
+        while batch:
+            yield batch
+            batch = list(queryset.filter(pk__gt=batch[-1].pk)[:batch_size])
+
+    def warm_chargify_caches(self, workers=8):
+        """
+        Evaluate the queryset and fill the empty caches in bulk, see
+        `bulk.warm_chargify_caches()`.
+        """
+        return warm_chargify_caches(self, workers=workers)
+
+
+ChargifySubscriptionManager = models.Manager.from_queryset(ChargifySubscriptionQuerySet)
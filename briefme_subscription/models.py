@@ -1,6 +1,10 @@
 import calendar
+import copy
 import datetime
+import functools
+import logging
 
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from dateutil.parser import parse
 from decimal import Decimal, DecimalException
 
@@ -8,17 +12,90 @@ from django.conf import settings
 from django.contrib.postgres.fields import JSONField
 from django.contrib.auth import get_user_model
 from django.core import signing
-from django.db import models
+from django.core.cache import caches
+from django.db import models, transaction
 from django.shortcuts import reverse
 
 from model_utils.models import TimeStampedModel
 from model_utils import Choices
 
-from .chargify import ChargifyHelper
-from .managers import TrialCouponManager
-
+from .cache import LocalCache, TieredCache
+from .chargify import (
+    ChargifyTimeoutError,
+    ChargifyUnavailableError,
+    LazyChargifyHelper,
+)
+from .deadlines import remaining_time
+from .events import dispatch_event
+from .managers import ChargifySubscriptionManager, TrialCouponManager
+from .signals import diff_subscriptions, publish_changes
+from .singleflight import shared_lock, SingleFlight
+from .utils import project
+
+logger = logging.getLogger(__name__)
 User = get_user_model()
 
+# Options of the lock shared by the processes refreshing the same subscription,
+# overridden by the `CHARGIFY_REFRESH_LOCK` setting. Timeouts are in seconds.
+DEFAULT_REFRESH_LOCK = {
+    # Alias of the cache shared by the processes, in `CACHES`.
+    "alias": "default",
+    "timeout": 30,
+    # Beyond, waiting processes fetch the subscription themselves.
+    "wait": 10,
+}
+
+_refresh_flight = SingleFlight()
+
+# Options of the last known subscriptions kept when their cache is cleared, to
+# be served by every process while Chargify is unavailable, overridden by the
+# `CHARGIFY_LAST_KNOWN_CACHE` setting.
+DEFAULT_LAST_KNOWN_CACHE = {
+    # Alias of the cache shared by the processes, in `CACHES`.
+    "alias": "default",
+    "timeout": 24 * 60 * 60,
+}
+
+# Version of the subscriptions in the shared cache, to bump when the format of
+# what is cached changes.
+SUBSCRIPTION_SHARED_CACHE_VERSION = 1
+
+_subscription_local_cache = LocalCache()
+
+# Subfields kept from the blocks of the Chargify subscription which
+# `ChargifyProxy` returns whole, when the cache is projected.
+CACHE_PROJECTION_BLOCKS = {
+    "credit_card": (
+        "id",
+        "payment_type",
+        "card_type",
+        "masked_card_number",
+        "expiration_month",
+        "expiration_year",
+        "first_name",
+        "last_name",
+        "billing_country",
+        "billing_zip",
+    ),
+    "customer": (
+        "id",
+        "reference",
+        "first_name",
+        "last_name",
+        "email",
+        "organization",
+    ),
+    "paypal_account": ("id", "payment_type", "paypal_email"),
+    "product": (
+        "id",
+        "handle",
+        "name",
+        "price_in_cents",
+        "interval",
+        "interval_unit",
+    ),
+}
+
 
 class TrialCoupon(TimeStampedModel):
     number_of_days = models.PositiveIntegerField(
@@ -78,13 +155,37 @@ class TrialCoupon(TimeStampedModel):
         return duration
 
 
+def invalidate_trial_coupon_cache(sender, instance, **kwargs):
+    """
+    Receiver of `post_save` and `post_delete` of the concrete `TrialCoupon`
+    models, see `AppConfig.ready()`. The cache is cleared once the transaction
+    is committed: cleared before, concurrent readers could cache the previous
+    row again.
+    """
+    transaction.on_commit(sender.objects.clear_cache, using=kwargs.get("using"))
+
+
 ###################################################################################################
 # Field post-process functions                                                                    #
 ###################################################################################################
 def parse_date(string):
     try:
-        return parse(string)
+        return _parse_date(string)
+    except TypeError:  # Unhashable value
+        return ""
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_date(string):
+    # Chargify's timestamps are ISO 8601: try the fast, strict parser first.
+    try:
+        return datetime.datetime.fromisoformat(string)
     except (TypeError, ValueError):
+        pass
+
+    try:
+        return parse(string)
+    except (TypeError, ValueError, OverflowError):
         return ""
 
 
@@ -125,7 +226,14 @@ class ChargifySubscription(TimeStampedModel):
     hold_end_date = models.DateField("Date de reprise", null=True, blank=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
 
-    chargify_helper = ChargifyHelper()
+    chargify_helper = LazyChargifyHelper()
+
+    objects = ChargifySubscriptionManager()
+
+    # Whether the cache is a last-known payload served while Chargify is
+    # unavailable.
+    chargify_subscription_stale = False
+    _last_known_chargify_subscription = None
 
     class Meta:
         abstract = True
@@ -140,22 +248,124 @@ class ChargifySubscription(TimeStampedModel):
                 raise e
 
     def __str__(self):
-        if self.trialing:
+        # Rendered from what is at hand, without ever fetching the subscription.
+        state = self.get_cached_value("state")
+        trial_ended_at = parse_date(self.get_cached_value("trial_ended_at"))
+        if not state:
+            value = "ID: {id}".format(id=self.uuid)
+        elif state == self.STATES.trialing and trial_ended_at:
             value = "{state} - date de fin: {end} - coupon: {coupon}".format(
-                state=self.state,
-                end=self.trial_ended_at.strftime("%d/%m/%Y"),
+                state=state,
+                end=trial_ended_at.strftime("%d/%m/%Y"),
                 coupon=self.trial_coupon.codename,
             )
         else:
-            value = "{state} - ID: {id}".format(state=self.state, id=self.uuid)
+            value = "{state} - ID: {id}".format(state=state, id=self.uuid)
         return value
 
+    def get_cached_value(self, key):
+        """
+        Get `key` of the cached Chargify subscription without refreshing it:
+        the "cached_<key>" annotation of `for_list()`, else the loaded cache.
+        """
+        annotation = f"cached_{key}"
+        if annotation in self.__dict__:
+            return self.__dict__[annotation]
+        if "chargify_subscription_cache" in self.get_deferred_fields():
+            return None
+        return self.chargify_subscription_cache.get(key)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        if "chargify_subscription_cache" not in self.get_deferred_fields():
+            self.write_shared_caches([self])
+
+    def delete(self, *args, **kwargs):
+        shared_cache = self.get_shared_cache()
+        if shared_cache is not None:
+            key = self.get_shared_cache_key(self.uuid)
+            transaction.on_commit(lambda: shared_cache.delete(key))
+        return super().delete(*args, **kwargs)
+
+    @classmethod
+    def get_shared_cache(cls):
+        """
+        Get the `TieredCache` of the subscriptions, configured by the
+        `CHARGIFY_SUBSCRIPTION_SHARED_CACHE` setting, None when not set.
+        """
+        options = getattr(settings, "CHARGIFY_SUBSCRIPTION_SHARED_CACHE", None)
+        if options is None:
+            return None
+        return TieredCache(
+            _subscription_local_cache,
+            version=SUBSCRIPTION_SHARED_CACHE_VERSION,
+            **options,
+        )
+
+    @classmethod
+    def get_shared_cache_key(cls, uuid):
+        return f"chargify_subscription:{cls._meta.label_lower}:{uuid}"
+
+    @classmethod
+    def write_shared_caches(cls, subscriptions):
+        """
+        Write the caches of `subscriptions` through to the shared cache, once
+        the transaction is committed. Saving a subscription does it, bulk
+        updates must call it.
+        """
+        shared_cache = cls.get_shared_cache()
+        if shared_cache is None:
+            return
+
+        payloads = {
+            cls.get_shared_cache_key(s.uuid): s.chargify_subscription_cache
+            for s in subscriptions
+        }
+        filled = {key: payload for key, payload in payloads.items() if payload}
+        emptied = [key for key, payload in payloads.items() if not payload]
+
+        def write():
+            shared_cache.set_many(filled)
+            shared_cache.delete_many(emptied)
+
+        transaction.on_commit(write)
+
+    @classmethod
+    def get_cached_chargify_subscription(cls, uuid):
+        """
+        Get the `ChargifyProxy` of the subscription `uuid` from the shared
+        cache, without fetching its row, else from the database.
+        """
+        shared_cache = cls.get_shared_cache()
+        if shared_cache is not None:
+            chargify_subscription = shared_cache.get(cls.get_shared_cache_key(uuid))
+            if chargify_subscription:
+                return cls.ChargifyProxy(chargify_subscription)
+
+        subscription = cls.objects.get(uuid=uuid)
+        chargify_proxy = subscription.chargify_subscription
+        cls.write_shared_caches([subscription])
+        return chargify_proxy
+
     @property
     def chargify_subscription(self):
+        # Deferred, e.g. by `for_list()`: read the shared cache, if any,
+        # rather than the row.
+        if "chargify_subscription_cache" not in self.__dict__:
+            shared_cache = self.get_shared_cache()
+            if shared_cache is not None:
+                chargify_subscription = shared_cache.get(
+                    self.get_shared_cache_key(self.uuid)
+                )
+                if chargify_subscription:
+                    return self.ChargifyProxy(chargify_subscription)
+
         if not self.chargify_subscription_cache:
             # load the subscription and copy to cache
             self.refresh_chargify_subscription_cache()
-        chargify_proxy = self.ChargifyProxy(self.chargify_subscription_cache)
+        chargify_proxy = self.ChargifyProxy(
+            self.chargify_subscription_cache, stale=self.chargify_subscription_stale
+        )
         return chargify_proxy
 
     @property
@@ -241,7 +451,7 @@ class ChargifySubscription(TimeStampedModel):
 
     @property
     def running(self):
-        return self.state in (self.STATES.trialing, self.STATES.active, self.STATES.past_due)
+        return self.chargify_subscription.running
 
     @property
     def pending_cancellation(self):
@@ -276,16 +486,185 @@ class ChargifySubscription(TimeStampedModel):
             return False
 
     def refresh_chargify_subscription_cache(self, chargify_subscription=None):
-        self.chargify_subscription_cache = (
-            chargify_subscription
-            or self.chargify_helper.get_subscription(self.uuid)
-            or {}
+        """
+        Store `chargify_subscription`, else the subscription fetched from
+        Chargify, in the cache.
+
+        Concurrent refreshes of the same subscription share a single fetch and
+        save: within the process, callers wait for the refresh in flight and
+        get its result, and across processes, for the `CHARGIFY_REFRESH_LOCK`
+        holder, then take the subscription it fetched, if it succeeded.
+        """
+        if chargify_subscription:
+            self.chargify_subscription_stale = False
+            self._save_chargify_subscription_cache(chargify_subscription)
+            return
+
+        key = f"chargify_refresh:{self._meta.label_lower}:{self.uuid}"
+        try:
+            cache, stale = _refresh_flight.do(
+                key,
+                lambda: self._refresh_chargify_subscription_cache(key),
+                timeout=remaining_time(),
+            )
+        except FutureTimeoutError:
+            e = ChargifyTimeoutError(f"Refresh of subscription {self.uuid} too long.")
+            cache = self._get_last_known_chargify_subscription(e)
+            stale = True
+        if cache is not self.chargify_subscription_cache:
+            # Fetched for another instance, which may alter it.
+            cache = copy.deepcopy(cache)
+        self.chargify_subscription_cache = cache
+        self.chargify_subscription_stale = stale
+
+    def _refresh_chargify_subscription_cache(self, key):
+        options = dict(
+            DEFAULT_REFRESH_LOCK, **getattr(settings, "CHARGIFY_REFRESH_LOCK", {})
+        )
+        wait = options["wait"]
+        if remaining_time() is not None:
+            wait = min(wait, remaining_time())
+
+        # Subscription published by the process holding the lock, once it has
+        # fetched and saved it. Its row may not be committed yet.
+        result_key = f"{key}:result"
+        results = caches[options["alias"]]
+        with shared_lock(key, options["timeout"], wait, options["alias"]) as owned:
+            if not owned:
+                cache = results.get(result_key)
+                if cache:
+                    self.chargify_subscription_cache = cache
+                    self.chargify_subscription_stale = False
+                    return cache, False
+
+            # Published by an earlier refresh: not to be taken for this one.
+            results.delete(result_key)
+            try:
+                chargify_subscription = self.chargify_helper.get_subscription(self.uuid)
+            except ChargifyUnavailableError as e:
+                # Served but not saved, so that it can't be taken for fresh by
+                # the other processes or the next requests.
+                self.chargify_subscription_cache = (
+                    self._get_last_known_chargify_subscription(e)
+                )
+                self.chargify_subscription_stale = True
+                return self.chargify_subscription_cache, True
+
+            self.chargify_subscription_stale = False
+            self._save_chargify_subscription_cache(chargify_subscription)
+            results.set(result_key, self.chargify_subscription_cache, options["timeout"])
+
+        return self.chargify_subscription_cache, self.chargify_subscription_stale
+
+    def _get_last_known_chargify_subscription(self, e):
+        last_known = self._get_previous_chargify_subscription_cache()
+        if not last_known:
+            raise e
+        logger.warning(f"Serving the last known subscription {self.uuid}: {e}")
+        return last_known
+
+    def _get_previous_chargify_subscription_cache(self):
+        """
+        Get the cache, else the last one cleared, by this instance or another
+        one in any process.
+        """
+        if self.chargify_subscription_cache:
+            return self.chargify_subscription_cache
+        if self._last_known_chargify_subscription is None:
+            options = self.get_last_known_cache_options()
+            self._last_known_chargify_subscription = (
+                caches[options["alias"]].get(self.get_last_known_cache_key(self.uuid)) or {}
+            )
+        return self._last_known_chargify_subscription
+
+    @classmethod
+    def get_last_known_cache_options(cls):
+        return dict(
+            DEFAULT_LAST_KNOWN_CACHE,
+            **getattr(settings, "CHARGIFY_LAST_KNOWN_CACHE", {}),
         )
+
+    @classmethod
+    def get_last_known_cache_key(cls, uuid):
+        return f"chargify_last_known:{cls._meta.label_lower}:{uuid}"
+
+    def _save_chargify_subscription_cache(self, chargify_subscription):
+        previous = self._get_previous_chargify_subscription_cache()
+        self.chargify_subscription_cache = self.prepare_chargify_subscription_cache(
+            chargify_subscription or {}
+        )
+        with transaction.atomic():
+            self.save()
+            self.publish_chargify_subscription_changes(previous)
+        self._remember_chargify_subscription()
+
+    def _remember_chargify_subscription(self):
+        """
+        Keep the refreshed cache in the shared cache, to be served while
+        Chargify is unavailable by the instances loaded afterwards, in any
+        process.
+        """
         if not self.chargify_subscription_cache:
-            self.chargify_subscription_cache = {}
-        self.save()
+            return
+        options = self.get_last_known_cache_options()
+        caches[options["alias"]].set(
+            self.get_last_known_cache_key(self.uuid),
+            self.chargify_subscription_cache,
+            options["timeout"],
+        )
+
+    def publish_chargify_subscription_changes(self, previous):
+        """
+        Publish the changes between the `previous` cache and the current one,
+        see `signals.subscription_changed`.
+        """
+        publish_changes(
+            self, diff_subscriptions(previous, self.chargify_subscription_cache)
+        )
+
+    @classmethod
+    def get_chargify_subscription_cache_paths(cls):
+        """
+        Paths of the Chargify subscription kept in the projected cache: the
+        ones of `ChargifyProxy.attribute_lookup`, with the curated subfields of
+        `CACHE_PROJECTION_BLOCKS`, and `CHARGIFY_SUBSCRIPTION_CACHE_EXTRA_FIELDS`.
+        """
+        paths = {"id"}
+        for lookup in cls.ChargifyProxy.attribute_lookup.values():
+            path = lookup if isinstance(lookup, str) else lookup[0]
+            if path in CACHE_PROJECTION_BLOCKS:
+                paths.update(
+                    f"{path}__{field}" for field in CACHE_PROJECTION_BLOCKS[path]
+                )
+            else:
+                paths.add(path)
+        paths.update(
+            getattr(settings, "CHARGIFY_SUBSCRIPTION_CACHE_EXTRA_FIELDS", ())
+        )
+        return paths
+
+    @classmethod
+    def project_chargify_subscription(cls, chargify_subscription):
+        return project(
+            chargify_subscription, cls.get_chargify_subscription_cache_paths()
+        )
+
+    @classmethod
+    def prepare_chargify_subscription_cache(cls, chargify_subscription):
+        """
+        Get what is stored in the cache for `chargify_subscription`: its
+        projection with `CHARGIFY_SUBSCRIPTION_CACHE_PROJECTION`, else the
+        whole subscription.
+        """
+        if not getattr(settings, "CHARGIFY_SUBSCRIPTION_CACHE_PROJECTION", False):
+            return chargify_subscription
+        return cls.project_chargify_subscription(chargify_subscription)
 
     def clear_chargify_subscription_cache(self):
+        if self.chargify_subscription_cache:
+            # Kept to be served while Chargify is unavailable, by the next
+            # refreshes of this instance.
+            self._last_known_chargify_subscription = self.chargify_subscription_cache
         self.chargify_subscription_cache = {}
         self.save()
 
@@ -306,6 +685,13 @@ class ChargifySubscription(TimeStampedModel):
     def delete_payment_profile(self, payment_profile_id):
         self.chargify_helper.delete_payment_profile(self.uuid, payment_profile_id)
 
+    def dispatch_event(self, name, properties=None):
+        """
+        Dispatch an analytics event of the subscriber out of the request, see
+        `briefme_subscription.events`. Meant for the `track_*_event()` hooks.
+        """
+        dispatch_event(self.user_id, name, properties)
+
     def track_conversion_event(self, additional_properties=None):
         pass
 
@@ -354,8 +740,13 @@ class ChargifySubscription(TimeStampedModel):
             "total_revenue": ("total_revenue_in_cents", convert_price),
         }
 
-        def __init__(self, chargify_subscription):
+        def __init__(self, chargify_subscription, stale=False):
             self._chargify_subscription = chargify_subscription
+            self.stale = stale
+
+        @property
+        def running(self):
+            return self.state in ("trialing", "active", "past_due")
 
         def __getattribute__(self, item):
             try:
@@ -387,3 +778,119 @@ class ChargifySubscription(TimeStampedModel):
                 return value if value is not None else ""
             except AttributeError:
                 return ""
+
+
+class ChargifyTransaction(models.Model):
+    """
+    Local ledger of Chargify transactions, filled by `sync_transactions()`.
+    """
+
+    # Chargify's transaction id, see `ChargifySubscription.uuid`.
+    uuid = models.BigIntegerField(unique=True)
+    subscription_uuid = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    customer_uuid = models.PositiveIntegerField(null=True, blank=True)
+    transaction_type = models.CharField(max_length=50, db_index=True)
+    kind = models.CharField(max_length=50, blank=True)
+    amount_in_cents = models.BigIntegerField(default=0)
+    success = models.BooleanField(null=True)
+    memo = models.TextField(blank=True)
+    created_at = models.DateTimeField(db_index=True)
+    data = JSONField(default=dict, blank=True)
+
+    class Meta:
+        abstract = True
+        verbose_name = "transaction Chargify"
+        verbose_name_plural = "transactions Chargify"
+
+    def __str__(self):
+        return f"{self.transaction_type} - {self.amount} - ID: {self.uuid}"
+
+    @property
+    def amount(self):
+        return convert_price(self.amount_in_cents)
+
+    @classmethod
+    def from_chargify(cls, transaction):
+        return cls(
+            uuid=transaction["id"],
+            subscription_uuid=transaction.get("subscription_id"),
+            customer_uuid=transaction.get("customer_id"),
+            transaction_type=transaction.get("transaction_type") or "",
+            kind=transaction.get("kind") or "",
+            amount_in_cents=transaction.get("amount_in_cents") or 0,
+            success=transaction.get("success"),
+            memo=transaction.get("memo") or "",
+            created_at=parse(transaction["created_at"]),
+            data=transaction,
+        )
+
+
+class ChargifySyncCursor(TimeStampedModel):
+    """
+    Position of an incremental synchronization of Chargify data: the id of the
+    last synchronized item.
+    """
+
+    name = models.SlugField(unique=True)
+    last_id = models.BigIntegerField(null=True, blank=True)
+
+    class Meta:
+        abstract = True
+        verbose_name = "curseur de synchronisation Chargify"
+        verbose_name_plural = "curseurs de synchronisation Chargify"
+
+    def __str__(self):
+        return f"{self.name} - dernier ID: {self.last_id}"
+
+
+class SubscriptionMetricsSnapshot(models.Model):
+    """
+    Daily metrics of the subscriptions of a product, interval and state,
+    written by `reporting.take_snapshot()` for the dashboards.
+    """
+
+    date = models.DateField(db_index=True)
+    product_handle = models.CharField(max_length=255, blank=True)
+    interval = models.PositiveIntegerField(null=True, blank=True)
+    interval_unit = models.CharField(max_length=10, blank=True)
+    state = models.CharField(max_length=50, blank=True)
+    count = models.PositiveIntegerField(default=0)
+    billing_amount_in_cents = models.BigIntegerField(default=0)
+    mrr_in_cents = models.BigIntegerField(default=0)
+    canceled = models.PositiveIntegerField(default=0)
+    trials_ended = models.PositiveIntegerField(default=0)
+    converted = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+        verbose_name = "instantané des métriques d'abonnement"
+        verbose_name_plural = "instantanés des métriques d'abonnement"
+
+    def __str__(self):
+        return f"{self.date} - {self.product_handle} - {self.state}: {self.count}"
+
+    @property
+    def mrr(self):
+        return convert_price(self.mrr_in_cents)
+
+
+class SubscriptionChange(models.Model):
+    """
+    Append-only outbox of the changes of the subscriptions, see
+    `signals.publish_changes()`. Consumers process the rows by increasing id,
+    e.g. keeping their position in a `ChargifySyncCursor`.
+    """
+
+    subscription_uuid = models.PositiveIntegerField(db_index=True)
+    kind = models.CharField(max_length=50)
+    previous = JSONField(null=True, blank=True)
+    current = JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        abstract = True
+        verbose_name = "changement d'abonnement"
+        verbose_name_plural = "changements d'abonnement"
+
+    def __str__(self):
+        return f"{self.kind} - ID: {self.subscription_uuid}"
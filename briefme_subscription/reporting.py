@@ -0,0 +1,152 @@
+"""
+Subscription metrics aggregated by PostgreSQL over the cached Chargify
+subscriptions, without loading them, and their daily snapshots.
+
+Rows are grouped by product handle, billing interval and state. The period
+metrics count the cancellations and the ends of trials which happened within
+the period, the others describe the subscriptions as they are now.
+"""
+import collections
+import datetime
+
+from django.db import models, transaction
+from django.db.models import Count, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .expressions import cached_text, cached_value
+
+PAYING_STATES = ("active", "past_due")
+RUNNING_STATES = ("trialing",) + PAYING_STATES
+
+# Length in months of each Chargify interval unit, to compute the MRR.
+MONTHS_PER_INTERVAL_UNIT = {"month": 1, "day": 12 / 365}
+
+MetricsRow = collections.namedtuple(
+    "MetricsRow",
+    [
+        "product_handle",
+        "interval",
+        "interval_unit",
+        "state",
+        "count",
+        "billing_amount_in_cents",
+        "mrr_in_cents",
+        "canceled",
+        "trials_ended",
+        "converted",
+    ],
+)
+
+
+def subscription_metrics(queryset, start=None, end=None):
+    """
+    Aggregate the subscriptions of `queryset` into `MetricsRow`s, with the
+    period metrics counted between the `start` and `end` datetimes.
+    """
+    groups = (
+        queryset.annotate(
+            _product_handle=_text("product__handle"),
+            _interval=cached_value("product__interval", models.IntegerField()),
+            _interval_unit=_text("product__interval_unit"),
+            _state=_text("state"),
+            _amount_in_cents=cached_value(
+                "current_billing_amount_in_cents", models.BigIntegerField()
+            ),
+            _canceled_at=cached_value("canceled_at", models.DateTimeField()),
+            _trial_ended_at=cached_value("trial_ended_at", models.DateTimeField()),
+        )
+        .order_by()
+        .values("_product_handle", "_interval", "_interval_unit", "_state")
+        .annotate(
+            count=Count("pk"),
+            billing_amount_in_cents=Coalesce(Sum("_amount_in_cents"), Value(0)),
+            canceled=Count("pk", filter=_within("_canceled_at", start, end)),
+            trials_ended=Count("pk", filter=_within("_trial_ended_at", start, end)),
+        )
+        .order_by("_product_handle", "_interval", "_interval_unit", "_state")
+    )
+
+    rows = []
+    for group in groups:
+        state = group["_state"]
+        rows.append(
+            MetricsRow(
+                product_handle=group["_product_handle"],
+                interval=group["_interval"],
+                interval_unit=group["_interval_unit"],
+                state=state,
+                count=group["count"],
+                billing_amount_in_cents=group["billing_amount_in_cents"],
+                mrr_in_cents=_get_mrr_in_cents(group) if state in PAYING_STATES else 0,
+                canceled=group["canceled"],
+                trials_ended=group["trials_ended"],
+                # Trials which ended in the period and are paying now.
+                converted=group["trials_ended"] if state in PAYING_STATES else 0,
+            )
+        )
+    return rows
+
+
+def _text(path):
+    return Coalesce(cached_text(path), Value(""), output_field=models.TextField())
+
+
+def _within(field, start, end):
+    condition = Q(**{f"{field}__isnull": False})
+    if start:
+        condition &= Q(**{f"{field}__gte": start})
+    if end:
+        condition &= Q(**{f"{field}__lt": end})
+    return condition
+
+
+def _get_mrr_in_cents(group):
+    months = MONTHS_PER_INTERVAL_UNIT.get(group["_interval_unit"])
+    if not months or not group["_interval"]:
+        return 0
+    return round(group["billing_amount_in_cents"] / (group["_interval"] * months))
+
+
+def mrr(rows):
+    """Monthly recurring revenue, in euros, of the `MetricsRow`s."""
+    return sum(row.mrr_in_cents for row in rows) / 100
+
+
+def churn_rate(rows):
+    """
+    Cancellations of the period over the subscriptions running now and the
+    ones canceled in the period.
+    """
+    canceled = sum(row.canceled for row in rows)
+    running = sum(row.count for row in rows if row.state in RUNNING_STATES)
+    return canceled / (running + canceled) if running + canceled else 0
+
+
+def trial_conversion_rate(rows):
+    """Share of the trials ended in the period which are paying now."""
+    trials_ended = sum(row.trials_ended for row in rows)
+    converted = sum(row.converted for row in rows)
+    return converted / trials_ended if trials_ended else 0
+
+
+def take_snapshot(subscription_model, snapshot_model, date=None):
+    """
+    Store the metrics of the subscriptions on `date`, today by default, in
+    `snapshot_model`, a concrete `SubscriptionMetricsSnapshot`, replacing the
+    rows of a previous snapshot of that date. Return the number of rows.
+    """
+    date = date or timezone.localdate()
+    start = timezone.make_aware(datetime.datetime.combine(date, datetime.time.min))
+    rows = subscription_metrics(
+        subscription_model.objects.all(),
+        start=start,
+        end=start + datetime.timedelta(days=1),
+    )
+
+    with transaction.atomic():
+        snapshot_model.objects.filter(date=date).delete()
+        snapshot_model.objects.bulk_create(
+            snapshot_model(date=date, **row._asdict()) for row in rows
+        )
+    return len(rows)
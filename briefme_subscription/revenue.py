@@ -0,0 +1,222 @@
+"""
+Revenue analytics over the streamed invoices.
+
+Each page of invoices is converted into columns of 64-bit integers, with
+amounts in cents, then aggregated into running totals: memory is bounded by
+the size of a page whatever the number of invoices. Columns are aggregated
+with NumPy when it is installed, with the "revenue" extra, else in Python.
+"""
+import array
+import collections
+import datetime
+
+from django.utils import timezone
+
+from .chargify import ChargifyHelper
+from .deadlines import BATCH
+from .utils import to_cents
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Totals in cents of the invoice line items, by issue month ("YYYY-MM"), product
+# id and billing country, refunds by issue month, and revenue of the service
+# periods remaining after the `as_of` date. Invoices without a valid issue date
+# are left out, and counted in `undated_invoices`.
+RevenueReport = collections.namedtuple(
+    "RevenueReport",
+    [
+        "by_month",
+        "by_product",
+        "by_country",
+        "refunds_by_month",
+        "deferred_in_cents",
+        "line_items",
+        "undated_invoices",
+    ],
+)
+
+
+def to_ordinal(value, default):
+    try:
+        return datetime.date.fromisoformat(value[:10]).toordinal()
+    except (TypeError, ValueError):
+        return default
+
+
+class RevenueAggregator:
+    """
+    Aggregate the pages of invoices given to `add_page()`, then get the
+    `RevenueReport` with `report()`.
+
+    The deferred revenue is the part of the line items issued up to `as_of`,
+    today by default, whose service period ends after it, prorated by day.
+    Service periods include their last day.
+    """
+
+    def __init__(self, as_of=None):
+        self.as_of = (as_of or timezone.localdate()).toordinal()
+        self.by_month = collections.Counter()
+        self.by_product = collections.Counter()
+        self.by_country = collections.Counter()
+        self.refunds_by_month = collections.Counter()
+        self.deferred_in_cents = 0
+        self.line_items = 0
+        self.undated_invoices = 0
+        # Countries are coded as integers in the columns.
+        self.country_codes = {}
+
+    def add_page(self, invoices):
+        line_items, refunds = self.get_columns(invoices)
+        if numpy is not None:
+            self._aggregate_with_numpy(line_items, refunds)
+        else:
+            self._aggregate(line_items, refunds)
+        self.line_items += len(line_items["cents"])
+
+    def get_columns(self, invoices):
+        """
+        Get the columns of the line items and of the refunds of `invoices`,
+        as `array`s of 64-bit integers. Months are coded as YYYYMM.
+        """
+        line_items = {
+            name: array.array("q")
+            for name in (
+                "month",
+                "product",
+                "country",
+                "cents",
+                "issued",
+                "start",
+                "end",
+            )
+        }
+        refunds = {name: array.array("q") for name in ("month", "cents")}
+
+        for invoice in invoices:
+            issue_date = invoice.get("issue_date")
+            issued = to_ordinal(issue_date, None)
+            if issued is None:
+                self.undated_invoices += 1
+                continue
+            month = int(issue_date[:4] + issue_date[5:7])
+            country = (invoice.get("billing_address") or {}).get("country") or ""
+            country_code = self.country_codes.setdefault(
+                country, len(self.country_codes)
+            )
+
+            for line_item in invoice.get("line_items") or ():
+                line_items["month"].append(month)
+                line_items["product"].append(line_item.get("product_id") or 0)
+                line_items["country"].append(country_code)
+                line_items["cents"].append(to_cents(line_item.get("total_amount")))
+                line_items["issued"].append(issued)
+                start = to_ordinal(line_item.get("period_range_start"), issued)
+                line_items["start"].append(start)
+                end = to_ordinal(line_item.get("period_range_end"), start)
+                line_items["end"].append(max(end, start))
+
+            refund_cents = to_cents(invoice.get("refund_amount"))
+            if refund_cents:
+                refunds["month"].append(month)
+                refunds["cents"].append(refund_cents)
+
+        return line_items, refunds
+
+    def _aggregate(self, line_items, refunds):
+        for month, product, country, cents, issued, start, end in zip(
+            *(line_items[name] for name in line_items)
+        ):
+            self.by_month[month] += cents
+            self.by_product[product] += cents
+            self.by_country[country] += cents
+            if issued <= self.as_of < end:
+                remaining = end - max(start - 1, self.as_of)
+                self.deferred_in_cents += cents * remaining // (end - start + 1)
+
+        for month, cents in zip(refunds["month"], refunds["cents"]):
+            self.refunds_by_month[month] += cents
+
+    def _aggregate_with_numpy(self, line_items, refunds):
+        # Zero-copy views of the arrays.
+        columns = {
+            name: numpy.frombuffer(column, dtype=numpy.int64)
+            for name, column in line_items.items()
+        }
+        cents = columns["cents"]
+        for totals, name in (
+            (self.by_month, "month"),
+            (self.by_product, "product"),
+            (self.by_country, "country"),
+        ):
+            self._add_sums(totals, columns[name], cents)
+
+        deferred = (columns["issued"] <= self.as_of) & (columns["end"] > self.as_of)
+        start, end = columns["start"][deferred], columns["end"][deferred]
+        remaining = end - numpy.maximum(start - 1, self.as_of)
+        self.deferred_in_cents += int(
+            (cents[deferred] * remaining // (end - start + 1)).sum()
+        )
+
+        self._add_sums(
+            self.refunds_by_month,
+            numpy.frombuffer(refunds["month"], dtype=numpy.int64),
+            numpy.frombuffer(refunds["cents"], dtype=numpy.int64),
+        )
+
+    @staticmethod
+    def _add_sums(totals, keys, cents):
+        if not len(keys):
+            return
+        unique_keys, indices = numpy.unique(keys, return_inverse=True)
+        sums = numpy.zeros(len(unique_keys), dtype=numpy.int64)
+        numpy.add.at(sums, indices, cents)
+        for key, total in zip(unique_keys.tolist(), sums.tolist()):
+            totals[key] += total
+
+    def report(self):
+        countries = {code: country for country, code in self.country_codes.items()}
+        return RevenueReport(
+            by_month={
+                f"{month // 100:04d}-{month % 100:02d}": cents
+                for month, cents in sorted(self.by_month.items())
+            },
+            by_product=dict(self.by_product),
+            by_country={
+                countries[code]: cents for code, cents in self.by_country.items()
+            },
+            refunds_by_month={
+                f"{month // 100:04d}-{month % 100:02d}": cents
+                for month, cents in sorted(self.refunds_by_month.items())
+            },
+            deferred_in_cents=self.deferred_in_cents,
+            line_items=self.line_items,
+            undated_invoices=self.undated_invoices,
+        )
+
+
+def revenue_report(
+    start_date=None,
+    end_date=None,
+    as_of=None,
+    per_page=200,
+    chargify_helper=None,
+):
+    """
+    Get the `RevenueReport` of the invoices issued between `start_date` and
+    `end_date`, inclusive, fetched page by page from Chargify.
+    """
+    chargify_helper = chargify_helper or ChargifyHelper(timeout_category=BATCH)
+
+    filters = {"per_page": per_page, "date_field": "issue_date", "line_items": "true"}
+    if start_date:
+        filters["start_date"] = start_date.isoformat()
+    if end_date:
+        filters["end_date"] = end_date.isoformat()
+
+    aggregator = RevenueAggregator(as_of=as_of)
+    for invoices in chargify_helper.get_invoices(**filters):
+        aggregator.add_page(invoices)
+    return aggregator.report()
@@ -0,0 +1,113 @@
+"""
+Changes of the Chargify subscriptions, detected by diffing their cache when
+it is refreshed, on access or from a webhook.
+
+Receivers of `subscription_changed` get the concrete subscription model as
+`sender`, the `subscription` and its `changes`, a list of `Change`s:
+
+    @receiver(subscription_changed)
+    def update_entitlements(sender, subscription, changes, **kwargs):
+        ...
+
+When the `SUBSCRIPTION_CHANGE_OUTBOX_MODEL` setting names a concrete
+`SubscriptionChange`, changes are also appended to it, in the transaction
+saving the subscription.
+"""
+import collections
+
+from django.conf import settings
+from django.dispatch import Signal
+
+from .utils import get_model_from_setting
+
+STATE_CHANGED = "state_changed"
+PRODUCT_CHANGED = "product_changed"
+PENDING_CANCELLATION_CHANGED = "pending_cancellation_changed"
+CARD_UPDATED = "card_updated"
+
+# Paths of the Chargify subscription compared for each kind of change.
+WATCHED_PATHS = {
+    STATE_CHANGED: ("state",),
+    PRODUCT_CHANGED: ("product__handle",),
+    PENDING_CANCELLATION_CHANGED: ("cancel_at_end_of_period",),
+    CARD_UPDATED: (
+        "credit_card__id",
+        "credit_card__masked_card_number",
+        "credit_card__expiration_month",
+        "credit_card__expiration_year",
+    ),
+}
+
+Change = collections.namedtuple("Change", ["kind", "previous", "current"])
+
+subscription_changed = Signal()
+
+
+def _get_value(chargify_subscription, path):
+    value = chargify_subscription
+    for key in path.split("__"):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def _get_values(chargify_subscription, paths):
+    values = [_get_value(chargify_subscription, path) for path in paths]
+    return values[0] if len(values) == 1 else values
+
+
+def _normalize(value):
+    """
+    Get `value` comparable whether the payload comes from the API or from a
+    webhook, which gives every value as a string, and "" for null.
+    """
+    if isinstance(value, list):
+        return [_normalize(v) for v in value]
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool):
+        return value
+    return str(value)
+
+
+def diff_subscriptions(previous, current):
+    """
+    Get the `Change`s between two payloads of a Chargify subscription. There
+    are none without a `previous` payload, on the first load.
+    """
+    if not previous or not current:
+        return []
+
+    changes = []
+    for kind, paths in WATCHED_PATHS.items():
+        previous_value = _get_values(previous, paths)
+        current_value = _get_values(current, paths)
+        if _normalize(previous_value) != _normalize(current_value):
+            changes.append(Change(kind, previous_value, current_value))
+    return changes
+
+
+def publish_changes(subscription, changes):
+    """
+    Append the `changes` of `subscription` to the outbox, if any, and send
+    `subscription_changed`.
+    """
+    if not changes:
+        return
+
+    if getattr(settings, "SUBSCRIPTION_CHANGE_OUTBOX_MODEL", None):
+        outbox_model = get_model_from_setting("SUBSCRIPTION_CHANGE_OUTBOX_MODEL")
+        outbox_model.objects.bulk_create(
+            outbox_model(
+                subscription_uuid=subscription.uuid,
+                kind=change.kind,
+                previous=change.previous,
+                current=change.current,
+            )
+            for change in changes
+        )
+
+    subscription_changed.send(
+        sender=type(subscription), subscription=subscription, changes=changes
+    )
@@ -0,0 +1,87 @@
+"""
+Coalescing of concurrent calls doing the same work, e.g. refreshing the same
+subscription: within the process with `SingleFlight`, across processes with
+`shared_lock()`.
+"""
+import contextlib
+import threading
+import time
+import uuid
+
+from concurrent.futures import Future
+
+from django.core.cache import caches
+
+
+class SingleFlight:
+    """
+    Run a single call at a time per key: callers arriving while a call with
+    the same key is in flight wait for it and share its result, or exception.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function, timeout=None):
+        """
+        Call `function` for `key`, or wait at most `timeout` seconds for the
+        call in flight and get its result. Raise `TimeoutError` of
+        `concurrent.futures` when the wait times out.
+        """
+        with self._lock:
+            leader = key not in self._calls
+            if leader:
+                self._calls[key] = (Future(), threading.get_ident())
+            call, thread = self._calls[key]
+
+        if not leader:
+            # A reentrant call would wait for itself.
+            if thread == threading.get_ident():
+                return function()
+            return call.result(timeout)
+
+        try:
+            result = function()
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+@contextlib.contextmanager
+def shared_lock(key, timeout=30, wait=10, alias="default", poll_interval=0.05):
+    """
+    Lock shared by the processes through the `alias` cache, held at most
+    `timeout` seconds.
+
+    Yield True when the caller should do the work: the lock was acquired, or
+    waiting `wait` seconds for its holder timed out. Yield False once the
+    holder has released it: the work has just been done, or has failed.
+
+    The lock is released as soon as the block exits, even within a transaction
+    which may still be rolled back: the holder should publish its result for
+    the waiters, rather than have them read what it wrote.
+    """
+    cache = caches[alias]
+    token = uuid.uuid4().hex
+    if cache.add(key, token, timeout):
+        try:
+            yield True
+        finally:
+            if cache.get(key) == token:
+                cache.delete(key)
+        return
+
+    expires_at = time.monotonic() + wait
+    while cache.get(key) is not None:
+        if time.monotonic() >= expires_at:
+            yield True
+            return
+        time.sleep(poll_interval)
+    yield False
@@ -0,0 +1,64 @@
+"""
+Incremental synchronization of Chargify data into local tables.
+"""
+import logging
+
+from django.db import transaction
+
+from .chargify import ChargifyHelper
+from .deadlines import BATCH
+
+logger = logging.getLogger(__name__)
+
+
+def sync_transactions(
+    transaction_model,
+    cursor_model,
+    cursor_name="transactions",
+    since_date=None,
+    batch_size=500,
+    chargify_helper=None,
+):
+    """
+    Copy the Chargify transactions created since the last synchronization
+    into `transaction_model`, a concrete `ChargifyTransaction`.
+
+    The id of the last copied transaction is persisted in the `cursor_name`
+    row of `cursor_model`, a concrete `ChargifySyncCursor`, after each batch:
+    an interrupted synchronization resumes where it stopped. `since_date` only
+    applies to the first synchronization.
+
+    Return the number of copied transactions.
+    """
+    chargify_helper = chargify_helper or ChargifyHelper(timeout_category=BATCH)
+    cursor, _ = cursor_model.objects.get_or_create(name=cursor_name)
+    last_id = cursor.last_id
+    if last_id:
+        since_date = None
+
+    count = 0
+    batch = []
+    for chargify_transaction in chargify_helper.get_transactions(
+        since_id=last_id, since_date=since_date
+    ):
+        # `since_id` is inclusive: the last copied transaction comes again.
+        if last_id and chargify_transaction["id"] <= last_id:
+            continue
+        batch.append(transaction_model.from_chargify(chargify_transaction))
+        if len(batch) >= batch_size:
+            count += _save_transactions(transaction_model, cursor, batch)
+            batch = []
+
+    if batch:
+        count += _save_transactions(transaction_model, cursor, batch)
+
+    logger.info(f"{count} Chargify transactions synchronized up to {cursor.last_id}")
+    return count
+
+
+def _save_transactions(transaction_model, cursor, batch):
+    with transaction.atomic():
+        transaction_model.objects.bulk_create(batch, ignore_conflicts=True)
+        cursor.last_id = max(t.uuid for t in batch)
+        cursor.save()
+    return len(batch)
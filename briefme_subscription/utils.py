@@ -0,0 +1,59 @@
+from decimal import Decimal, DecimalException, ROUND_HALF_UP
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+
+def get_model_from_setting(setting_name):
+    """
+    Get the concrete model whose "app_label.ModelName" is given by the
+    `setting_name` setting, the same way `get_user_model()` does.
+    """
+    model_path = getattr(settings, setting_name, None)
+    if not model_path:
+        raise ImproperlyConfigured(f"The {setting_name} setting must be set.")
+
+    try:
+        return apps.get_model(model_path, require_ready=False)
+    except ValueError:
+        raise ImproperlyConfigured(
+            f"{setting_name} must be of the form 'app_label.model_name'"
+        )
+    except LookupError:
+        raise ImproperlyConfigured(
+            f"{setting_name} refers to model '{model_path}' that has not been installed"
+        )
+
+
+def project(document, paths):
+    """
+    Copy of the nested dict `document` keeping only `paths`, whose keys are
+    separated by "__" like `ChargifyProxy.attribute_lookup`'s. Missing paths
+    are skipped.
+    """
+    projection = {}
+    for path in paths:
+        keys = path.split("__")
+        source, target = document, projection
+        for key in keys[:-1]:
+            source = source.get(key)
+            if not isinstance(source, dict):
+                break
+            target = target.setdefault(key, {})
+        else:
+            if keys[-1] in source:
+                target[keys[-1]] = source[keys[-1]]
+    return projection
+
+
+def to_cents(value):
+    """
+    Convert an amount given as a decimal string, e.g. "58.80", to cents,
+    rounded half up. Invalid amounts are 0.
+    """
+    try:
+        cents = Decimal(str(value)).scaleb(2).quantize(Decimal(1), ROUND_HALF_UP)
+    except (DecimalException, TypeError, ValueError):
+        return 0
+    return int(cents)
@@ -0,0 +1,46 @@
+import datetime
+
+from django.contrib.auth.mixins import UserPassesTestMixin
+from django.http import HttpResponseBadRequest
+from django.views import View
+
+from ..exports import EXPORT_FORMATS, invoice_export_response
+
+
+class InvoiceExportView(UserPassesTestMixin, View):
+    """
+    Let staff members download the invoices export.
+
+    Query parameters: `start_date` & `end_date` (YYYY-MM-DD), `date_field`,
+    `status`, `format` (`csv` or `jsonl`) and `gzip` (`1` to compress).
+    """
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.GET.get("format", "csv")
+        if export_format not in EXPORT_FORMATS:
+            return HttpResponseBadRequest("Unknown export format.")
+
+        try:
+            start_date = self._get_date("start_date")
+            end_date = self._get_date("end_date")
+        except ValueError:
+            return HttpResponseBadRequest("Dates must be formatted as YYYY-MM-DD.")
+
+        return invoice_export_response(
+            filename="invoices",
+            export_format=export_format,
+            compress=request.GET.get("gzip") == "1",
+            start_date=start_date,
+            end_date=end_date,
+            status=request.GET.get("status"),
+            date_field=request.GET.get("date_field", "issue_date"),
+        )
+
+    def _get_date(self, name):
+        value = self.request.GET.get(name)
+        if not value:
+            return None
+        return datetime.datetime.strptime(value, "%Y-%m-%d").date()
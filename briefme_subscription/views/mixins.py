@@ -1,5 +1,7 @@
 import logging
 
+from ..deadlines import deadline
+
 logger = logging.getLogger(__name__)
 
 
@@ -25,3 +27,19 @@ class AddCurrentSubscriptionMixin:
         context = super().get_context_data(**kwargs)
         context["current_subscription"] = self.current_subscription
         return context
+
+
+class ChargifyDeadlineMixin:
+    """
+    Give the calls to Chargify made while serving the request at most
+    `chargify_deadline` seconds in total.
+    """
+
+    chargify_deadline = None
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.chargify_deadline is None:
+            return super().dispatch(request, *args, **kwargs)
+
+        with deadline(self.chargify_deadline):
+            return super().dispatch(request, *args, **kwargs)
@@ -8,7 +8,12 @@ setup(
     author="Brief.me",
     author_email="tech@brief.me",
     license="None",
-    packages=["briefme_subscription", "briefme_subscription.views"],
+    packages=[
+        "briefme_subscription",
+        "briefme_subscription.management",
+        "briefme_subscription.management.commands",
+        "briefme_subscription.views",
+    ],
     python_requires=">=3.7",
     install_requires=[
         "analytics-python>=1.3.0,<2",
@@ -16,6 +21,7 @@ setup(
         "django-model-utils>=4,<5",
         "python-dateutil>=2.8,<3",
     ],
+    extras_require={"revenue": ["numpy>=1.17"]},
     classifiers=[
         "Environment :: Web Environment",
         "Framework :: Django",
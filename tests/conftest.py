@@ -2,12 +2,39 @@ import json
 import logging
 import pytest
 
-from briefme_subscription.chargify import ChargifyHelper
+from briefme_subscription import chargify
+from briefme_subscription.chargify import ChargifyHelper, get_circuit_breaker
 from .factories import ChargifySubscriptionFactory, UserFactory
+from .models import TrialCoupon
+from .fake_chargify import (
+    FakeChargifyApp,
+    FakeChargifyClient,
+    FakeChargifyServer,
+    InProcessTransport,
+)
 
 logger = logging.getLogger(__name__)
 
 
+@pytest.fixture(autouse=True)
+def reset_circuit_breaker():
+    yield
+    get_circuit_breaker().reset()
+
+
+@pytest.fixture(autouse=True)
+def clear_trial_coupon_cache():
+    """The cache would outlive the coupons rolled back with the test."""
+    yield
+    TrialCoupon.objects.clear_cache()
+
+
+@pytest.fixture(autouse=True)
+def reset_chargify_helper(mocker):
+    """Don't let the shared `ChargifyHelper` keep the client of another test."""
+    mocker.patch.object(chargify, "_chargify_helper", None)
+
+
 @pytest.fixture
 def mock_chargify_helper(mocker):
     mocker.patch.object(
@@ -41,3 +68,22 @@ def subscription_with_state(mocker, state):
     subscription.refresh_chargify_subscription_cache()
 
     return subscription
+
+
+@pytest.fixture
+def fake_chargify(mocker):
+    """Route the Chargify client of new `ChargifyHelper` to an in-process fake site."""
+    app = FakeChargifyApp(customers=50, billing_periods=3)
+    mocker.patch(
+        "briefme_subscription.chargify.get_chargify_python",
+        return_value=FakeChargifyClient(InProcessTransport(app)),
+    )
+    return app
+
+
+@pytest.fixture
+def fake_chargify_server(fake_chargify, settings):
+    """Also serve the fake site on localhost for the raw HTTP calls."""
+    with FakeChargifyServer(fake_chargify) as server:
+        settings.CHARGIFY_SUBDOMAIN = server.url
+        yield server
@@ -0,0 +1,20 @@
+"""
+Fake Chargify site, usable in-process or on localhost, for offline tests,
+load tests and benchmarks.
+
+    app = FakeChargifyApp(customers=5000, faults=Faults(latency=0.05))
+    client = FakeChargifyClient(InProcessTransport(app))
+
+    with FakeChargifyServer(app) as server:
+        requests.get(server.url + "/subscriptions.json")
+"""
+from .app import FakeChargifyApp, FakeResponse, Faults
+from .client import FakeChargifyClient, HttpTransport, InProcessTransport
+from .dataset import (
+    FakeDataset,
+    PAYING_PRODUCT_HANDLES,
+    TRIAL_PRODUCT_HANDLE,
+    seed_dataset,
+)
+from .errors import CHARGIFY_ERRORS
+from .server import FakeChargifyServer
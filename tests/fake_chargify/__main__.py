@@ -0,0 +1,45 @@
+"""
+Run the fake Chargify site on localhost:
+
+    python -m tests.fake_chargify --port 8765 --customers 20000 --latency 0.08
+"""
+import argparse
+
+from .app import FakeChargifyApp, Faults
+from .server import FakeChargifyServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Chargify API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--customers", type=int, default=1000)
+    parser.add_argument("--billing-periods", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--latency", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--throttle-rate", type=float, default=0)
+    args = parser.parse_args()
+
+    faults = Faults(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        seed=args.seed,
+    )
+    app = FakeChargifyApp(
+        faults=faults,
+        customers=args.customers,
+        billing_periods=args.billing_periods,
+        seed=args.seed,
+    )
+    server = FakeChargifyServer(app, host=args.host, port=args.port)
+    print("Fake Chargify listening on %s" % server.url)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,579 @@
+"""
+Transport-agnostic fake of the Chargify API v1.
+
+`FakeChargifyApp.handle()` takes a method, a path and the decoded query and
+body and returns a `FakeResponse`. It is served either in-process through
+`FakeChargifyClient` or over HTTP through `FakeChargifyServer`.
+"""
+import collections
+import copy
+import datetime
+import random
+import re
+import threading
+import time
+
+from .dataset import isoformat, seed_dataset, TIMEZONE
+
+FakeResponse = collections.namedtuple("FakeResponse", ["status", "payload", "headers"])
+
+DEFAULT_PER_PAGE = 20
+MAX_PER_PAGE = 200
+
+
+def now():
+    return datetime.datetime.now(TIMEZONE)
+
+
+def not_found():
+    return FakeResponse(404, {"errors": ["Not Found"]}, {})
+
+
+def unprocessable(*errors):
+    return FakeResponse(422, {"errors": list(errors)}, {})
+
+
+def ok(payload, status=200):
+    return FakeResponse(status, payload, {})
+
+
+def wrap(name, items):
+    return [{name: item} for item in items]
+
+
+def paginate(items, query, default_per_page=DEFAULT_PER_PAGE):
+    if default_per_page is None and "per_page" not in query and "page" not in query:
+        return items
+    page = max(int(query.get("page", 1)), 1)
+    per_page = min(int(query.get("per_page", default_per_page or DEFAULT_PER_PAGE)), MAX_PER_PAGE)
+    start = (page - 1) * per_page
+    return items[start : start + per_page]
+
+
+def sort_items(items, query, key="id", default_direction="asc"):
+    direction = query.get("direction", default_direction)
+    return sorted(items, key=lambda item: item[key], reverse=direction == "desc")
+
+
+class Faults:
+    """
+    Latency, error and throttling injection settings.
+
+    `latency` is either a number of seconds or a `(min, max)` range,
+    `error_rate` and `throttle_rate` are probabilities between 0 and 1.
+    `fail_next()` forces the next calls to answer with a given status.
+    """
+
+    def __init__(self, latency=0, error_rate=0, throttle_rate=0, retry_after=1, seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self._scheduled = collections.deque()
+        self._lock = threading.Lock()
+
+    def fail_next(self, status=500, times=1):
+        with self._lock:
+            self._scheduled.extend([status] * times)
+
+    def delay(self):
+        if isinstance(self.latency, (tuple, list)):
+            return self.random.uniform(*self.latency)
+        return self.latency
+
+    def inject(self):
+        """
+        Sleep for the configured latency and return a failure response, if
+        any should be returned instead of the actual one.
+        """
+        delay = self.delay()
+        if delay:
+            time.sleep(delay)
+
+        with self._lock:
+            status = self._scheduled.popleft() if self._scheduled else None
+            draw = self.random.random()
+
+        if status is None and draw < self.throttle_rate:
+            status = 429
+        elif status is None and draw < self.throttle_rate + self.error_rate:
+            status = 500
+
+        if status == 429:
+            return FakeResponse(
+                429,
+                {"errors": ["Too Many Requests"]},
+                {"Retry-After": str(self.retry_after)},
+            )
+        if status is not None:
+            return FakeResponse(status, {"errors": ["Internal Server Error"]}, {})
+        return None
+
+
+class FakeChargifyApp:
+    """
+    In-memory Chargify site.
+
+    Every handled call is recorded in `calls` as a `(method, path)` tuple,
+    which lets tests and benchmarks count round trips.
+    """
+
+    def __init__(self, dataset=None, faults=None, **seed_options):
+        self.dataset = dataset if dataset is not None else seed_dataset(**seed_options)
+        self.faults = faults or Faults()
+        self.calls = []
+        self._lock = threading.RLock()
+        self.routes = [
+            ("GET", r"/subscriptions", self.list_subscriptions),
+            ("POST", r"/subscriptions", self.create_subscription),
+            ("GET", r"/subscriptions/(?P<subscription_id>\d+)", self.read_subscription),
+            ("PUT", r"/subscriptions/(?P<subscription_id>\d+)", self.update_subscription),
+            ("DELETE", r"/subscriptions/(?P<subscription_id>\d+)", self.cancel_subscription),
+            (
+                "PUT",
+                r"/subscriptions/(?P<subscription_id>\d+)/override",
+                self.override_subscription,
+            ),
+            (
+                "PUT",
+                r"/subscriptions/(?P<subscription_id>\d+)/reactivate",
+                self.reactivate_subscription,
+            ),
+            ("POST", r"/subscriptions/(?P<subscription_id>\d+)/hold", self.hold_subscription),
+            (
+                "POST",
+                r"/subscriptions/(?P<subscription_id>\d+)/resume",
+                self.resume_subscription,
+            ),
+            (
+                "DELETE",
+                r"/subscriptions/(?P<subscription_id>\d+)/delayed_cancel",
+                self.cancel_delayed_cancel,
+            ),
+            (
+                "POST",
+                r"/subscriptions/(?P<subscription_id>\d+)/payment_profiles/(?P<payment_profile_id>\d+)/change_payment_profile",
+                self.change_payment_profile,
+            ),
+            (
+                "GET",
+                r"/subscriptions/(?P<subscription_id>\d+)/statements",
+                self.list_subscription_statements,
+            ),
+            (
+                "GET",
+                r"/subscriptions/(?P<subscription_id>\d+)/transactions",
+                self.list_subscription_transactions,
+            ),
+            ("POST", r"/customers", self.create_customer),
+            ("GET", r"/customers/lookup", self.lookup_customer),
+            ("PUT", r"/customers/(?P<customer_id>\d+)", self.update_customer),
+            (
+                "GET",
+                r"/customers/(?P<customer_id>\d+)/subscriptions",
+                self.list_customer_subscriptions,
+            ),
+            ("POST", r"/payment_profiles", self.create_payment_profile),
+            ("GET", r"/product_families", self.list_product_families),
+            (
+                "GET",
+                r"/product_families/(?P<product_family_id>\d+)/products",
+                self.list_family_products,
+            ),
+            ("GET", r"/products/(?P<product_id>\d+)", self.read_product),
+            ("GET", r"/products/handle/(?P<handle>[\w-]+)", self.read_product_by_handle),
+            ("GET", r"/invoices", self.list_invoices),
+            ("GET", r"/statements/(?P<statement_id>\d+)", self.read_statement),
+            ("GET", r"/transactions", self.list_transactions),
+            ("GET", r"/transactions/(?P<transaction_id>\d+)", self.read_transaction),
+            ("GET", r"/coupons/find", self.find_coupon),
+        ]
+        self.routes = [
+            (method, re.compile(pattern + r"(\.json)?$"), handler)
+            for method, pattern, handler in self.routes
+        ]
+
+    def handle(self, method, path, query=None, body=None):
+        query = query or {}
+        body = body or {}
+        with self._lock:
+            self.calls.append((method, path))
+
+        failure = self.faults.inject()
+        if failure:
+            return failure
+
+        for route_method, pattern, handler in self.routes:
+            match = pattern.match(path)
+            if route_method == method and match:
+                kwargs = {
+                    k: int(v) if v.isdigit() else v
+                    for k, v in match.groupdict().items()
+                }
+                with self._lock:
+                    return handler(query=query, body=body, **kwargs)
+
+        return not_found()
+
+    def call_count(self, path_prefix=""):
+        return len([path for _, path in self.calls if path.startswith(path_prefix)])
+
+    def reset_calls(self):
+        with self._lock:
+            self.calls = []
+
+    def build_webhook(self, event, subscription_id):
+        """
+        Build the form-encoded POST parameters Chargify sends for `event`
+        on the given subscription, e.g. `payload[subscription][state]`.
+        """
+        subscription = self.dataset.subscriptions[subscription_id]
+        data = {"id": str(self.dataset.next_id()), "event": event}
+
+        def flatten(prefix, value):
+            if isinstance(value, dict):
+                for k, v in value.items():
+                    flatten("%s[%s]" % (prefix, k), v)
+            elif isinstance(value, bool):
+                data[prefix] = "true" if value else "false"
+            elif isinstance(value, list):
+                for i, v in enumerate(value):
+                    flatten("%s[%s]" % (prefix, i), v)
+            else:
+                data[prefix] = "" if value is None else str(value)
+
+        flatten("payload[subscription]", subscription)
+        flatten("payload[site]", {"id": 1, "subdomain": "briefme-test"})
+        return data
+
+    def send_webhook(self, url, event, subscription_id):
+        import requests
+
+        return requests.post(url, data=self.build_webhook(event, subscription_id))
+
+    # Subscriptions #############################################################################
+    def _subscription(self, subscription_id):
+        return self.dataset.subscriptions.get(subscription_id)
+
+    def _subscription_response(self, subscription):
+        subscription["updated_at"] = isoformat(now())
+        return ok({"subscription": copy.deepcopy(subscription)})
+
+    def list_subscriptions(self, query, body):
+        subscriptions = list(self.dataset.subscriptions.values())
+        if query.get("state"):
+            subscriptions = [s for s in subscriptions if s["state"] == query["state"]]
+        subscriptions = paginate(sort_items(subscriptions, query), query)
+        return ok(wrap("subscription", copy.deepcopy(subscriptions)))
+
+    def read_subscription(self, subscription_id, query, body):
+        subscription = self._subscription(subscription_id)
+        if not subscription:
+            return not_found()
+        return ok({"subscription": copy.deepcopy(subscription)})
+
+    def create_subscription(self, query, body):
+        data = body.get("subscription", {})
+        customer = self.dataset.customer_by_reference(data.get("customer_reference"))
+        product = self.dataset.product_by_handle(data.get("product_handle"))
+        if not customer or not product:
+            return unprocessable("Customer or product not found")
+
+        template = copy.deepcopy(next(iter(self.dataset.subscriptions.values())))
+        created_at = now()
+        template.update(
+            {
+                "id": self.dataset.next_id(),
+                "state": "trialing",
+                "customer": dict(customer),
+                "product": copy.deepcopy(product),
+                "credit_card": None,
+                "created_at": isoformat(created_at),
+                "trial_started_at": isoformat(created_at),
+                "trial_ended_at": isoformat(created_at + datetime.timedelta(days=30)),
+                "canceled_at": None,
+                "coupon_code": data.get("coupon_code"),
+            }
+        )
+        if data.get("next_billing_at"):
+            template["trial_ended_at"] = data["next_billing_at"]
+        self.dataset.subscriptions[template["id"]] = template
+        return ok({"subscription": copy.deepcopy(template)}, status=201)
+
+    def update_subscription(self, subscription_id, query, body):
+        subscription = self._subscription(subscription_id)
+        if not subscription:
+            return not_found()
+
+        data = body.get("subscription", {})
+        if "product_handle" in data:
+            product = self.dataset.product_by_handle(data["product_handle"])
+            if not product:
+                return unprocessable("Product not found")
+            if data.get("product_change_delayed"):
+                subscription["next_product_id"] = product["id"]
+                subscription["next_product_handle"] = product["handle"]
+            else:
+                subscription["product"] = copy.deepcopy(product)
+        if data.get("next_product_id") == "":
+            subscription["next_product_id"] = None
+            subscription["next_product_handle"] = None
+        if "next_billing_at" in data:
+            subscription["next_assessment_at"] = data["next_billing_at"]
+            subscription["current_period_ends_at"] = data["next_billing_at"]
+        if "cancel_at_end_of_period" in data:
+            subscription["cancel_at_end_of_period"] = data["cancel_at_end_of_period"]
+        if "payment_collection_method" in data:
+            subscription["payment_collection_method"] = data["payment_collection_method"]
+        return self._subscription_response(subscription)
+
+    def override_subscription(self, subscription_id, query, body):
+        subscription = self._subscription(subscription_id)
+        if not subscription:
+            return not_found()
+        expires_at = body.get("subscription", {}).get("expires_at")
+        subscription["expires_at"] = expires_at or None
+        return ok({})
+
+    def cancel_subscription(self, subscription_id, query, body):
+        subscription = self._subscription(subscription_id)
+        if not subscription:
+            return not_found()
+        if subscription["state"] == "canceled":
+            return unprocessable("The subscription is already canceled")
+        subscription["previous_state"] = subscription["state"]
+        subscription["state"] = "canceled"
+        subscription["canceled_at"] = isoformat(now())
+        subscription["cancellation_message"] = body.get("subscription", {}).get(
+            "cancellation_message"
+        )
+        return self._subscription_response(subscription)
+
+    def reactivate_subscription(self, subscription_id, query, body):
+        subscription = self._subscription(subscription_id)
+        if not subscription:
+            return not_found()
+        if subscription["state"] not in ("canceled", "unpaid", "trial_ended"):
+            return unprocessable(
+                "Cannot reactivate a subscription that is not marked "
+                "'Canceled', 'Unpaid', or 'Trial Ended'."
+            )
+        if not subscription["credit_card"] and not subscription.get("paypal_account"):
+            return unprocessable("A payment profile is required to reactivate")
+        subscription["previous_state"] = subscription["state"]
+        subscription["state"] = (
+            "trialing" if str(query.get("include_trial")) == "1" else "active"
+        )
+        subscription["canceled_at"] = None
+        subscription["activated_at"] = isoformat(now())
+        return self._subscription_response(subscription)
+
+    def hold_subscription(self, subscription_id, query, body):
+        subscription = self._subscription(subscription_id)
+        if not subscription:
+            return not_found()
+        if subscription["state"] != "active":
+            return unprocessable("Only active subscriptions can be put on hold")
+        subscription["state"] = "on_hold"
+        subscription["automatically_resume_at"] = body.get("hold", {}).get(
+            "automatically_resume_at"
+        )
+        return self._subscription_response(subscription)
+
+    def resume_subscription(self, subscription_id, query, body):
+        subscription = self._subscription(subscription_id)
+        if not subscription:
+            return not_found()
+        subscription["state"] = "active"
+        subscription["automatically_resume_at"] = None
+        return self._subscription_response(subscription)
+
+    def cancel_delayed_cancel(self, subscription_id, query, body):
+        subscription = self._subscription(subscription_id)
+        if not subscription:
+            return not_found()
+        subscription["cancel_at_end_of_period"] = False
+        return ok({"message": "This subscription will no longer be canceled"})
+
+    def change_payment_profile(self, subscription_id, payment_profile_id, query, body):
+        subscription = self._subscription(subscription_id)
+        profile = self.dataset.payment_profiles.get(payment_profile_id)
+        if not subscription or not profile:
+            return not_found()
+        if profile["payment_type"] == "paypal_account":
+            subscription["paypal_account"] = copy.deepcopy(profile)
+            subscription["credit_card"] = None
+        else:
+            subscription["credit_card"] = copy.deepcopy(profile)
+            subscription.pop("paypal_account", None)
+        subscription["payment_type"] = profile["payment_type"]
+        subscription["payment_collection_method"] = "automatic"
+        return ok({"payment_profile": copy.deepcopy(profile)})
+
+    def list_subscription_statements(self, subscription_id, query, body):
+        if not self._subscription(subscription_id):
+            return not_found()
+        statements = self.dataset.subscription_statements(subscription_id)
+        statements = sort_items(statements, query, key=query.get("sort", "id"))
+        return ok(wrap("statement", paginate(statements, query, default_per_page=None)))
+
+    def list_subscription_transactions(self, subscription_id, query, body):
+        if not self._subscription(subscription_id):
+            return not_found()
+        transactions = self._filter_transactions(
+            self.dataset.subscription_transactions(subscription_id), query
+        )
+        return ok(wrap("transaction", paginate(transactions, query)))
+
+    # Customers & payment profiles ##############################################################
+    def create_customer(self, query, body):
+        data = body.get("customer", {})
+        if self.dataset.customer_by_reference(data.get("reference")):
+            return unprocessable("Reference: must be unique")
+        customer = {
+            "id": self.dataset.next_id(),
+            "reference": str(data.get("reference")),
+            "first_name": data.get("first_name"),
+            "last_name": data.get("last_name"),
+            "email": data.get("email"),
+            "organization": None,
+            "created_at": isoformat(now()),
+            "updated_at": isoformat(now()),
+        }
+        self.dataset.customers[customer["id"]] = customer
+        return ok({"customer": dict(customer)}, status=201)
+
+    def lookup_customer(self, query, body):
+        customer = self.dataset.customer_by_reference(query.get("reference"))
+        if not customer:
+            return not_found()
+        return ok({"customer": dict(customer)})
+
+    def update_customer(self, customer_id, query, body):
+        customer = self.dataset.customers.get(customer_id)
+        if not customer:
+            return not_found()
+        customer.update(body.get("customer", {}))
+        return ok({"customer": dict(customer)})
+
+    def list_customer_subscriptions(self, customer_id, query, body):
+        if customer_id not in self.dataset.customers:
+            return not_found()
+        subscriptions = [
+            s
+            for s in self.dataset.subscriptions.values()
+            if s["customer"]["id"] == customer_id
+        ]
+        return ok(wrap("subscription", copy.deepcopy(subscriptions)))
+
+    def create_payment_profile(self, query, body):
+        data = body.get("payment_profile", {})
+        customer = self.dataset.customers.get(data.get("customer_id"))
+        token = data.get("chargify_token") or ""
+        if not customer or token.startswith("tok_fail"):
+            return unprocessable("The payment profile could not be created")
+
+        profile = {
+            "id": self.dataset.next_id(),
+            "customer_id": customer["id"],
+            "first_name": customer["first_name"],
+            "last_name": customer["last_name"],
+        }
+        if token.startswith("tok_paypal"):
+            profile.update(
+                {"payment_type": "paypal_account", "paypal_email": customer["email"]}
+            )
+        else:
+            expiration = datetime.date.today() + datetime.timedelta(days=3 * 365)
+            profile.update(
+                {
+                    "payment_type": "credit_card",
+                    "card_type": "visa",
+                    "masked_card_number": "XXXX-XXXX-XXXX-1111",
+                    "expiration_month": expiration.month,
+                    "expiration_year": expiration.year,
+                    "billing_country": "FR",
+                    "billing_zip": "75000",
+                }
+            )
+        self.dataset.payment_profiles[profile["id"]] = profile
+        return ok({"payment_profile": dict(profile)}, status=201)
+
+    # Products ##################################################################################
+    def list_product_families(self, query, body):
+        return ok(wrap("product_family", self.dataset.product_families.values()))
+
+    def list_family_products(self, product_family_id, query, body):
+        products = [
+            p
+            for p in self.dataset.products.values()
+            if p["product_family"]["id"] == product_family_id
+        ]
+        return ok(wrap("product", copy.deepcopy(products)))
+
+    def read_product(self, product_id, query, body):
+        product = self.dataset.products.get(product_id)
+        if not product:
+            return not_found()
+        return ok({"product": copy.deepcopy(product)})
+
+    def read_product_by_handle(self, handle, query, body):
+        product = self.dataset.product_by_handle(handle)
+        if not product:
+            return not_found()
+        return ok({"product": copy.deepcopy(product)})
+
+    # Invoices, statements, transactions & coupons ##############################################
+    def list_invoices(self, query, body):
+        invoices = list(self.dataset.invoices.values())
+        date_field = query.get("date_field", "issue_date")
+        if query.get("start_date"):
+            invoices = [i for i in invoices if i[date_field] >= query["start_date"]]
+        if query.get("end_date"):
+            invoices = [i for i in invoices if i[date_field] <= query["end_date"]]
+        if query.get("status"):
+            invoices = [i for i in invoices if i["status"] == query["status"]]
+        invoices = paginate(sort_items(invoices, query, key="number"), query)
+        return ok({"invoices": copy.deepcopy(invoices)})
+
+    def read_statement(self, statement_id, query, body):
+        statement = self.dataset.statements.get(statement_id)
+        if not statement:
+            return not_found()
+        return ok({"statement": statement})
+
+    def _filter_transactions(self, transactions, query):
+        if query.get("since_id"):
+            transactions = [t for t in transactions if t["id"] >= int(query["since_id"])]
+        if query.get("max_id"):
+            transactions = [t for t in transactions if t["id"] <= int(query["max_id"])]
+        if query.get("since_date"):
+            transactions = [
+                t for t in transactions if t["created_at"][:10] >= query["since_date"]
+            ]
+        if query.get("until_date"):
+            transactions = [
+                t for t in transactions if t["created_at"][:10] <= query["until_date"]
+            ]
+        kinds = query.get("kinds[]") or query.get("kinds")
+        if kinds:
+            kinds = kinds if isinstance(kinds, list) else [kinds]
+            transactions = [t for t in transactions if t["transaction_type"] in kinds]
+        return sort_items(transactions, query, default_direction="desc")
+
+    def list_transactions(self, query, body):
+        transactions = self._filter_transactions(self.dataset.transactions.values(), query)
+        return ok(wrap("transaction", paginate(transactions, query)))
+
+    def read_transaction(self, transaction_id, query, body):
+        transaction = self.dataset.transactions.get(transaction_id)
+        if not transaction:
+            return not_found()
+        return ok({"transaction": transaction})
+
+    def find_coupon(self, query, body):
+        coupon = self.dataset.coupons.get(str(query.get("code", "")).upper())
+        if not coupon:
+            return not_found()
+        return ok({"coupon": coupon})
@@ -0,0 +1,93 @@
+"""
+Drop-in replacement for the `libs.chargify_python.Chargify` client.
+
+Attribute chains are turned into API paths the same way the real library
+does, e.g. `client.subscriptions.reactivate.update(subscription_id=1)` is a
+`PUT /subscriptions/1/reactivate.json`.
+"""
+import requests
+
+from .app import FakeResponse
+from .errors import error_for_status
+
+API_METHODS = {"create": "POST", "read": "GET", "update": "PUT", "delete": "DELETE"}
+
+
+def singular(element):
+    if element.endswith("ies"):
+        return element[:-3] + "y"
+    if element.endswith("s"):
+        return element[:-1]
+    return element
+
+
+class InProcessTransport:
+    """Call the fake application directly, without any socket."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def __call__(self, method, path, query, body):
+        return self.app.handle(method, path, query=query, body=body)
+
+
+class HttpTransport:
+    """Call a `FakeChargifyServer` (or anything speaking its API) over HTTP."""
+
+    def __init__(self, base_url, session=None):
+        self.base_url = base_url.rstrip("/")
+        self.session = session or requests.Session()
+
+    def __call__(self, method, path, query, body):
+        response = self.session.request(
+            method,
+            "%s%s.json" % (self.base_url, path),
+            params=query,
+            json=body or None,
+            auth=("dummy-key", "x"),
+        )
+        return FakeResponse(response.status_code, response.json(), response.headers)
+
+
+class FakeChargifyClient:
+    def __init__(self, transport, path=None):
+        self._transport = transport
+        self._path = path or []
+
+    def __getattr__(self, item):
+        if item.startswith("_"):
+            raise AttributeError(item)
+        return FakeChargifyClient(self._transport, self._path + [item])
+
+    def __call__(self, **kwargs):
+        method, path, query, body = self._build_request(kwargs)
+        response = self._transport(method, path, query, body)
+        if response.status >= 400:
+            errors = response.payload.get("errors") if response.payload else None
+            raise error_for_status(response.status, errors)
+        return response.payload
+
+    def _build_request(self, kwargs):
+        elements = list(self._path)
+        method = "GET"
+        if elements and elements[-1] in API_METHODS:
+            method = API_METHODS[elements.pop()]
+
+        body = kwargs.pop("data", None)
+        query = dict(kwargs.pop("qs_params", None) or {})
+
+        path = ""
+        for element in elements:
+            path += "/" + element
+            if element == "handle" and "api_handle" in kwargs:
+                path += "/%s" % kwargs.pop("api_handle")
+                continue
+            for suffix in ("_id", "_uid"):
+                key = singular(element) + suffix
+                if key in kwargs:
+                    path += "/%s" % kwargs.pop(key)
+
+        # Remaining keyword arguments (`page`, `per_page`, `state`...) are
+        # sent as query string parameters.
+        query.update(kwargs)
+        return method, path, query, body
@@ -0,0 +1,419 @@
+"""
+Seedable in-memory dataset served by the fake Chargify application.
+
+Records are shaped like the payloads returned by Chargify's API v1 (see
+`tests/fixtures/*.json`) so that the helper, the models and the views consume
+them exactly as they would consume real data.
+"""
+import copy
+import datetime
+import itertools
+import json
+import os
+import random
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "fixtures")
+
+PRODUCT_FAMILY_HANDLE = "brief-me-quotidien"
+TRIAL_PRODUCT_HANDLE = "fr-essai"
+PAYING_PRODUCT_HANDLES = ["fr-gen-mensuel", "fr-gen-annuel-new", "fr-etudiant-annuel"]
+
+# (handle, name, interval, interval_unit, price_in_cents)
+PRODUCTS = [
+    (TRIAL_PRODUCT_HANDLE, "Essai gratuit", 1, "month", 0),
+    ("fr-gen-mensuel", "Abonnement mensuel", 1, "month", 590),
+    ("fr-gen-annuel-new", "Abonnement annuel", 12, "month", 5880),
+    ("fr-etudiant-annuel", "Abonnement annuel étudiant", 12, "month", 2940),
+]
+
+# Rough distribution of the states of our subscriptions base.
+STATES = [
+    ("active", 55),
+    ("trialing", 15),
+    ("trial_ended", 10),
+    ("canceled", 10),
+    ("past_due", 5),
+    ("on_hold", 5),
+]
+
+TIMEZONE = datetime.timezone(datetime.timedelta(hours=1))
+EPOCH = datetime.datetime(2018, 1, 1, 9, 0, tzinfo=TIMEZONE)
+
+
+def isoformat(value):
+    if value is None:
+        return None
+    return value.isoformat()
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name)) as f:
+        return json.load(f)
+
+
+class FakeDataset:
+    """
+    Mutable store of Chargify resources, indexed by id.
+    """
+
+    def __init__(self):
+        self.product_families = {}
+        self.products = {}
+        self.customers = {}
+        self.subscriptions = {}
+        self.payment_profiles = {}
+        self.invoices = {}
+        self.coupons = {}
+        self.statements = {}
+        self.transactions = {}
+        self.metadata = {}
+        self._ids = itertools.count(10000000)
+
+    def next_id(self):
+        return next(self._ids)
+
+    def product_by_handle(self, handle):
+        for product in self.products.values():
+            if product["handle"] == handle:
+                return product
+        return None
+
+    def customer_by_reference(self, reference):
+        reference = str(reference)
+        for customer in self.customers.values():
+            if customer["reference"] == reference:
+                return customer
+        return None
+
+    def subscription_statements(self, subscription_id):
+        return [
+            s for s in self.statements.values() if s["subscription_id"] == subscription_id
+        ]
+
+    def subscription_transactions(self, subscription_id):
+        return [
+            t
+            for t in self.transactions.values()
+            if t["subscription_id"] == subscription_id
+        ]
+
+
+class DatasetBuilder:
+    """
+    Build a deterministic `FakeDataset` from a `seed`.
+    """
+
+    def __init__(self, dataset=None, seed=42):
+        self.dataset = dataset or FakeDataset()
+        self.random = random.Random(seed)
+        self.subscription_template = load_fixture("active_subscription.json")
+
+    def add_products(self):
+        family_id = self.dataset.next_id()
+        family = {
+            "id": family_id,
+            "name": "Brief.me quotidien",
+            "handle": PRODUCT_FAMILY_HANDLE,
+            "accounting_code": None,
+            "description": "",
+        }
+        self.dataset.product_families[family_id] = family
+
+        template = self.subscription_template["product"]
+        for handle, name, interval, interval_unit, price_in_cents in PRODUCTS:
+            product = copy.deepcopy(template)
+            product.update(
+                {
+                    "id": self.dataset.next_id(),
+                    "handle": handle,
+                    "name": name,
+                    "interval": interval,
+                    "interval_unit": interval_unit,
+                    "price_in_cents": price_in_cents,
+                    "product_family": dict(family),
+                }
+            )
+            product["public_signup_pages"][0]["url"] = (
+                "https://briefme-test.chargifypay.com/subscribe/%s" % handle
+            )
+            self.dataset.products[product["id"]] = product
+
+    def add_customer(self, reference):
+        template = self.subscription_template["customer"]
+        created_at = EPOCH + datetime.timedelta(minutes=reference * 7)
+        customer = copy.deepcopy(template)
+        customer.update(
+            {
+                "id": self.dataset.next_id(),
+                "reference": str(reference),
+                "email": "john.doe%s@brief.me" % reference,
+                "first_name": "John",
+                "last_name": "Doe %s" % reference,
+                "created_at": isoformat(created_at),
+                "updated_at": isoformat(created_at),
+            }
+        )
+        self.dataset.customers[customer["id"]] = customer
+        return customer
+
+    def add_payment_profile(self, customer):
+        expiration = datetime.date.today() + datetime.timedelta(
+            days=self.random.randint(-60, 4 * 365)
+        )
+        profile = copy.deepcopy(self.subscription_template["credit_card"])
+        profile.update(
+            {
+                "id": self.dataset.next_id(),
+                "customer_id": customer["id"],
+                "first_name": customer["first_name"],
+                "last_name": customer["last_name"],
+                "expiration_month": expiration.month,
+                "expiration_year": expiration.year,
+                "masked_card_number": "XXXX-XXXX-XXXX-%04d"
+                % self.random.randint(0, 9999),
+            }
+        )
+        self.dataset.payment_profiles[profile["id"]] = profile
+        return profile
+
+    def add_subscription(self, customer, state=None):
+        if state is None:
+            states, weights = zip(*STATES)
+            state = self.random.choices(states, weights=weights)[0]
+
+        if state in ("trialing", "trial_ended"):
+            product = self.dataset.product_by_handle(TRIAL_PRODUCT_HANDLE)
+        else:
+            product = self.dataset.product_by_handle(
+                self.random.choice(PAYING_PRODUCT_HANDLES)
+            )
+
+        created_at = datetime.datetime.fromisoformat(customer["created_at"])
+        trial_ended_at = created_at + datetime.timedelta(days=30)
+        period_started_at = trial_ended_at + datetime.timedelta(
+            days=self.random.randint(0, 365)
+        )
+        if product["interval"] == 12:
+            period_ends_at = period_started_at + datetime.timedelta(days=365)
+        else:
+            period_ends_at = period_started_at + datetime.timedelta(days=30)
+
+        subscription = copy.deepcopy(self.subscription_template)
+        subscription.update(
+            {
+                "id": self.dataset.next_id(),
+                "state": state,
+                "previous_state": state,
+                "customer": dict(customer),
+                "product": copy.deepcopy(product),
+                "created_at": isoformat(created_at),
+                "updated_at": isoformat(period_started_at),
+                "activated_at": isoformat(trial_ended_at),
+                "trial_started_at": isoformat(created_at),
+                "trial_ended_at": isoformat(trial_ended_at),
+                "current_period_started_at": isoformat(period_started_at),
+                "current_period_ends_at": isoformat(period_ends_at),
+                "next_assessment_at": isoformat(period_ends_at),
+                "canceled_at": None,
+                "cancel_at_end_of_period": self.random.random() < 0.05,
+                "current_billing_amount_in_cents": product["price_in_cents"],
+                "product_price_in_cents": product["price_in_cents"],
+                "total_revenue_in_cents": 0,
+                "referral_code": "%06x" % self.random.getrandbits(24),
+            }
+        )
+        if state == "canceled":
+            subscription["canceled_at"] = isoformat(period_ends_at)
+        if state in ("trialing", "trial_ended") and self.random.random() < 0.5:
+            subscription["credit_card"] = None
+            subscription["payment_type"] = None
+            subscription["payment_collection_method"] = "remittance"
+        else:
+            subscription["credit_card"] = self.add_payment_profile(customer)
+
+        self.dataset.subscriptions[subscription["id"]] = subscription
+        return subscription
+
+    def add_billing_history(self, subscription, periods):
+        """
+        Add `periods` statements, with their invoice and transactions, to a
+        paying `subscription`.
+        """
+        product = subscription["product"]
+        amount_in_cents = product["price_in_cents"]
+        if not amount_in_cents:
+            return
+
+        days = 365 if product["interval"] == 12 else 30
+        opened_at = datetime.datetime.fromisoformat(subscription["activated_at"])
+        for _ in range(periods):
+            closed_at = opened_at + datetime.timedelta(days=days)
+            statement_id = self.dataset.next_id()
+            charge = self.add_transaction(
+                subscription, "charge", amount_in_cents, opened_at, statement_id
+            )
+            payment = self.add_transaction(
+                subscription, "payment", amount_in_cents, opened_at, statement_id
+            )
+            self.dataset.statements[statement_id] = {
+                "id": statement_id,
+                "subscription_id": subscription["id"],
+                "customer_id": subscription["customer"]["id"],
+                "opened_at": isoformat(opened_at),
+                "closed_at": isoformat(closed_at),
+                "settled_at": isoformat(opened_at),
+                "created_at": isoformat(closed_at),
+                "updated_at": isoformat(closed_at),
+                "starting_balance_in_cents": 0,
+                "ending_balance_in_cents": 0,
+                "total_in_cents": amount_in_cents,
+                "paid_in_cents": amount_in_cents,
+                "customer_first_name": subscription["customer"]["first_name"],
+                "customer_last_name": subscription["customer"]["last_name"],
+                "customer_organization": None,
+                "text_view": "Statement #%s\n%s" % (statement_id, product["name"]),
+                "basic_html_view": "<p>%s</p>" % product["name"] * 20,
+                "html_view": "<div>%s</div>" % product["name"] * 80,
+                "future_payments": [],
+                "events": [],
+                "transactions": [charge, payment],
+            }
+            self.add_invoice(subscription, opened_at, closed_at)
+            opened_at = closed_at
+
+    def add_transaction(self, subscription, kind, amount_in_cents, created_at, statement_id):
+        transaction = {
+            "id": self.dataset.next_id(),
+            "subscription_id": subscription["id"],
+            "customer_id": subscription["customer"]["id"],
+            "product_id": subscription["product"]["id"],
+            "statement_id": statement_id,
+            "type": kind.capitalize(),
+            "transaction_type": kind,
+            "kind": None if kind == "payment" else "baseline",
+            "amount_in_cents": amount_in_cents,
+            "original_amount_in_cents": amount_in_cents,
+            "starting_balance_in_cents": 0,
+            "ending_balance_in_cents": 0,
+            "success": True,
+            "memo": subscription["product"]["name"],
+            "created_at": isoformat(created_at),
+            "payment_id": None,
+            "gateway_used": "braintree_blue",
+            "card_type": "visa",
+        }
+        self.dataset.transactions[transaction["id"]] = transaction
+        return transaction
+
+    def add_invoice(self, subscription, period_start, period_end):
+        product = subscription["product"]
+        amount = "%.2f" % (product["price_in_cents"] / 100)
+        customer = subscription["customer"]
+        uid = "inv_%s" % self.dataset.next_id()
+        self.dataset.invoices[uid] = {
+            "uid": uid,
+            "number": str(len(self.dataset.invoices) + 1),
+            "site_id": 1,
+            "customer_id": customer["id"],
+            "subscription_id": subscription["id"],
+            "issue_date": period_start.date().isoformat(),
+            "due_date": period_start.date().isoformat(),
+            "paid_date": period_start.date().isoformat(),
+            "status": "paid",
+            "collection_method": "automatic",
+            "currency": "EUR",
+            "product_name": product["name"],
+            "product_family_name": product["product_family"]["name"],
+            "subtotal_amount": amount,
+            "discount_amount": "0.0",
+            "tax_amount": "0.0",
+            "total_amount": amount,
+            "credit_amount": "0.0",
+            "refund_amount": "0.0",
+            "paid_amount": amount,
+            "due_amount": "0.0",
+            "customer": {
+                "chargify_id": customer["id"],
+                "first_name": customer["first_name"],
+                "last_name": customer["last_name"],
+                "email": customer["email"],
+                "reference": customer["reference"],
+                "organization": None,
+            },
+            "billing_address": {
+                "street": None,
+                "city": None,
+                "zip": "75000",
+                "country": self.random.choice(["FR", "FR", "FR", "BE", "CH"]),
+            },
+            "line_items": [
+                {
+                    "uid": "li_%s" % self.dataset.next_id(),
+                    "title": product["name"],
+                    "description": "",
+                    "quantity": "1.0",
+                    "unit_price": amount,
+                    "subtotal_amount": amount,
+                    "discount_amount": "0.0",
+                    "tax_amount": "0.0",
+                    "total_amount": amount,
+                    "tiered_unit_price": False,
+                    "period_range_start": period_start.date().isoformat(),
+                    "period_range_end": period_end.date().isoformat(),
+                    "product_id": product["id"],
+                    "product_version": product["version_number"],
+                    "component_id": None,
+                    "price_point_id": None,
+                }
+            ],
+            "discounts": [],
+            "taxes": [],
+            "credits": [],
+            "refunds": [],
+            "payments": [],
+        }
+
+    def add_coupon(self, code, percentage=None, amount_in_cents=None):
+        family = next(iter(self.dataset.product_families.values()))
+        coupon = {
+            "id": self.dataset.next_id(),
+            "name": code,
+            "code": code,
+            "description": "",
+            "percentage": percentage,
+            "amount_in_cents": amount_in_cents,
+            "product_family_id": family["id"],
+            "start_date": isoformat(EPOCH),
+            "end_date": None,
+            "duration_period_count": None,
+            "recurring": False,
+            "allow_negative_balance": False,
+            "created_at": isoformat(EPOCH),
+            "updated_at": isoformat(EPOCH),
+            "archived_at": None,
+        }
+        self.dataset.coupons[code.upper()] = coupon
+        return coupon
+
+
+def seed_dataset(customers=1000, billing_periods=6, coupons=20, seed=42):
+    """
+    Build a dataset with `customers` customers, each having one subscription,
+    up to `billing_periods` statements, invoices and transactions per paying
+    subscription and `coupons` coupons.
+    """
+    builder = DatasetBuilder(seed=seed)
+    builder.add_products()
+
+    for reference in range(1, customers + 1):
+        customer = builder.add_customer(reference)
+        subscription = builder.add_subscription(customer)
+        if subscription["state"] not in ("trialing", "trial_ended"):
+            builder.add_billing_history(
+                subscription, builder.random.randint(1, billing_periods)
+            )
+
+    for i in range(coupons):
+        builder.add_coupon("BRIEF%02d" % i, percentage=builder.random.choice([10, 20, 50]))
+
+    return builder.dataset
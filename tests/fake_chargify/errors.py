@@ -0,0 +1,68 @@
+"""
+Stand-ins for the exceptions of `libs.chargify_python`.
+
+The test settings replace the Chargify client module by a `MagicMock`, which
+makes `except ChargifyNotFoundError:` clauses unusable as soon as something
+is actually raised. These classes mirror the ones of the real library so the
+fake client can raise them and the helper can catch them.
+"""
+
+
+class ChargifyError(Exception):
+    def __init__(self, errors=None, status_code=None):
+        self.errors = errors or []
+        self.status_code = status_code
+        super().__init__(self.errors)
+
+
+class ChargifyConnectionError(ChargifyError):
+    pass
+
+
+class ChargifyUnauthorizedError(ChargifyError):
+    pass
+
+
+class ChargifyForbiddenError(ChargifyError):
+    pass
+
+
+class ChargifyNotFoundError(ChargifyError):
+    pass
+
+
+class ChargifyUnprocessableEntityError(ChargifyError):
+    pass
+
+
+class ChargifyServerError(ChargifyError):
+    pass
+
+
+STATUS_ERRORS = {
+    401: ChargifyUnauthorizedError,
+    403: ChargifyForbiddenError,
+    404: ChargifyNotFoundError,
+    422: ChargifyUnprocessableEntityError,
+}
+
+CHARGIFY_ERRORS = {
+    cls.__name__: cls
+    for cls in (
+        ChargifyError,
+        ChargifyConnectionError,
+        ChargifyUnauthorizedError,
+        ChargifyForbiddenError,
+        ChargifyNotFoundError,
+        ChargifyUnprocessableEntityError,
+        ChargifyServerError,
+    )
+}
+
+
+def error_for_status(status_code, errors=None):
+    if status_code >= 500:
+        cls = ChargifyServerError
+    else:
+        cls = STATUS_ERRORS.get(status_code, ChargifyError)
+    return cls(errors=errors, status_code=status_code)
@@ -0,0 +1,84 @@
+"""
+HTTP front-end of the fake Chargify application, bound to localhost.
+"""
+import json
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+def flatten_query(query_string):
+    query = {}
+    for key, values in parse_qs(query_string).items():
+        query[key] = values if key.endswith("[]") or len(values) > 1 else values[0]
+    return query
+
+
+class FakeChargifyRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _handle(self):
+        url = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        raw_body = self.rfile.read(length) if length else b""
+        try:
+            body = json.loads(raw_body) if raw_body else {}
+        except ValueError:
+            body = {}
+
+        response = self.server.app.handle(
+            self.command, url.path, query=flatten_query(url.query), body=body
+        )
+
+        content = json.dumps(response.payload).encode()
+        self.send_response(response.status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(content)))
+        for header, value in response.headers.items():
+            self.send_header(header, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeChargifyServer:
+    """
+    Serve `app` on localhost, in a background thread.
+
+    Use as a context manager, or call `start()` and `stop()`. `url` can be
+    used as `CHARGIFY_SUBDOMAIN`.
+    """
+
+    def __init__(self, app, host="127.0.0.1", port=0):
+        self.app = app
+        self.httpd = ThreadingHTTPServer((host, port), FakeChargifyRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.app = app
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return "http://%s:%s" % (host, port)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.thread:
+            self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -4,6 +4,18 @@ from briefme_subscription.models import TrialCoupon as AbstractTrialCoupon
 from briefme_subscription.models import (
     ChargifySubscription as AbstractChargifySubscription,
 )
+from briefme_subscription.models import (
+    ChargifySyncCursor as AbstractChargifySyncCursor,
+)
+from briefme_subscription.models import (
+    ChargifyTransaction as AbstractChargifyTransaction,
+)
+from briefme_subscription.models import (
+    SubscriptionChange as AbstractSubscriptionChange,
+)
+from briefme_subscription.models import (
+    SubscriptionMetricsSnapshot as AbstractSubscriptionMetricsSnapshot,
+)
 
 
 class TrialCoupon(AbstractTrialCoupon):
@@ -14,3 +26,19 @@ class ChargifySubscription(AbstractChargifySubscription):
     trial_coupon = models.ForeignKey(
         TrialCoupon, null=True, blank=True, on_delete=models.CASCADE
     )
+
+
+class ChargifyTransaction(AbstractChargifyTransaction):
+    pass
+
+
+class ChargifySyncCursor(AbstractChargifySyncCursor):
+    pass
+
+
+class SubscriptionMetricsSnapshot(AbstractSubscriptionMetricsSnapshot):
+    pass
+
+
+class SubscriptionChange(AbstractSubscriptionChange):
+    pass
@@ -1,7 +1,12 @@
 import sys
 from unittest.mock import MagicMock
 
-sys.modules["libs.chargify_python"] = MagicMock()
+from tests.fake_chargify.dataset import PAYING_PRODUCT_HANDLES, TRIAL_PRODUCT_HANDLE
+from tests.fake_chargify.errors import CHARGIFY_ERRORS
+
+# Real exception classes are needed for the helper's `except` clauses to work
+# against the fake Chargify client.
+sys.modules["libs.chargify_python"] = MagicMock(**CHARGIFY_ERRORS)
 sys.modules["nonce.models"] = MagicMock()
 
 SECRET_KEY = "dump-secret-key"
@@ -31,7 +36,20 @@ DATABASES = {
 
 CHARGIFY_API_KEY = "dummy-key"
 CHARGIFY_SITE = "dummy-site"
+CHARGIFY_SUBDOMAIN = "https://dummy-site.chargify.com"
+CHARGIFY_PAYING_PRODUCTS_HANDLES = PAYING_PRODUCT_HANDLES
+CHARGIFY_TRIAL_PRODUCT_HANDLE = TRIAL_PRODUCT_HANDLE
+CHARGIFY_SUBSCRIPTION_MODEL = "tests.ChargifySubscription"
+CHARGIFY_TRANSACTION_MODEL = "tests.ChargifyTransaction"
+CHARGIFY_SYNC_CURSOR_MODEL = "tests.ChargifySyncCursor"
+TRIAL_COUPON_MODEL = "tests.TrialCoupon"
+SUBSCRIPTION_METRICS_SNAPSHOT_MODEL = "tests.SubscriptionMetricsSnapshot"
+SUBSCRIPTION_CHANGE_OUTBOX_MODEL = "tests.SubscriptionChange"
 SUBSCRIPTION_PAYMENT_METHOD_CHOICES = (
     ("credit_card", "Carte bancaire"),
     ("paypal", "PayPal"),
 )
+SUBSCRIPTION_EVENT_DISPATCHER = {
+    "BACKEND": "briefme_subscription.events.SyncEventDispatcher"
+}
+TRIAL_DEFAULT_TOKEN = "default"
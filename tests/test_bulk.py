@@ -0,0 +1,163 @@
+import datetime
+import re
+
+import pytest
+
+from django.core.management import call_command, CommandError
+
+from briefme_subscription.bulk import BulkOperation
+from briefme_subscription.management.commands.bulk_subscription_operation import (
+    parse_param,
+)
+
+from .factories import ChargifySubscriptionFactory
+from .models import ChargifySubscription
+
+pytestmark = pytest.mark.django_db()
+
+
+def subscription_ids(fake_chargify, state):
+    return [
+        subscription_id
+        for subscription_id, subscription in fake_chargify.dataset.subscriptions.items()
+        if subscription["state"] == state
+    ]
+
+
+@pytest.mark.usefixtures("fake_chargify")
+class TestBulkOperation:
+    def test_run_reports_each_subscription(self, fake_chargify):
+        # GIVEN
+        active_ids = subscription_ids(fake_chargify, "active")[:5]
+        canceled_ids = subscription_ids(fake_chargify, "canceled")[:2]
+        bulk_operation = BulkOperation(
+            "hold",
+            params={"automatically_resume_at": datetime.date(2030, 1, 1)},
+            rate=0,
+        )
+
+        # WHEN
+        results = bulk_operation.run(active_ids + canceled_ids)
+
+        # THEN
+        assert {r.subscription_id for r in results if r.success} == set(active_ids)
+        assert {r.subscription_id for r in results if not r.success} == set(
+            canceled_ids
+        )
+        for subscription_id in active_ids:
+            assert fake_chargify.dataset.subscriptions[subscription_id]["state"] == (
+                "on_hold"
+            )
+
+    def test_run_resumes_from_checkpoint(self, fake_chargify, tmp_path):
+        # GIVEN
+        active_ids = subscription_ids(fake_chargify, "active")[:6]
+        checkpoint_path = str(tmp_path / "checkpoint.jsonl")
+        BulkOperation("resume", checkpoint_path=checkpoint_path, rate=0).run(
+            active_ids[:4]
+        )
+        fake_chargify.reset_calls()
+
+        # WHEN
+        results = BulkOperation("resume", checkpoint_path=checkpoint_path, rate=0).run(
+            active_ids
+        )
+
+        # THEN
+        assert {r.subscription_id for r in results} == set(active_ids[4:])
+        assert fake_chargify.call_count() == 2
+
+    def test_run_refreshes_local_caches(self, fake_chargify):
+        # GIVEN
+        active_ids = subscription_ids(fake_chargify, "active")[:3]
+        for subscription_id in active_ids:
+            ChargifySubscriptionFactory(uuid=subscription_id)
+
+        # WHEN
+        BulkOperation(
+            "set_subscription_payment_collection_method",
+            params={"value": "remittance"},
+            subscription_model=ChargifySubscription,
+            rate=0,
+        ).run(active_ids)
+
+        # THEN
+        for subscription in ChargifySubscription.objects.filter(uuid__in=active_ids):
+            assert subscription.payment_collection_method == "remittance"
+            assert fake_chargify.call_count(f"/subscriptions/{subscription.uuid}") == 1
+
+    def test_command(self, fake_chargify, tmp_path):
+        # GIVEN
+        ids_file = tmp_path / "ids.txt"
+        ids_file.write_text("\n".join(map(str, subscription_ids(fake_chargify, "active"))))
+        report_path = tmp_path / "report.csv"
+
+        # WHEN
+        call_command(
+            "bulk_subscription_operation",
+            "set_subscription_next_billing_at",
+            str(ids_file),
+            "--param",
+            "dt=2030-01-01T00:00:00+01:00",
+            "--rate",
+            "0",
+            "--report",
+            str(report_path),
+        )
+
+        # THEN
+        lines = report_path.read_text().splitlines()
+        assert len(lines) == len(subscription_ids(fake_chargify, "active")) + 1
+        assert all(line.endswith("success,") for line in lines[1:])
+
+
+@pytest.mark.parametrize(
+    "param, expected",
+    [
+        ("remittance", "key=value"),
+        ("automatically_resume_at=01/06/2021", "automatically_resume_at=YYYY-MM-DD"),
+        ("dt=tomorrow", "dt=YYYY-MM-DDTHH:MM:SS[+HH:MM]"),
+    ],
+)
+def test_invalid_param(param, expected):
+    # WHEN / THEN
+    with pytest.raises(CommandError, match=re.escape(f"expected {expected}.")):
+        parse_param(param)
+
+
+def test_param():
+    # WHEN / THEN
+    assert parse_param("automatically_resume_at=2021-06-01") == (
+        "automatically_resume_at",
+        datetime.date(2021, 6, 1),
+    )
+    assert parse_param("value=a=b") == ("value", "a=b")
+
+
+@pytest.mark.usefixtures("fake_chargify")
+class TestWarmChargifyCaches:
+    def test_fills_the_empty_caches(self, fake_chargify, django_assert_num_queries):
+        # GIVEN
+        active_ids = subscription_ids(fake_chargify, "active")[:4]
+        for subscription_id in active_ids[:3]:
+            ChargifySubscriptionFactory(
+                uuid=subscription_id, chargify_subscription_cache={}
+            )
+        ChargifySubscriptionFactory(
+            uuid=active_ids[3], chargify_subscription_cache={"state": "active"}
+        )
+        unknown = ChargifySubscriptionFactory(uuid=1, chargify_subscription_cache={})
+
+        # WHEN
+        with django_assert_num_queries(2):
+            subscriptions = ChargifySubscription.objects.warm_chargify_caches()
+
+        # THEN
+        assert len(subscriptions) == 5
+        assert fake_chargify.call_count() == 4
+        for subscription in ChargifySubscription.objects.filter(
+            uuid__in=active_ids[:3]
+        ):
+            assert subscription.chargify_subscription_cache["id"] == subscription.uuid
+        unknown.refresh_from_db()
+        assert unknown.chargify_subscription_cache == {}
@@ -0,0 +1,338 @@
+import json
+import pickle
+import sys
+
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import pytest
+
+from briefme_subscription.chargify import (
+    ChargifyException,
+    ChargifyHelper,
+    ChargifyTimeoutError,
+    ChargifyUnavailableError,
+    get_chargify_helper,
+    get_chargify_python,
+    ProductRecord,
+    ProductsDict,
+)
+
+from briefme_subscription.deadlines import deadline
+
+from .fake_chargify import TRIAL_PRODUCT_HANDLE
+from .test_circuit_breaker import open_circuit_breaker
+from .models import ChargifySubscription
+
+
+@pytest.mark.usefixtures("fake_chargify")
+class TestChargifyHelper:
+    def test_get_subscriptions_goes_through_every_page(self, fake_chargify):
+        # WHEN
+        pages = list(ChargifyHelper().get_subscriptions(per_page=20))
+
+        # THEN
+        assert [len(page) for page in pages] == [20, 20, 10]
+        assert fake_chargify.call_count("/subscriptions") == 4
+
+    def test_get_subscription_not_found(self):
+        # WHEN
+        subscription = ChargifyHelper().get_subscription(1)
+
+        # THEN
+        assert subscription is None
+
+    def test_cancel_subscription_already_canceled(self, fake_chargify):
+        # GIVEN
+        subscription_id = next(iter(fake_chargify.dataset.subscriptions))
+        helper = ChargifyHelper()
+        helper.cancel_subscription(subscription_id)
+
+        # WHEN
+        helper.cancel_subscription(subscription_id)
+
+        # THEN
+        assert helper.get_subscription(subscription_id)["state"] == "canceled"
+
+    def test_server_error_is_raised(self, fake_chargify):
+        # GIVEN
+        fake_chargify.faults.fail_next(status=503)
+
+        # WHEN / THEN
+        with pytest.raises(ChargifyUnavailableError):
+            list(ChargifyHelper().get_subscriptions())
+
+
+@pytest.mark.usefixtures("fake_chargify_server")
+class TestChargifyHelperHttp:
+    def test_get_subscription_statements(self, fake_chargify):
+        # GIVEN
+        subscription_id = next(iter(fake_chargify.dataset.statements.values()))[
+            "subscription_id"
+        ]
+
+        # WHEN
+        statements = ChargifyHelper().get_subscription_statements(subscription_id)
+
+        # THEN
+        assert statements == sorted(
+            fake_chargify.dataset.subscription_statements(subscription_id),
+            key=lambda statement: statement["created_at"],
+            reverse=True,
+        )
+
+    def test_get_coupon(self, fake_chargify):
+        # WHEN
+        coupon = ChargifyHelper().get_coupon("brief01")
+
+        # THEN
+        assert coupon["code"] == "BRIEF01"
+
+    def test_throttled_request_raises(self, fake_chargify):
+        # GIVEN
+        fake_chargify.faults.fail_next(status=429)
+
+        # WHEN / THEN
+        with pytest.raises(ChargifyException):
+            ChargifyHelper().get_statement(1)
+
+    def test_iter_subscription_statements_stops_early(self, fake_chargify):
+        # GIVEN
+        subscription_id = self._subscription_with_statements(fake_chargify, 3)
+        fake_chargify.reset_calls()
+
+        # WHEN
+        statements = list(
+            ChargifyHelper().iter_subscription_statements(
+                subscription_id, per_page=1, limit=2
+            )
+        )
+
+        # THEN
+        assert len(statements) == 2
+        assert statements[0]["created_at"] > statements[1]["created_at"]
+        assert fake_chargify.call_count() == 2
+
+    def test_iter_subscription_statements_goes_through_every_page(self, fake_chargify):
+        # GIVEN
+        subscription_id = self._subscription_with_statements(fake_chargify, 3)
+
+        # WHEN
+        statements = list(
+            ChargifyHelper().iter_subscription_statements(subscription_id, per_page=2)
+        )
+
+        # THEN
+        assert len(statements) == 3
+
+    def test_get_latest_subscription_statements(self, fake_chargify):
+        # GIVEN
+        subscription_id = self._subscription_with_statements(fake_chargify, 3)
+        fake_chargify.reset_calls()
+
+        # WHEN
+        statements = ChargifyHelper().get_latest_subscription_statements(
+            subscription_id, count=2
+        )
+
+        # THEN
+        assert len(statements) == 2
+        assert fake_chargify.call_count() == 1
+
+    def test_get_statements_keeps_order(self, fake_chargify):
+        # GIVEN
+        statement_ids = list(fake_chargify.dataset.statements)[:5][::-1]
+
+        # WHEN
+        statements = ChargifyHelper().get_statements(statement_ids, max_workers=3)
+
+        # THEN
+        assert [statement["id"] for statement in statements] == statement_ids
+
+    def test_get_statements_within_the_deadline(self, fake_chargify):
+        # GIVEN
+        statement_ids = list(fake_chargify.dataset.statements)[:5]
+
+        # WHEN / THEN
+        with deadline(0):
+            with pytest.raises(ChargifyTimeoutError):
+                ChargifyHelper().get_statements(statement_ids, max_workers=3)
+        assert fake_chargify.call_count() == 0
+
+    @staticmethod
+    def _subscription_with_statements(fake_chargify, count):
+        for subscription_id in fake_chargify.dataset.subscriptions:
+            statements = fake_chargify.dataset.subscription_statements(subscription_id)
+            if len(statements) == count:
+                return subscription_id
+        pytest.fail(f"No subscription with {count} statements in the fake dataset")
+
+
+class TestChargifyPython:
+    def test_vendored_client(self):
+        # GIVEN
+        Chargify = sys.modules["libs.chargify_python"].Chargify
+
+        # WHEN
+        chargify_python = get_chargify_python()
+
+        # THEN
+        Chargify.assert_called_with("dummy-key", "dummy-site")
+        assert chargify_python is Chargify.return_value
+
+
+@pytest.mark.usefixtures("fake_chargify")
+class TestLazyInitialization:
+    def test_shared_helper(self):
+        # WHEN
+        helper = get_chargify_helper()
+
+        # THEN
+        assert helper is get_chargify_helper()
+        assert ChargifySubscription.chargify_helper is helper
+
+    def test_products_are_loaded_on_first_access(self, fake_chargify):
+        # GIVEN
+        products = ProductsDict()
+        assert fake_chargify.call_count() == 0
+
+        # WHEN
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            trials = list(
+                executor.map(lambda _: products[TRIAL_PRODUCT_HANDLE], range(8))
+            )
+
+        # THEN
+        assert all(trial["handle"] == TRIAL_PRODUCT_HANDLE for trial in trials)
+        assert fake_chargify.calls.count(("GET", "/product_families")) == 1
+
+
+@pytest.mark.usefixtures("fake_chargify")
+class TestProductsSnapshot:
+    def test_boot_offline_from_snapshot(self, settings, tmp_path):
+        # GIVEN
+        settings.CHARGIFY_PRODUCTS_SNAPSHOT_PATH = str(tmp_path / "products.json")
+        ProductsDict().refresh()
+        open_circuit_breaker()
+
+        # WHEN
+        products = ProductsDict()
+        products.warm_up(background_refresh=False)
+
+        # THEN
+        assert products.trial["handle"] == TRIAL_PRODUCT_HANDLE
+        assert products.stale
+
+    def test_snapshot_of_another_version_is_ignored(self, fake_chargify, tmp_path):
+        # GIVEN
+        path = tmp_path / "products.json"
+        path.write_text(json.dumps({"schema_version": 0, "products": []}))
+        products = ProductsDict()
+
+        # WHEN
+        loaded = products.load_snapshot(str(path))
+
+        # THEN
+        assert not loaded
+        assert fake_chargify.call_count() == 0
+
+    def test_warm_up_without_snapshot(self, fake_chargify):
+        # GIVEN
+        products = ProductsDict()
+
+        # WHEN
+        products.warm_up()
+
+        # THEN
+        assert fake_chargify.call_count() > 0
+        assert not products.stale
+        assert products.trial["handle"] == TRIAL_PRODUCT_HANDLE
+
+    def test_warm_up_without_snapshot_in_the_background(self, mocker):
+        # GIVEN
+        products = ProductsDict()
+        thread = mocker.patch("briefme_subscription.chargify.threading.Thread")
+
+        # WHEN
+        products.warm_up(block=False)
+
+        # THEN
+        assert not products.last_update
+        thread.return_value.start.assert_called_once()
+
+    def test_products_are_readable_while_refreshed(self, mocker):
+        # GIVEN
+        products = ProductsDict()
+        products.refresh()
+        all_products = products.get_all_products()
+        seen = []
+
+        def get_all_products():
+            for product in all_products:
+                seen.append(products[TRIAL_PRODUCT_HANDLE]["handle"])
+                yield product
+
+        mocker.patch.object(products, "get_all_products", side_effect=get_all_products)
+
+        # WHEN
+        products.refresh()
+
+        # THEN
+        assert seen and set(seen) == {TRIAL_PRODUCT_HANDLE}
+        assert products.trial["handle"] == TRIAL_PRODUCT_HANDLE
+
+
+@pytest.mark.usefixtures("fake_chargify")
+class TestCompactProducts:
+    @pytest.fixture
+    def products(self, settings):
+        settings.CHARGIFY_COMPACT_PRODUCTS = True
+        products = ProductsDict()
+        products.refresh()
+        return products
+
+    def test_records_read_like_the_products(self, fake_chargify, products):
+        # GIVEN
+        product = next(
+            p
+            for p in fake_chargify.dataset.products.values()
+            if p["handle"] == "fr-gen-annuel-new"
+        )
+
+        # WHEN
+        record = products["fr-gen-annuel-new"]
+
+        # THEN
+        assert isinstance(record, ProductRecord)
+        assert record["name"] == record.name == product["name"]
+        assert record["product_family"] == product["product_family"]
+        assert record.interval_yearly and not record.interval_monthly
+        assert record.price == Decimal("58.80")
+        assert record.to_dict() == dict(
+            product, interval_yearly=True, interval_monthly=False
+        )
+        with pytest.raises(AttributeError):
+            record.name = "Abonnement"
+
+    def test_snapshot(self, products, tmp_path):
+        # GIVEN
+        path = str(tmp_path / "products.json")
+        products.save_snapshot(path)
+        loaded = ProductsDict()
+
+        # WHEN
+        loaded.load_snapshot(path)
+
+        # THEN
+        assert loaded.trial == products.trial
+        assert pickle.loads(pickle.dumps(loaded.trial)) == products.trial
+
+    def test_get_by_id(self, products):
+        # GIVEN
+        trial = products.trial
+
+        # WHEN / THEN
+        assert products.get_by_id(trial["id"]) is trial
+        assert products.get_by_id(0, default="default") == "default"
+        with pytest.raises(IndexError):
+            products.get_by_id(0)
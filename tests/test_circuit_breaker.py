@@ -0,0 +1,270 @@
+import datetime
+import json
+
+import pytest
+import requests
+
+from django.core.cache import caches
+
+from briefme_subscription.chargify import (
+    ChargifyHelper,
+    ChargifyUnavailableError,
+    get_circuit_breaker,
+    GuardedChargifyClient,
+    ProductsDict,
+)
+from briefme_subscription.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+from .factories import ChargifySubscriptionFactory
+from .fake_chargify import TRIAL_PRODUCT_HANDLE
+from .fake_chargify.errors import ChargifyForbiddenError
+from .models import ChargifySubscription
+
+
+def open_circuit_breaker():
+    circuit_breaker = get_circuit_breaker()
+    for _ in range(circuit_breaker.failure_threshold):
+        circuit_breaker.record_failure()
+    assert circuit_breaker.state == CircuitBreaker.OPEN
+
+
+def fail():
+    raise ValueError
+
+
+class TestCircuitBreaker:
+    def test_opens_after_consecutive_failures(self):
+        # GIVEN
+        circuit_breaker = CircuitBreaker("test", failure_threshold=2)
+
+        # WHEN
+        for _ in range(2):
+            with pytest.raises(ValueError):
+                circuit_breaker.call(fail)
+
+        # THEN
+        with pytest.raises(CircuitOpenError):
+            circuit_breaker.call(lambda: None)
+
+    def test_success_resets_failures(self):
+        # GIVEN
+        circuit_breaker = CircuitBreaker("test", failure_threshold=2)
+        with pytest.raises(ValueError):
+            circuit_breaker.call(fail)
+
+        # WHEN
+        circuit_breaker.call(lambda: None)
+        with pytest.raises(ValueError):
+            circuit_breaker.call(fail)
+
+        # THEN
+        assert circuit_breaker.state == CircuitBreaker.CLOSED
+
+    def test_ignored_exceptions_are_not_failures(self):
+        # GIVEN
+        circuit_breaker = CircuitBreaker("test", failure_threshold=1)
+
+        # WHEN
+        with pytest.raises(ValueError):
+            circuit_breaker.call(fail, is_failure=lambda e: False)
+
+        # THEN
+        assert circuit_breaker.state == CircuitBreaker.CLOSED
+
+    def test_half_open_probe(self):
+        # GIVEN
+        circuit_breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=0)
+        with pytest.raises(ValueError):
+            circuit_breaker.call(fail)
+
+        # WHEN
+        circuit_breaker.before_call()
+
+        # THEN
+        assert circuit_breaker.state == CircuitBreaker.HALF_OPEN
+        with pytest.raises(CircuitOpenError):
+            circuit_breaker.before_call()
+        circuit_breaker.record_success()
+        assert circuit_breaker.state == CircuitBreaker.CLOSED
+
+    def test_hung_probe_lets_another_one_through(self, mocker):
+        # GIVEN
+        monotonic = mocker.patch(
+            "briefme_subscription.circuit_breaker.time.monotonic", return_value=0
+        )
+        circuit_breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=30)
+        circuit_breaker.record_failure()
+        monotonic.return_value = 30
+        circuit_breaker.before_call()
+
+        # WHEN
+        monotonic.return_value = 60
+
+        # THEN
+        circuit_breaker.before_call()
+        assert circuit_breaker.state == CircuitBreaker.HALF_OPEN
+
+
+@pytest.mark.usefixtures("fake_chargify")
+class TestChargifyHelperCircuitBreaker:
+    def test_open_circuit_breaker_fails_fast(self, fake_chargify):
+        # GIVEN
+        subscription_id = next(iter(fake_chargify.dataset.subscriptions))
+        helper = ChargifyHelper()
+        fake_chargify.faults.fail_next(status=500, times=5)
+        for _ in range(5):
+            with pytest.raises(ChargifyUnavailableError):
+                helper.get_subscription(subscription_id)
+        fake_chargify.reset_calls()
+
+        # WHEN / THEN
+        with pytest.raises(ChargifyUnavailableError):
+            helper.get_subscription(subscription_id)
+        assert fake_chargify.call_count() == 0
+
+    def test_not_found_is_not_a_failure(self, fake_chargify):
+        # GIVEN
+        helper = ChargifyHelper()
+
+        # WHEN
+        for _ in range(10):
+            helper.get_subscription(1)
+
+        # THEN
+        assert get_circuit_breaker().state == CircuitBreaker.CLOSED
+
+    def test_client_errors_are_not_failures(self, fake_chargify):
+        # GIVEN
+        subscription_id = next(iter(fake_chargify.dataset.subscriptions))
+        helper = ChargifyHelper()
+        fake_chargify.faults.fail_next(status=403, times=10)
+
+        # WHEN
+        for _ in range(10):
+            with pytest.raises(ChargifyForbiddenError):
+                helper.chargify_python.subscriptions(subscription_id=subscription_id)
+
+        # THEN
+        assert get_circuit_breaker().state == CircuitBreaker.CLOSED
+
+    def test_throttling_is_a_failure(self, fake_chargify):
+        # GIVEN
+        subscription_id = next(iter(fake_chargify.dataset.subscriptions))
+        helper = ChargifyHelper()
+        fake_chargify.faults.fail_next(status=429)
+
+        # WHEN / THEN
+        with pytest.raises(ChargifyUnavailableError):
+            helper.chargify_python.subscriptions(subscription_id=subscription_id)
+        assert get_circuit_breaker()._failures == 1
+
+    @pytest.mark.usefixtures("fake_chargify_server")
+    def test_throttling_seen_in_the_response_is_a_failure(self, fake_chargify, settings):
+        # GIVEN
+        fake_chargify.faults.fail_next(status=429)
+
+        def client():
+            # Like a client raising an error which carries no status.
+            requests.get(f"{settings.CHARGIFY_SUBDOMAIN}/subscriptions.json")
+            raise ValueError("Unexpected response")
+
+        # WHEN / THEN
+        with pytest.raises(ChargifyUnavailableError):
+            GuardedChargifyClient(client)()
+        assert get_circuit_breaker()._failures == 1
+
+    def test_bugs_are_not_failures(self, mocker):
+        # GIVEN
+        helper = ChargifyHelper()
+        helper.chargify_python = GuardedChargifyClient(mocker.Mock(side_effect=KeyError))
+
+        # WHEN
+        for _ in range(10):
+            with pytest.raises(KeyError):
+                helper.chargify_python.subscriptions()
+
+        # THEN
+        assert get_circuit_breaker().state == CircuitBreaker.CLOSED
+
+    def test_products_are_served_stale(self):
+        # GIVEN
+        products = ProductsDict()
+        products._load()
+        products.last_update = datetime.datetime(2020, 1, 1)
+        open_circuit_breaker()
+
+        # WHEN
+        product = products[TRIAL_PRODUCT_HANDLE]
+
+        # THEN
+        assert product["handle"] == TRIAL_PRODUCT_HANDLE
+        assert products.stale
+        assert not products._is_outdated()
+
+
+@pytest.mark.django_db
+class TestChargifySubscriptionStaleCache:
+    def test_last_known_subscription_is_served(self):
+        # GIVEN
+        with open("tests/fixtures/active_subscription.json") as f:
+            payload = json.load(f)
+        subscription = ChargifySubscriptionFactory(chargify_subscription_cache=payload)
+        subscription.clear_chargify_subscription_cache()
+        open_circuit_breaker()
+
+        # WHEN
+        state = subscription.state
+
+        # THEN
+        assert state == "active"
+        assert subscription.chargify_subscription.stale
+        subscription.refresh_from_db()
+        assert subscription.chargify_subscription_cache == {}
+
+    def test_clearing_keeps_no_shared_copy(self):
+        # GIVEN
+        with open("tests/fixtures/active_subscription.json") as f:
+            payload = json.load(f)
+        subscription = ChargifySubscriptionFactory(chargify_subscription_cache=payload)
+        options = ChargifySubscription.get_last_known_cache_options()
+        key = ChargifySubscription.get_last_known_cache_key(subscription.uuid)
+        caches[options["alias"]].delete(key)
+
+        # WHEN
+        subscription.clear_chargify_subscription_cache()
+
+        # THEN
+        assert caches[options["alias"]].get(key) is None
+
+    def test_last_known_subscription_is_served_to_the_next_requests(self):
+        # GIVEN
+        with open("tests/fixtures/active_subscription.json") as f:
+            payload = json.load(f)
+        pk = ChargifySubscriptionFactory(chargify_subscription_cache={}).pk
+        ChargifySubscription.objects.get(pk=pk).refresh_chargify_subscription_cache(
+            chargify_subscription=payload
+        )
+        open_circuit_breaker()
+        first = ChargifySubscription.objects.get(pk=pk)
+        first.clear_chargify_subscription_cache()
+        assert first.state == "active"
+
+        # WHEN
+        second = ChargifySubscription.objects.get(pk=pk)
+        second.clear_chargify_subscription_cache()
+        state = second.state
+
+        # THEN
+        assert state == "active"
+        assert second.chargify_subscription.stale
+        second.refresh_from_db()
+        assert second.chargify_subscription_cache == {}
+
+    def test_unavailable_without_last_known_subscription(self):
+        # GIVEN
+        subscription = ChargifySubscriptionFactory(chargify_subscription_cache={})
+        open_circuit_breaker()
+
+        # WHEN / THEN
+        with pytest.raises(ChargifyUnavailableError):
+            subscription.refresh_chargify_subscription_cache()
@@ -0,0 +1,136 @@
+import time
+
+import pytest
+import requests
+
+from briefme_subscription.chargify import (
+    ChargifyHelper,
+    ChargifyTimeoutError,
+    get_circuit_breaker,
+    GuardedChargifyClient,
+)
+from briefme_subscription.circuit_breaker import CircuitBreaker
+from briefme_subscription.deadlines import (
+    BATCH,
+    deadline,
+    DeadlineExceeded,
+    get_timeout,
+    remaining_time,
+)
+
+from .fake_chargify import FakeChargifyClient, HttpTransport
+
+
+class TestDeadline:
+    def test_no_deadline(self, settings):
+        # GIVEN
+        settings.CHARGIFY_TIMEOUTS = {BATCH: (1, 5)}
+
+        # WHEN
+        timeout = get_timeout(BATCH)
+
+        # THEN
+        assert remaining_time() is None
+        assert timeout == (1, 5, False)
+
+    def test_timeouts_are_capped_by_the_deadline(self):
+        # WHEN
+        with deadline(0.5):
+            timeout = get_timeout()
+
+        # THEN
+        assert 0 < timeout.connect
+        assert 0 < timeout.read
+        assert timeout.connect + timeout.read <= 0.5
+        assert timeout.capped
+
+    def test_nested_deadline_cannot_extend(self):
+        # WHEN
+        with deadline(0.5):
+            with deadline(60):
+                remaining = remaining_time()
+
+        # THEN
+        assert remaining <= 0.5
+
+    def test_passed_deadline(self):
+        # WHEN / THEN
+        with deadline(0):
+            with pytest.raises(DeadlineExceeded):
+                get_timeout()
+
+
+@pytest.fixture
+def chargify_client(fake_chargify_server, mocker):
+    """
+    Call the fake Chargify site over HTTP with a session of its own and no
+    timeout, like the "Chargify Python" library.
+    """
+    mocker.patch(
+        "briefme_subscription.chargify.get_chargify_python",
+        return_value=FakeChargifyClient(HttpTransport(fake_chargify_server.url)),
+    )
+
+
+@pytest.mark.usefixtures("fake_chargify")
+class TestChargifyHelperTimeouts:
+    def test_call_fails_fast_once_the_deadline_has_passed(self, fake_chargify):
+        # GIVEN
+        subscription_id = next(iter(fake_chargify.dataset.subscriptions))
+        helper = ChargifyHelper()
+
+        # WHEN
+        with deadline(0):
+            with pytest.raises(ChargifyTimeoutError):
+                helper.get_subscription(subscription_id)
+
+        # THEN
+        assert fake_chargify.call_count() == 0
+
+    @pytest.mark.usefixtures("chargify_client")
+    def test_call_is_cut_short_by_the_deadline(self, fake_chargify):
+        # GIVEN
+        subscription_id = next(iter(fake_chargify.dataset.subscriptions))
+        fake_chargify.faults.latency = 0.5
+        helper = ChargifyHelper()
+        start = time.monotonic()
+
+        # WHEN
+        with deadline(0.1):
+            with pytest.raises(ChargifyTimeoutError):
+                helper.get_subscription(subscription_id)
+
+        # THEN
+        assert time.monotonic() - start < 0.1 + 0.05
+        assert get_circuit_breaker().state == CircuitBreaker.CLOSED
+
+    @pytest.mark.usefixtures("chargify_client")
+    def test_timeout_is_a_failure(self, fake_chargify, settings):
+        # GIVEN
+        settings.CHARGIFY_TIMEOUTS = {BATCH: (0.05, 0.05)}
+        subscription_id = next(iter(fake_chargify.dataset.subscriptions))
+        fake_chargify.faults.latency = 0.5
+        helper = ChargifyHelper(timeout_category=BATCH)
+
+        # WHEN
+        with pytest.raises(ChargifyTimeoutError):
+            helper.get_subscription(subscription_id)
+
+        # THEN
+        assert get_circuit_breaker()._failures == 1
+
+    @pytest.mark.usefixtures("fake_chargify_server")
+    def test_requests_sent_without_session_are_cut_short(self, fake_chargify, settings):
+        # GIVEN
+        fake_chargify.faults.latency = 0.5
+        url = f"{settings.CHARGIFY_SUBDOMAIN}/subscriptions.json"
+        client = GuardedChargifyClient(lambda: requests.get(url))
+        start = time.monotonic()
+
+        # WHEN
+        with deadline(0.1):
+            with pytest.raises(ChargifyTimeoutError):
+                client()
+
+        # THEN
+        assert time.monotonic() - start < 0.1 + 0.05
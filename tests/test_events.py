@@ -0,0 +1,160 @@
+import threading
+
+from django.utils import timezone
+
+from briefme_subscription import events
+from briefme_subscription.events import (
+    BufferedEventDispatcher,
+    dispatch_event,
+    Event,
+    SyncEventDispatcher,
+)
+
+
+class Sender:
+    def __init__(self):
+        self.batches = []
+        self.sent = threading.Event()
+
+    def __call__(self, batch):
+        self.batches.append(batch)
+        self.sent.set()
+
+    @property
+    def events(self):
+        return [event for batch in self.batches for event in batch]
+
+
+class FailingSender:
+    def __call__(self, batch):
+        raise ConnectionError("Segment is unavailable")
+
+
+class TestEventDispatchers:
+    def test_sync_dispatcher_sends_right_away(self, mocker):
+        # GIVEN
+        mocker.patch.object(events, "_event_dispatcher", None)
+        track = mocker.patch("analytics.track")
+
+        # WHEN
+        dispatch_event(1, "Subscribed", {"plan": "mensuel"})
+
+        # THEN
+        assert isinstance(events.get_event_dispatcher(), SyncEventDispatcher)
+        track.assert_called_once_with(
+            1, "Subscribed", {"plan": "mensuel"}, timestamp=mocker.ANY
+        )
+
+    def test_buffered_dispatcher_sends_batches(self):
+        # GIVEN
+        sender = Sender()
+        dispatcher = BufferedEventDispatcher(sender, batch_size=2, background=False)
+
+        # WHEN
+        for i in range(5):
+            dispatcher.dispatch(i, "Subscribed")
+        dispatcher.flush()
+
+        # THEN
+        assert [len(batch) for batch in sender.batches] == [2, 2, 1]
+
+    def test_background_flush(self):
+        # GIVEN
+        sender = Sender()
+        dispatcher = BufferedEventDispatcher(sender, flush_interval=0.01)
+
+        # WHEN
+        dispatcher.dispatch(1, "Subscribed")
+
+        # THEN
+        assert sender.sent.wait(timeout=5)
+        assert sender.events[0].name == "Subscribed"
+
+    def test_overflow_is_dropped(self):
+        # GIVEN
+        sender = Sender()
+        dispatcher = BufferedEventDispatcher(
+            sender, max_queue_size=2, background=False
+        )
+
+        # WHEN
+        for i in range(5):
+            dispatcher.dispatch(i, "Subscribed")
+        dispatcher.flush()
+
+        # THEN
+        assert dispatcher.dropped == 3
+        assert [event.user_id for event in sender.events] == [0, 1]
+
+    def test_overflow_is_spilled_to_disk(self, tmp_path):
+        # GIVEN
+        sender = Sender()
+        dispatcher = BufferedEventDispatcher(
+            sender,
+            max_queue_size=2,
+            spill_path=str(tmp_path / "events.jsonl"),
+            background=False,
+        )
+
+        # WHEN
+        for i in range(5):
+            dispatcher.dispatch(i, "Subscribed", {"index": i})
+        dispatcher.flush()
+
+        # THEN
+        assert dispatcher.dropped == 0
+        assert sorted(event.user_id for event in sender.events) == [0, 1, 2, 3, 4]
+        assert sender.events[-1].properties == {"index": 4}
+        assert not (tmp_path / "events.jsonl").exists()
+
+    def test_failed_batch_is_spilled_then_replayed(self, tmp_path):
+        # GIVEN
+        sender = Sender()
+        spill_path = tmp_path / "events.jsonl"
+        dispatcher = BufferedEventDispatcher(
+            sender, spill_path=str(spill_path), background=False
+        )
+        dispatcher.sender = FailingSender()
+        dispatcher.dispatch(1, "Subscribed")
+        dispatcher.flush()
+        assert len(spill_path.read_text().splitlines()) == 1
+
+        # WHEN
+        dispatcher.sender = sender
+        dispatcher.flush()
+
+        # THEN
+        assert [event.user_id for event in sender.events] == [1]
+        assert not spill_path.exists()
+
+    def test_concurrent_replays_lose_no_event(self, mocker, tmp_path):
+        # GIVEN
+        sender = Sender()
+        spill_path = tmp_path / "events.jsonl"
+        dispatcher = BufferedEventDispatcher(
+            sender, spill_path=str(spill_path), background=False
+        )
+        dispatcher.sender = FailingSender()
+        dispatcher.dispatch(1, "Subscribed")
+        dispatcher.flush()
+        dispatcher.sender = sender
+
+        def replay_concurrently(path, *args, **kwargs):
+            # Another replay starts between the rename and the read.
+            if open_.call_count == 1:
+                dispatcher._overflow([Event(2, "Subscribed", {}, timezone.now())])
+                dispatcher._replay_spilled()
+            return open(path, *args, **kwargs)
+
+        open_ = mocker.patch(
+            "briefme_subscription.events.open",
+            side_effect=replay_concurrently,
+            create=True,
+        )
+
+        # WHEN
+        dispatcher._replay_spilled()
+
+        # THEN
+        assert sorted(event.user_id for event in sender.events) == [1, 2]
+        assert list(tmp_path.iterdir()) == []
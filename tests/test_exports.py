@@ -0,0 +1,83 @@
+import csv
+import datetime
+import gzip
+import io
+import json
+
+from decimal import Decimal
+
+import pytest
+
+from briefme_subscription.exports import (
+    convert_amount,
+    export_invoices,
+    invoice_export_response,
+    INVOICE_COLUMNS,
+)
+
+
+def test_convert_amount_rounds_half_up():
+    # WHEN / THEN
+    assert convert_amount({"total_amount": "1.005"}, "total_amount") == Decimal("1.01")
+    assert convert_amount({"total_amount_in_cents": 5880}, "total_amount") == Decimal(
+        "58.80"
+    )
+    assert convert_amount({}, "total_amount") == Decimal("0")
+
+
+@pytest.mark.usefixtures("fake_chargify")
+class TestExportInvoices:
+    def test_export_csv(self, fake_chargify):
+        # GIVEN
+        output = io.BytesIO()
+
+        # WHEN
+        export_invoices(output, per_page=7)
+
+        # THEN
+        rows = list(csv.DictReader(io.StringIO(output.getvalue().decode())))
+        assert len(rows) == len(fake_chargify.dataset.invoices)
+        assert tuple(rows[0]) == INVOICE_COLUMNS
+
+    def test_export_gzipped_json_lines(self, fake_chargify):
+        # GIVEN
+        output = io.BytesIO()
+        invoice = next(iter(fake_chargify.dataset.invoices.values()))
+
+        # WHEN
+        export_invoices(output, export_format="jsonl", compress=True)
+
+        # THEN
+        lines = gzip.decompress(output.getvalue()).decode().splitlines()
+        assert len(lines) == len(fake_chargify.dataset.invoices)
+        row = json.loads(lines[0])
+        assert Decimal(row["total_amount"]) == Decimal(invoice["total_amount"])
+
+    def test_export_with_filters(self, fake_chargify):
+        # GIVEN
+        output = io.BytesIO()
+        start_date = datetime.date(2019, 1, 1)
+        end_date = datetime.date(2019, 6, 30)
+        expected = [
+            invoice
+            for invoice in fake_chargify.dataset.invoices.values()
+            if "2019-01-01" <= invoice["issue_date"] <= "2019-06-30"
+        ]
+
+        # WHEN
+        export_invoices(
+            output, export_format="jsonl", start_date=start_date, end_date=end_date
+        )
+
+        # THEN
+        assert len(output.getvalue().splitlines()) == len(expected)
+
+    def test_export_response_is_streamed(self, fake_chargify):
+        # WHEN
+        response = invoice_export_response(filename="2019", compress=True)
+
+        # THEN
+        assert response.streaming
+        assert response["Content-Disposition"] == 'attachment; filename="2019.csv.gz"'
+        content = gzip.decompress(b"".join(response.streaming_content)).decode()
+        assert len(content.splitlines()) == len(fake_chargify.dataset.invoices) + 1
@@ -1,3 +1,5 @@
+import copy
+
 import pytest
 
 from briefme_subscription.chargify import (
@@ -6,6 +8,8 @@ from briefme_subscription.chargify import (
 )
 from briefme_subscription.forms import ChargifyUpdateCustomerForm, ChargifyJsPaymentForm
 
+from .factories import ChargifySubscriptionFactory
+
 pytestmark = pytest.mark.django_db()
 
 
@@ -144,3 +148,85 @@ class TestChargifyJsPaymentForm:
         ChargifyHelper().reactivate_subscription.assert_called_once_with(
             subscription_id=subscription_with_state.uuid, include_trial=False
         )
+
+
+class TestChargifyJsPaymentFormRoundTrips:
+    @staticmethod
+    def _subscription(fake_chargify, state):
+        chargify_subscription = next(
+            s
+            for s in fake_chargify.dataset.subscriptions.values()
+            if s["state"] == state
+        )
+        subscription = ChargifySubscriptionFactory(
+            uuid=chargify_subscription["id"],
+            chargify_subscription_cache=copy.deepcopy(chargify_subscription),
+        )
+        fake_chargify.reset_calls()
+        return subscription
+
+    @pytest.mark.parametrize(
+        "state, round_trips, new_state",
+        [("trialing", 2, "trialing"), ("trial_ended", 3, "active")],
+    )
+    def test_checkout_round_trips(self, fake_chargify, state, round_trips, new_state):
+        # GIVEN
+        subscription = self._subscription(fake_chargify, state)
+        data = {"chargify_token": "tok_visa", "country": "FR", "zip": "75000"}
+
+        # WHEN
+        form = ChargifyJsPaymentForm(
+            data=data,
+            request={"user": subscription.user},
+            current_subscription=subscription,
+            payment_method="credit_card",
+        )
+
+        # THEN
+        assert form.is_valid()
+        assert len(fake_chargify.calls) == round_trips
+        subscription.refresh_from_db()
+        cache = subscription.chargify_subscription_cache
+        assert cache["state"] == new_state
+        assert cache["credit_card"]["masked_card_number"] == "XXXX-XXXX-XXXX-1111"
+
+    def test_trial_checkout_only_stores_the_payment_profile(self, fake_chargify):
+        # GIVEN
+        subscription = self._subscription(fake_chargify, "trialing")
+        cache = subscription.chargify_subscription_cache
+        cache["payment_collection_method"] = "remittance"
+        subscription.save()
+        data = {"chargify_token": "tok_visa", "country": "FR", "zip": "75000"}
+
+        # WHEN
+        form = ChargifyJsPaymentForm(
+            data=data,
+            request={"user": subscription.user},
+            current_subscription=subscription,
+            payment_method="credit_card",
+        )
+
+        # THEN
+        assert form.is_valid()
+        subscription.refresh_from_db()
+        stored = subscription.chargify_subscription_cache
+        assert stored["credit_card"]["masked_card_number"] == "XXXX-XXXX-XXXX-1111"
+        assert {k: v for k, v in stored.items() if k != "credit_card"} == {
+            k: v for k, v in cache.items() if k != "credit_card"
+        }
+
+    def test_invalid_form_makes_no_call(self, fake_chargify):
+        # GIVEN
+        subscription = self._subscription(fake_chargify, "trialing")
+
+        # WHEN
+        form = ChargifyJsPaymentForm(
+            data={},
+            request={"user": subscription.user},
+            current_subscription=subscription,
+            payment_method="credit_card",
+        )
+
+        # THEN
+        assert not form.is_valid()
+        assert fake_chargify.calls == []
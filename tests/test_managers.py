@@ -0,0 +1,199 @@
+import csv
+import io
+
+import pytest
+
+from django.core.management import call_command
+from django.db import transaction
+
+from .factories import TrialCouponFactory
+from .models import TrialCoupon
+
+pytestmark = pytest.mark.django_db()
+
+
+class TestTrialCouponManager:
+    def test_get_default_is_cached(self, django_assert_num_queries):
+        # GIVEN
+        coupon = TrialCouponFactory(token="default")
+        TrialCoupon.objects.get_default()
+
+        # WHEN
+        with django_assert_num_queries(0):
+            default = TrialCoupon.objects.get_default()
+
+        # THEN
+        assert default == coupon
+
+    def test_cached_coupon_cannot_be_altered(self):
+        # GIVEN
+        TrialCouponFactory(token="default", number_of_days=15)
+        coupon = TrialCoupon.objects.get_default()
+
+        # WHEN
+        coupon.number_of_days = 30
+        coupon._state.fields_cache["altered"] = True
+
+        # THEN
+        default = TrialCoupon.objects.get_default()
+        assert default.number_of_days == 15
+        assert "altered" not in default._state.fields_cache
+
+    def test_get_by_codename(self):
+        # GIVEN
+        coupon = TrialCouponFactory()
+
+        # WHEN
+        found = TrialCoupon.objects.get_by_codename(coupon.codename)
+
+        # THEN
+        assert found == coupon
+
+    def test_unknown_token_is_cached(self, django_assert_num_queries):
+        # GIVEN
+        with pytest.raises(TrialCoupon.DoesNotExist):
+            TrialCoupon.objects.get_by_token("wp-admin")
+
+        # WHEN / THEN
+        with django_assert_num_queries(0):
+            with pytest.raises(TrialCoupon.DoesNotExist):
+                TrialCoupon.objects.get_by_token("wp-admin")
+
+    @pytest.mark.django_db(transaction=True)
+    def test_save_invalidates_the_cache(self):
+        # GIVEN
+        coupon = TrialCouponFactory(token="brief2020", number_of_days=15)
+        TrialCoupon.objects.get_by_token("brief2020")
+
+        # WHEN
+        coupon.token = "brief2021"
+        coupon.number_of_days = 30
+        coupon.save()
+
+        # THEN
+        assert TrialCoupon.objects.get_by_token("brief2021").number_of_days == 30
+        with pytest.raises(TrialCoupon.DoesNotExist):
+            TrialCoupon.objects.get_by_token("brief2020")
+
+    @pytest.mark.django_db(transaction=True)
+    def test_cache_is_invalidated_once_committed(self):
+        # GIVEN
+        coupon = TrialCouponFactory(token="brief2020", number_of_days=15)
+        TrialCoupon.objects.get_by_token("brief2020")
+
+        # WHEN
+        with transaction.atomic():
+            coupon.number_of_days = 30
+            coupon.save()
+            during = TrialCoupon.objects.get_by_token("brief2020")
+
+        # THEN
+        assert during.number_of_days == 15
+        assert TrialCoupon.objects.get_by_token("brief2020").number_of_days == 30
+
+    @pytest.mark.django_db(transaction=True)
+    def test_delete_invalidates_the_cache(self):
+        # GIVEN
+        coupon = TrialCouponFactory(token="brief2020")
+        TrialCoupon.objects.get_by_token("brief2020")
+
+        # WHEN
+        coupon.delete()
+
+        # THEN
+        with pytest.raises(TrialCoupon.DoesNotExist):
+            TrialCoupon.objects.get_by_token("brief2020")
+
+
+class TestTrialCouponBulkGeneration:
+    def test_bulk_generate(self, django_assert_max_num_queries):
+        # GIVEN
+        TrialCouponFactory(token="PARTNER-AAAA")
+        output = io.StringIO()
+
+        # WHEN
+        with django_assert_max_num_queries(7):
+            report = TrialCoupon.objects.bulk_generate(
+                250,
+                "partner",
+                prefix="PARTNER-",
+                length=4,
+                batch_size=100,
+                output=output,
+                number_of_days=60,
+            )
+
+        # THEN
+        assert report.count == 250
+        rows = list(csv.DictReader(io.StringIO(output.getvalue())))
+        assert len({row["token"] for row in rows}) == 250
+        assert all(row["token"].startswith("PARTNER-") for row in rows)
+        assert TrialCoupon.objects.filter(number_of_days=60).count() == 250
+
+    @pytest.mark.django_db(transaction=True)
+    def test_generated_token_is_not_cached_as_unknown(self, mocker):
+        # GIVEN
+        with pytest.raises(TrialCoupon.DoesNotExist):
+            TrialCoupon.objects.get_by_token("AAAA")
+        mocker.patch("briefme_subscription.managers.secrets.choice", return_value="A")
+
+        # WHEN
+        TrialCoupon.objects.bulk_generate(1, "partner", length=4)
+
+        # THEN
+        assert TrialCoupon.objects.get_by_token("AAAA").codename == "partner-aaaa"
+
+    def test_codename_prefix_is_lowercased(self, mocker):
+        # GIVEN
+        TrialCouponFactory(token="OTHER", codename="partner-aaaa")
+        mocker.patch(
+            "briefme_subscription.managers.secrets.choice",
+            side_effect=["A", "A", "A", "A", "B", "B", "B", "B"],
+        )
+
+        # WHEN
+        TrialCoupon.objects.bulk_generate(1, "Partner", length=4)
+
+        # THEN
+        assert TrialCoupon.objects.get(token="BBBB").codename == "partner-bbbb"
+
+    def test_tokens_too_short(self):
+        # WHEN / THEN
+        with pytest.raises(ValueError):
+            TrialCoupon.objects.bulk_generate(1000, "partner", length=2)
+
+    def test_command(self, tmp_path):
+        # GIVEN
+        output = tmp_path / "coupons.csv"
+
+        # WHEN
+        call_command(
+            "generate_trial_coupons",
+            "10",
+            str(output),
+            codename_prefix="partner",
+            partner_label="Partner",
+            stdout=io.StringIO(),
+        )
+
+        # THEN
+        assert len(output.read_text().splitlines()) == 11
+        assert TrialCoupon.objects.filter(partner_label="Partner").count() == 10
+
+    def test_command_within_the_clock_resolution(self, mocker, tmp_path):
+        # GIVEN
+        time = mocker.patch("briefme_subscription.managers.time")
+        time.monotonic.return_value = 0
+        stdout = io.StringIO()
+
+        # WHEN
+        call_command(
+            "generate_trial_coupons",
+            "10",
+            str(tmp_path / "coupons.csv"),
+            codename_prefix="partner",
+            stdout=stdout,
+        )
+
+        # THEN
+        assert stdout.getvalue().startswith("10 coupons generated in 0.0s")
@@ -0,0 +1,438 @@
+import datetime
+import json
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from django.contrib.admin import AdminSite, ModelAdmin
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+
+from briefme_subscription.admin import ChargifySubscriptionAdminMixin
+from briefme_subscription.chargify import ChargifyHelper
+from briefme_subscription.models import _subscription_local_cache, parse_date
+from briefme_subscription.views.hooks import parse_chargify_webhook
+
+from .factories import ChargifySubscriptionFactory, UserFactory
+from .models import ChargifySubscription
+
+pytestmark = pytest.mark.django_db()
+
+with open("tests/fixtures/active_subscription.json") as f:
+    ACTIVE_SUBSCRIPTION = json.load(f)
+
+
+class TestParseDate:
+    @pytest.mark.parametrize(
+        "value",
+        [
+            "2020-01-13T23:00:01+01:00",
+            "2020-01-13T22:00:01Z",
+            "Mon, 13 Jan 2020 22:00:01 GMT",
+        ],
+    )
+    def test_parse(self, value):
+        # WHEN
+        parsed = parse_date(value)
+
+        # THEN
+        assert parsed == datetime.datetime(
+            2020, 1, 13, 22, 0, 1, tzinfo=datetime.timezone.utc
+        )
+
+    @pytest.mark.parametrize("value", [None, "", "not a date", {"a": "dict"}])
+    def test_invalid(self, value):
+        # WHEN / THEN
+        assert parse_date(value) == ""
+
+
+class TestChargifySubscriptionCacheProjection:
+    def test_projection_serves_the_same_attributes(self):
+        # GIVEN
+        full = ChargifySubscription.ChargifyProxy(ACTIVE_SUBSCRIPTION)
+
+        # WHEN
+        projected = ChargifySubscription.ChargifyProxy(
+            ChargifySubscription.project_chargify_subscription(ACTIVE_SUBSCRIPTION)
+        )
+
+        # THEN
+        blocks = {"credit_card", "customer", "paypal_account", "product"}
+        for attribute in ChargifySubscription.ChargifyProxy.attribute_lookup:
+            if attribute not in blocks:
+                assert getattr(projected, attribute) == getattr(full, attribute)
+        assert len(json.dumps(projected._chargify_subscription)) < len(
+            json.dumps(ACTIVE_SUBSCRIPTION)
+        )
+
+    def test_extra_fields(self, settings):
+        # GIVEN
+        settings.CHARGIFY_SUBSCRIPTION_CACHE_EXTRA_FIELDS = ["customer__phone"]
+
+        # WHEN
+        projection = ChargifySubscription.project_chargify_subscription(
+            ACTIVE_SUBSCRIPTION
+        )
+
+        # THEN
+        assert projection["customer"]["phone"] == (
+            ACTIVE_SUBSCRIPTION["customer"]["phone"]
+        )
+
+    def test_refresh_stores_the_projection(self, mocker, settings):
+        # GIVEN
+        settings.CHARGIFY_SUBSCRIPTION_CACHE_PROJECTION = True
+        mocker.patch.object(
+            ChargifyHelper, "get_subscription", return_value=ACTIVE_SUBSCRIPTION
+        )
+        subscription = ChargifySubscriptionFactory(user=UserFactory())
+
+        # WHEN
+        subscription.refresh_chargify_subscription_cache()
+
+        # THEN
+        subscription.refresh_from_db()
+        assert subscription.chargify_subscription_cache == (
+            ChargifySubscription.project_chargify_subscription(ACTIVE_SUBSCRIPTION)
+        )
+
+    def test_compact_command(self):
+        # GIVEN
+        subscriptions = ChargifySubscriptionFactory.create_batch(
+            3, chargify_subscription_cache=ACTIVE_SUBSCRIPTION
+        )
+
+        # WHEN
+        call_command("compact_chargify_subscription_caches", "--batch-size", "2")
+
+        # THEN
+        for subscription in subscriptions:
+            subscription.refresh_from_db()
+            assert subscription.chargify_subscription_cache == (
+                ChargifySubscription.project_chargify_subscription(ACTIVE_SUBSCRIPTION)
+            )
+
+
+class TestForList:
+    def test_listing_takes_one_query_and_no_chargify_call(
+        self, mocker, django_assert_num_queries
+    ):
+        # GIVEN
+        get_subscription = mocker.patch.object(ChargifyHelper, "get_subscription")
+        ChargifySubscriptionFactory.create_batch(
+            3, chargify_subscription_cache=ACTIVE_SUBSCRIPTION
+        )
+        ChargifySubscriptionFactory(
+            chargify_subscription_cache={
+                "state": "trialing",
+                "trial_ended_at": "2030-01-31T10:00:00+01:00",
+            },
+            trial_coupon__codename="partner",
+        )
+        ChargifySubscriptionFactory(chargify_subscription_cache={}, uuid=42)
+
+        # WHEN
+        with django_assert_num_queries(1):
+            values = [str(s) for s in ChargifySubscription.objects.for_list()]
+
+        # THEN
+        assert "trialing - date de fin: 31/01/2030 - coupon: partner" in values
+        assert "ID: 42" in values
+        assert len([v for v in values if v.startswith("active - ID: ")]) == 3
+        get_subscription.assert_not_called()
+
+    def test_admin_mixin(self, rf):
+        # GIVEN
+        class ChargifySubscriptionAdmin(ChargifySubscriptionAdminMixin, ModelAdmin):
+            pass
+
+        ChargifySubscriptionFactory(chargify_subscription_cache=ACTIVE_SUBSCRIPTION)
+        model_admin = ChargifySubscriptionAdmin(ChargifySubscription, AdminSite())
+
+        # WHEN
+        subscription = model_admin.get_queryset(rf.get("/")).get()
+
+        # THEN
+        assert "chargify_subscription_cache" in subscription.get_deferred_fields()
+        assert model_admin.state(subscription) == "active"
+
+
+class TestCardExpiration:
+    @pytest.fixture
+    def subscriptions(self):
+        today = datetime.date.today()
+        cards = [
+            (today.year - 1, 1),
+            (today.year, today.month),
+            (today.year + 1, today.month),
+            None,
+        ] + [
+            ((today + datetime.timedelta(days=20)).year, month)
+            for month in range(1, 13)
+        ]
+        return [
+            ChargifySubscriptionFactory(
+                chargify_subscription_cache={
+                    "credit_card": card
+                    and {"expiration_year": card[0], "expiration_month": card[1]}
+                }
+            )
+            for card in cards
+        ]
+
+    def test_card_expiration_date(self, subscriptions):
+        # WHEN
+        queryset = ChargifySubscription.objects.with_card_expiration_date()
+
+        # THEN
+        for subscription in queryset:
+            if subscription.chargify_subscription_cache["credit_card"]:
+                assert subscription.card_expiration_date == (
+                    subscription.credit_card_expiration_date
+                )
+            else:
+                assert subscription.card_expiration_date is None
+
+    def test_card_expiration_date_written_from_a_webhook(self):
+        # GIVEN
+        cache = parse_chargify_webhook(
+            {
+                "payload[subscription][credit_card][expiration_month]": "",
+                "payload[subscription][credit_card][expiration_year]": "",
+            }
+        )["payload"]["subscription"]
+        ChargifySubscriptionFactory(chargify_subscription_cache=cache)
+
+        # WHEN
+        expiring = list(ChargifySubscription.objects.card_expiring_within(35))
+
+        # THEN
+        assert expiring == []
+        assert (
+            ChargifySubscription.objects.with_card_expiration_date()
+            .get()
+            .card_expiration_date
+            is None
+        )
+
+    def test_card_expiring_within(self, subscriptions):
+        # GIVEN
+        today = datetime.date.today()
+
+        # WHEN
+        batches = list(
+            ChargifySubscription.objects.card_expiring_within(35).in_batches(2)
+        )
+
+        # THEN
+        expiring = [s for batch in batches for s in batch]
+        assert expiring
+        assert {s.pk for s in expiring} == {
+            s.pk
+            for s in subscriptions
+            if s.chargify_subscription_cache["credit_card"]
+            and s.credit_card_expiration_date >= today
+            and not s.credit_card_is_active
+        }
+        assert all(len(batch) <= 2 for batch in batches)
+
+
+class TestRefreshCoalescing:
+    @pytest.mark.django_db(transaction=True)
+    def test_concurrent_refreshes_share_a_single_fetch(self, mocker):
+        # GIVEN
+        def get_subscription(subscription_id):
+            time.sleep(0.2)
+            return ACTIVE_SUBSCRIPTION
+
+        get_subscription = mocker.patch.object(
+            ChargifyHelper, "get_subscription", side_effect=get_subscription
+        )
+        uuid = ChargifySubscriptionFactory(chargify_subscription_cache={}).uuid
+
+        def refresh():
+            subscription = ChargifySubscription.objects.get(uuid=uuid)
+            subscription.refresh_chargify_subscription_cache()
+            connection.close()
+            return subscription.chargify_subscription_cache
+
+        # WHEN
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            caches = list(executor.map(lambda _: refresh(), range(4)))
+
+        # THEN
+        assert get_subscription.call_count == 1
+        assert caches == [ACTIVE_SUBSCRIPTION] * 4
+
+    def test_refresh_takes_what_another_process_fetched(self, mocker):
+        # GIVEN
+        get_subscription = mocker.patch.object(ChargifyHelper, "get_subscription")
+        subscription = ChargifySubscriptionFactory(chargify_subscription_cache={})
+        key = f"chargify_refresh:tests.chargifysubscription:{subscription.uuid}"
+        cache.add(key, "other process", 30)
+        cache.set(f"{key}:result", ACTIVE_SUBSCRIPTION, 30)
+        threading.Timer(0.1, cache.delete, [key]).start()
+
+        # WHEN
+        subscription.refresh_chargify_subscription_cache()
+
+        # THEN
+        get_subscription.assert_not_called()
+        assert subscription.chargify_subscription_cache == ACTIVE_SUBSCRIPTION
+        assert not subscription.chargify_subscription_stale
+
+    def test_refresh_fetches_when_another_process_failed(self, mocker):
+        # GIVEN
+        get_subscription = mocker.patch.object(
+            ChargifyHelper, "get_subscription", return_value=ACTIVE_SUBSCRIPTION
+        )
+        subscription = ChargifySubscriptionFactory(
+            chargify_subscription_cache={"state": "trialing"}
+        )
+        key = f"chargify_refresh:tests.chargifysubscription:{subscription.uuid}"
+        cache.add(key, "other process", 30)
+        threading.Timer(0.1, cache.delete, [key]).start()
+
+        # WHEN
+        subscription.refresh_chargify_subscription_cache()
+
+        # THEN
+        get_subscription.assert_called_once()
+        assert subscription.chargify_subscription_cache == ACTIVE_SUBSCRIPTION
+
+    @pytest.mark.django_db(transaction=True)
+    def test_refresh_twice_within_a_transaction(self, mocker):
+        # GIVEN
+        get_subscription = mocker.patch.object(
+            ChargifyHelper, "get_subscription", return_value=ACTIVE_SUBSCRIPTION
+        )
+        subscription = ChargifySubscriptionFactory(chargify_subscription_cache={})
+
+        # WHEN
+        with transaction.atomic():
+            subscription.refresh_chargify_subscription_cache()
+            subscription.refresh_chargify_subscription_cache()
+
+        # THEN
+        assert get_subscription.call_count == 2
+
+    @pytest.mark.django_db(transaction=True)
+    def test_lock_is_released_when_the_refresh_is_rolled_back(self, mocker):
+        # GIVEN
+        mocker.patch.object(
+            ChargifyHelper, "get_subscription", return_value=ACTIVE_SUBSCRIPTION
+        )
+        subscription = ChargifySubscriptionFactory(chargify_subscription_cache={})
+        key = f"chargify_refresh:tests.chargifysubscription:{subscription.uuid}"
+
+        # WHEN
+        with pytest.raises(RuntimeError):
+            with transaction.atomic():
+                subscription.refresh_chargify_subscription_cache()
+                raise RuntimeError
+
+        # THEN
+        assert cache.get(key) is None
+        subscription.refresh_from_db()
+        assert subscription.chargify_subscription_cache == {}
+
+    def test_refresh_fetches_when_the_lock_is_held_too_long(self, mocker, settings):
+        # GIVEN
+        settings.CHARGIFY_REFRESH_LOCK = {"wait": 0.1}
+        mocker.patch.object(
+            ChargifyHelper, "get_subscription", return_value=ACTIVE_SUBSCRIPTION
+        )
+        subscription = ChargifySubscriptionFactory(chargify_subscription_cache={})
+        key = f"chargify_refresh:tests.chargifysubscription:{subscription.uuid}"
+        cache.add(key, "other process", 30)
+
+        # WHEN
+        subscription.refresh_chargify_subscription_cache()
+
+        # THEN
+        subscription.refresh_from_db()
+        assert subscription.chargify_subscription_cache == ACTIVE_SUBSCRIPTION
+        cache.delete(key)
+
+
+@pytest.mark.django_db(transaction=True)
+class TestSharedCache:
+    @pytest.fixture(autouse=True)
+    def shared_cache(self, settings):
+        settings.CHARGIFY_SUBSCRIPTION_SHARED_CACHE = {"local_timeout": 60}
+        yield
+        cache.clear()
+        _subscription_local_cache.clear()
+
+    def test_hot_reads_skip_the_database(self, mocker, django_assert_num_queries):
+        # GIVEN
+        mocker.patch.object(
+            ChargifyHelper, "get_subscription", return_value=ACTIVE_SUBSCRIPTION
+        )
+        subscription = ChargifySubscriptionFactory(chargify_subscription_cache={})
+        subscription.refresh_chargify_subscription_cache()
+
+        # WHEN
+        with django_assert_num_queries(0):
+            chargify_subscription = (
+                ChargifySubscription.get_cached_chargify_subscription(
+                    subscription.uuid
+                )
+            )
+
+        # THEN
+        assert chargify_subscription.state == "active"
+        assert chargify_subscription.running
+
+    def test_deferred_cache_is_read_from_the_shared_cache(
+        self, django_assert_num_queries
+    ):
+        # GIVEN
+        uuid = ChargifySubscriptionFactory(
+            chargify_subscription_cache=ACTIVE_SUBSCRIPTION
+        ).uuid
+
+        # WHEN
+        with django_assert_num_queries(1):
+            subscription = ChargifySubscription.objects.defer(
+                "chargify_subscription_cache"
+            ).get(uuid=uuid)
+            running = subscription.running
+
+        # THEN
+        assert running
+
+    def test_bulk_updates_write_through(self, mocker):
+        # GIVEN
+        get_subscription = mocker.patch.object(
+            ChargifyHelper, "get_subscription", return_value=ACTIVE_SUBSCRIPTION
+        )
+        subscription = ChargifySubscriptionFactory(chargify_subscription_cache={})
+        ChargifySubscription.objects.filter(pk=subscription.pk).warm_chargify_caches()
+        _subscription_local_cache.clear()
+
+        # WHEN
+        chargify_subscription = ChargifySubscription.get_cached_chargify_subscription(
+            subscription.uuid
+        )
+
+        # THEN
+        assert get_subscription.call_count == 1
+        assert chargify_subscription.state == "active"
+
+    def test_delete(self):
+        # GIVEN
+        subscription = ChargifySubscriptionFactory(
+            chargify_subscription_cache=ACTIVE_SUBSCRIPTION
+        )
+        key = ChargifySubscription.get_shared_cache_key(subscription.uuid)
+
+        # WHEN
+        subscription.delete()
+
+        # THEN
+        assert ChargifySubscription.get_shared_cache().get(key) is None
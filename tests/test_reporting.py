@@ -0,0 +1,115 @@
+import datetime
+
+import pytest
+
+from django.core.management import call_command
+
+from briefme_subscription.reporting import (
+    churn_rate,
+    mrr,
+    subscription_metrics,
+    trial_conversion_rate,
+)
+from briefme_subscription.views.hooks import parse_chargify_webhook
+
+from .factories import ChargifySubscriptionFactory
+from .models import ChargifySubscription, SubscriptionMetricsSnapshot
+
+pytestmark = pytest.mark.django_db()
+
+MONTHLY = {"handle": "mensuel", "interval": 1, "interval_unit": "month"}
+YEARLY = {"handle": "annuel", "interval": 12, "interval_unit": "month"}
+
+
+def create_subscription(state, product, amount, canceled_at=None, trial_ended_at=None):
+    return ChargifySubscriptionFactory(
+        chargify_subscription_cache={
+            "state": state,
+            "product": product,
+            "current_billing_amount_in_cents": amount,
+            "canceled_at": canceled_at,
+            "trial_ended_at": trial_ended_at,
+        }
+    )
+
+
+@pytest.fixture
+def subscriptions():
+    create_subscription("active", MONTHLY, 690, trial_ended_at="2021-03-02T10:00:00Z")
+    create_subscription("active", MONTHLY, 690)
+    create_subscription("past_due", YEARLY, 6000)
+    create_subscription("trialing", MONTHLY, 0)
+    create_subscription(
+        "canceled",
+        MONTHLY,
+        690,
+        canceled_at="2021-03-05T10:00:00+01:00",
+        trial_ended_at="2021-03-01T10:00:00Z",
+    )
+    create_subscription("canceled", YEARLY, 6000, canceled_at="2020-01-01T10:00:00Z")
+
+
+class TestSubscriptionMetrics:
+    @pytest.mark.usefixtures("subscriptions")
+    def test_metrics(self, django_assert_num_queries):
+        # GIVEN
+        start = datetime.datetime(2021, 3, 1, tzinfo=datetime.timezone.utc)
+
+        # WHEN
+        with django_assert_num_queries(1):
+            rows = subscription_metrics(
+                ChargifySubscription.objects.all(),
+                start=start,
+                end=start + datetime.timedelta(days=31),
+            )
+
+        # THEN
+        assert [(r.product_handle, r.state, r.count) for r in rows] == [
+            ("annuel", "canceled", 1),
+            ("annuel", "past_due", 1),
+            ("mensuel", "active", 2),
+            ("mensuel", "canceled", 1),
+            ("mensuel", "trialing", 1),
+        ]
+        assert mrr(rows) == 13.8 + 5
+        assert churn_rate(rows) == 1 / 5
+        assert trial_conversion_rate(rows) == 1 / 2
+
+    def test_cache_written_from_a_webhook(self):
+        # GIVEN
+        cache = parse_chargify_webhook(
+            {
+                "payload[subscription][state]": "active",
+                "payload[subscription][product][handle]": "mensuel",
+                "payload[subscription][product][interval]": "1",
+                "payload[subscription][product][interval_unit]": "month",
+                "payload[subscription][current_billing_amount_in_cents]": "690",
+                "payload[subscription][canceled_at]": "",
+                "payload[subscription][trial_ended_at]": "",
+            }
+        )["payload"]["subscription"]
+        ChargifySubscriptionFactory(chargify_subscription_cache=cache)
+
+        # WHEN
+        rows = subscription_metrics(ChargifySubscription.objects.all())
+
+        # THEN
+        assert [(r.product_handle, r.state, r.count) for r in rows] == [
+            ("mensuel", "active", 1)
+        ]
+        assert mrr(rows) == 6.9
+
+    @pytest.mark.usefixtures("subscriptions")
+    def test_snapshot_command(self):
+        # GIVEN
+        call_command("snapshot_subscription_metrics", "--date", "2021-03-05")
+
+        # WHEN
+        call_command("snapshot_subscription_metrics", "--date", "2021-03-05")
+
+        # THEN
+        snapshots = SubscriptionMetricsSnapshot.objects.filter(
+            date=datetime.date(2021, 3, 5)
+        )
+        assert snapshots.count() == 5
+        assert sum(s.canceled for s in snapshots) == 1
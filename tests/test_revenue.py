@@ -0,0 +1,127 @@
+import datetime
+
+from decimal import Decimal
+
+import pytest
+
+from briefme_subscription import revenue
+from briefme_subscription.revenue import RevenueAggregator, revenue_report, to_cents
+
+
+def invoice(issue_date, country, line_items, refund_amount="0.0"):
+    return {
+        "issue_date": issue_date,
+        "billing_address": {"country": country},
+        "refund_amount": refund_amount,
+        "line_items": [
+            {
+                "product_id": product_id,
+                "total_amount": amount,
+                "period_range_start": start,
+                "period_range_end": end,
+            }
+            for product_id, amount, start, end in line_items
+        ],
+    }
+
+
+INVOICES = [
+    invoice("2021-01-01", "FR", [(1, "120.00", "2021-01-01", "2021-12-31")]),
+    invoice("2021-01-15", "BE", [(2, "6.90", "2021-01-15", "2021-02-14")], "6.90"),
+    invoice(
+        "2021-02-01",
+        "FR",
+        [(2, "6.90", "2021-02-01", "2021-02-28"), (3, "0.10", None, None)],
+    ),
+    # Issued after `as_of`.
+    invoice("2021-08-01", "FR", [(1, "120.00", "2021-08-01", "2022-07-31")]),
+]
+
+
+@pytest.fixture(params=["numpy", "python"])
+def backend(request, mocker):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        mocker.patch.object(revenue, "numpy", None)
+
+
+@pytest.mark.usefixtures("backend")
+class TestRevenueAggregator:
+    def test_report(self):
+        # GIVEN
+        aggregator = RevenueAggregator(as_of=datetime.date(2021, 6, 30))
+
+        # WHEN
+        for start in range(0, len(INVOICES), 2):
+            aggregator.add_page(INVOICES[start : start + 2])
+        report = aggregator.report()
+
+        # THEN
+        assert report.by_month == {"2021-01": 12690, "2021-02": 700, "2021-08": 12000}
+        assert report.by_product == {1: 24000, 2: 1380, 3: 10}
+        assert report.by_country == {"FR": 24700, "BE": 690}
+        assert report.refunds_by_month == {"2021-01": 690}
+        # 184 of the 365 days of the yearly subscription remain.
+        assert report.deferred_in_cents == 12000 * 184 // 365
+        assert report.line_items == 5
+        assert report.undated_invoices == 0
+
+    def test_invoices_issued_after_as_of_are_not_deferred(self):
+        # GIVEN
+        aggregator = RevenueAggregator(as_of=datetime.date(2021, 6, 30))
+
+        # WHEN
+        aggregator.add_page(INVOICES[-1:])
+        report = aggregator.report()
+
+        # THEN
+        assert report.by_month == {"2021-08": 12000}
+        assert report.by_product == {1: 12000}
+        assert report.by_country == {"FR": 12000}
+        assert report.deferred_in_cents == 0
+        assert report.line_items == 1
+
+    def test_undated_invoices_are_counted_apart(self):
+        # GIVEN
+        aggregator = RevenueAggregator(as_of=datetime.date(2021, 6, 30))
+
+        # WHEN
+        aggregator.add_page(
+            INVOICES[:1]
+            + [
+                invoice(None, "FR", [(1, "10.00", None, None)], "10.00"),
+                invoice("", "FR", [(1, "10.00", None, None)]),
+            ]
+        )
+        report = aggregator.report()
+
+        # THEN
+        assert report.by_month == {"2021-01": 12000}
+        assert report.refunds_by_month == {}
+        assert report.line_items == 1
+        assert report.undated_invoices == 2
+
+
+def test_to_cents():
+    # WHEN / THEN
+    assert to_cents("58.80") == 5880
+    assert to_cents("1.005") == 101
+    assert to_cents("-6.90") == -690
+    assert to_cents(None) == 0
+
+
+class TestRevenueReport:
+    def test_report_of_the_site(self, fake_chargify):
+        # GIVEN
+        invoices = fake_chargify.dataset.invoices.values()
+
+        # WHEN
+        report = revenue_report(as_of=datetime.date(2100, 1, 1))
+
+        # THEN
+        assert report.line_items == sum(len(i["line_items"]) for i in invoices)
+        assert sum(report.by_month.values()) == sum(
+            int(Decimal(i["total_amount"]) * 100) for i in invoices
+        )
+        assert report.deferred_in_cents == 0
@@ -0,0 +1,148 @@
+import copy
+import datetime
+import json
+
+import pytest
+
+from briefme_subscription.bulk import BulkOperation
+from briefme_subscription.chargify import ChargifyHelper
+from briefme_subscription.signals import (
+    CARD_UPDATED,
+    Change,
+    diff_subscriptions,
+    PENDING_CANCELLATION_CHANGED,
+    STATE_CHANGED,
+    subscription_changed,
+)
+from briefme_subscription.views.hooks import parse_chargify_webhook
+
+from .factories import ChargifySubscriptionFactory
+from .models import ChargifySubscription, SubscriptionChange
+
+pytestmark = pytest.mark.django_db()
+
+with open("tests/fixtures/active_subscription.json") as f:
+    ACTIVE_SUBSCRIPTION = json.load(f)
+
+
+def to_webhook_post_data(value, key):
+    """Flatten `value` like the form data of a Chargify webhook."""
+    if isinstance(value, dict):
+        post_data = {}
+        for k, v in value.items():
+            post_data.update(to_webhook_post_data(v, f"{key}[{k}]"))
+        return post_data
+    if value is None:
+        return {key: ""}
+    if isinstance(value, bool):
+        return {key: str(value).lower()}
+    return {key: str(value)}
+
+
+@pytest.fixture
+def received_changes():
+    received = []
+
+    def receiver(sender, subscription, changes, **kwargs):
+        received.extend(changes)
+
+    subscription_changed.connect(receiver)
+    yield received
+    subscription_changed.disconnect(receiver)
+
+
+class TestDiffSubscriptions:
+    def test_diff(self):
+        # GIVEN
+        current = copy.deepcopy(ACTIVE_SUBSCRIPTION)
+        current["cancel_at_end_of_period"] = True
+        current["credit_card"]["expiration_year"] += 2
+
+        # WHEN
+        changes = diff_subscriptions(ACTIVE_SUBSCRIPTION, current)
+
+        # THEN
+        assert [change.kind for change in changes] == [
+            PENDING_CANCELLATION_CHANGED,
+            CARD_UPDATED,
+        ]
+
+    def test_no_changes_between_the_api_and_a_webhook(self):
+        # GIVEN
+        subscription = copy.deepcopy(ACTIVE_SUBSCRIPTION)
+        subscription["credit_card"]["masked_card_number"] = None
+        post_data = to_webhook_post_data(subscription, "payload[subscription]")
+        from_webhook = parse_chargify_webhook(post_data)["payload"]["subscription"]
+
+        # WHEN / THEN
+        assert diff_subscriptions(subscription, from_webhook) == []
+        assert diff_subscriptions(from_webhook, subscription) == []
+
+    def test_no_changes_on_first_load(self):
+        # WHEN / THEN
+        assert diff_subscriptions({}, ACTIVE_SUBSCRIPTION) == []
+
+
+class TestSubscriptionChanged:
+    def test_refresh_publishes_the_changes(self, mocker, received_changes):
+        # GIVEN
+        mocker.patch.object(
+            ChargifyHelper,
+            "get_subscription",
+            return_value=dict(ACTIVE_SUBSCRIPTION, state="past_due"),
+        )
+        subscription = ChargifySubscriptionFactory(
+            chargify_subscription_cache=ACTIVE_SUBSCRIPTION
+        )
+
+        # WHEN
+        subscription.refresh_chargify_subscription_cache()
+
+        # THEN
+        assert received_changes == [Change(STATE_CHANGED, "active", "past_due")]
+        assert list(
+            SubscriptionChange.objects.values_list(
+                "subscription_uuid", "kind", "previous", "current"
+            )
+        ) == [(subscription.uuid, STATE_CHANGED, "active", "past_due")]
+
+    def test_refresh_without_changes(self, mocker, received_changes):
+        # GIVEN
+        mocker.patch.object(
+            ChargifyHelper, "get_subscription", return_value=ACTIVE_SUBSCRIPTION
+        )
+        subscription = ChargifySubscriptionFactory(
+            chargify_subscription_cache=ACTIVE_SUBSCRIPTION
+        )
+
+        # WHEN
+        subscription.refresh_chargify_subscription_cache()
+
+        # THEN
+        assert received_changes == []
+        assert not SubscriptionChange.objects.exists()
+
+    def test_bulk_operations_publish_the_changes(self, fake_chargify, received_changes):
+        # GIVEN
+        subscription_id = next(
+            subscription_id
+            for subscription_id, s in fake_chargify.dataset.subscriptions.items()
+            if s["state"] == "active"
+        )
+        ChargifySubscriptionFactory(
+            uuid=subscription_id,
+            chargify_subscription_cache=fake_chargify.dataset.subscriptions[
+                subscription_id
+            ],
+        )
+
+        # WHEN
+        BulkOperation(
+            "hold",
+            params={"automatically_resume_at": datetime.date(2030, 1, 1)},
+            subscription_model=ChargifySubscription,
+            rate=0,
+        ).run([subscription_id])
+
+        # THEN
+        assert Change(STATE_CHANGED, "active", "on_hold") in received_changes
@@ -0,0 +1,76 @@
+import pytest
+
+from django.core.management import call_command
+
+from briefme_subscription.chargify import ChargifyHelper
+from briefme_subscription.sync import sync_transactions
+
+from .models import ChargifySyncCursor, ChargifyTransaction
+
+pytestmark = pytest.mark.django_db()
+
+
+@pytest.mark.usefixtures("fake_chargify")
+class TestSyncTransactions:
+    def test_first_sync_copies_every_transaction(self, fake_chargify):
+        # WHEN
+        count = sync_transactions(ChargifyTransaction, ChargifySyncCursor, batch_size=7)
+
+        # THEN
+        transactions = fake_chargify.dataset.transactions
+        assert count == len(transactions)
+        assert ChargifyTransaction.objects.count() == len(transactions)
+        assert ChargifySyncCursor.objects.get(name="transactions").last_id == max(
+            transactions
+        )
+
+    def test_next_sync_only_fetches_new_transactions(self, fake_chargify):
+        # GIVEN
+        sync_transactions(ChargifyTransaction, ChargifySyncCursor)
+        subscription = next(
+            s
+            for s in fake_chargify.dataset.subscriptions.values()
+            if s["product"]["price_in_cents"]
+        )
+        transaction_id = fake_chargify.dataset.next_id()
+        fake_chargify.dataset.transactions[transaction_id] = dict(
+            next(iter(fake_chargify.dataset.transactions.values())),
+            id=transaction_id,
+            subscription_id=subscription["id"],
+        )
+        fake_chargify.reset_calls()
+
+        # WHEN
+        count = sync_transactions(ChargifyTransaction, ChargifySyncCursor)
+
+        # THEN
+        assert count == 1
+        assert fake_chargify.call_count("/transactions") == 1
+        assert ChargifySyncCursor.objects.get(name="transactions").last_id == (
+            transaction_id
+        )
+        assert sync_transactions(ChargifyTransaction, ChargifySyncCursor) == 0
+
+    def test_command(self, fake_chargify):
+        # WHEN
+        call_command("sync_chargify_transactions", "--batch-size", "10")
+
+        # THEN
+        assert ChargifyTransaction.objects.count() == len(
+            fake_chargify.dataset.transactions
+        )
+
+    def test_iter_subscription_transactions(self, fake_chargify):
+        # GIVEN
+        subscription_id = next(iter(fake_chargify.dataset.transactions.values()))[
+            "subscription_id"
+        ]
+        expected = fake_chargify.dataset.subscription_transactions(subscription_id)
+
+        # WHEN
+        transactions = list(
+            ChargifyHelper().iter_subscription_transactions(subscription_id, per_page=1)
+        )
+
+        # THEN
+        assert [t["id"] for t in transactions] == sorted(t["id"] for t in expected)